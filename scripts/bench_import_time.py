@@ -0,0 +1,81 @@
+"""Import-time benchmark, guarding against slow (eager) imports creeping back in.
+
+Imports each core module in a fresh interpreter and fails (exit code 1) if it takes
+longer than `--max-seconds` (median of `--runs`), or if it pulls in a provider SDK or
+a UI dependency.
+
+    python scripts/bench_import_time.py [--runs 5] [--max-seconds 0.5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+CORE_MODULES = [
+    "summony.agents",
+    "summony.agents.serialization",
+    "summony.model_connectors",
+    "summony.loggers",
+]
+
+# must only be imported when actually used
+LAZY_MODULES = [
+    "openai",
+    "anthropic",
+    "google.generativeai",
+    "ollama",
+    "IPython",
+    "ipywidgets",
+]
+
+_MEASURE_CODE = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{
+    "elapsed": elapsed,
+    "loaded": [m for m in {lazy_modules!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(module: str) -> dict:
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            _MEASURE_CODE.format(module=module, lazy_modules=LAZY_MODULES),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in CORE_MODULES:
+        results = [measure(module) for _ in range(args.runs)]
+        median = statistics.median(r["elapsed"] for r in results)
+        loaded = sorted({m for r in results for m in r["loaded"]})
+        ok = median <= args.max_seconds and not loaded
+        failed |= not ok
+        print(
+            f"{'ok  ' if ok else 'FAIL'} {module:<32} {median * 1000:7.1f} ms"
+            + (f"  (eagerly imports: {', '.join(loaded)})" if loaded else "")
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
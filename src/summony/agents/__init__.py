@@ -1,11 +1,21 @@
 from .agents import AgentInterface, Message
+from .cache import (
+    ResponseCacheInterface,
+    MemoryResponseCache,
+    SQLiteResponseCache,
+    TieredResponseCache,
+)
+from .raw_responses import RawResponsesStore
+from .params_registry import ParamsRegistry
+from .deadlines import StreamTimeouts
+from .coalescing import RequestCoalescer, g_request_coalescer
 
-from .openai_agent import OpenAIAgent
-from .xai_agent import XAIAgent
-from .deepseek_agent import DeepSeekAgent
-from .anthropic_agent import AnthropicAgent
-from .gemini_agent import GeminiAgent
-from .ollama_agent import OllamaAgent
-from .dummy_agent import DummyAgent
+from .factory import agent_classes, get_default_agent_for_model
+from .batch import ask_many, AskManyResult
 
-from .factory import get_default_agent_for_model
+
+def __getattr__(name: str):
+    # agent classes (eg. `OpenAIAgent`) are imported on first use, with their SDK
+    if name in agent_classes:
+        return agent_classes[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
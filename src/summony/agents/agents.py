@@ -1,24 +1,43 @@
 from abc import abstractmethod
-from collections import defaultdict
-from copy import deepcopy
-from dataclasses import dataclass
+import asyncio
+from copy import copy, deepcopy
+from dataclasses import dataclass, field
 from typing import (
     Any,
     AsyncIterator,
+    Awaitable,
     Callable,
     Coroutine,
     Literal,
     Self,
     Sequence,
+    Tuple,
     Type,
 )
 from uuid import uuid4
 
-from dataclasses_json import dataclass_json
+from dataclasses_json import config, dataclass_json
 
-from ..utils import separate_prefixed, HashableDict
+from ..utils import separate_prefixed
 from ..loggers import XLoggerInterface, DefaultXLogger
-from ..model_connectors import ModelConnectorInterface
+from ..model_connectors import (
+    ModelConnectorInterface,
+    ModelConnectorWrapper,
+    MessageDict,
+    unwrap_connector,
+)
+from ..model_connectors.multi_sample import (
+    generate_n,
+    generate_async_n,
+    generate_async_stream_n,
+)
+from ..model_connectors.rate_limiting import get_account_key
+from .cache import ResponseCacheInterface, CachedResponse, make_cache_key
+from .raw_responses import RawResponsesStore
+from .params_registry import ParamsRegistry
+from .streaming import StreamBuffer
+from .deadlines import CallGuard, StreamTimeouts
+from .coalescing import RequestCoalescer, g_request_coalescer
 
 
 @dataclass_json
@@ -32,6 +51,36 @@ class Message:
     # :: <params_idx> | <agent_idx> -> <params_idx>
     params: dict[int, int] | int | None = None
     log_path: str | None = None
+    # why the reply is incomplete (eg. "stall_timeout", "cancelled"), if it is
+    truncated: str | None = field(
+        default=None, metadata=config(exclude=lambda v: v is None)
+    )
+
+    # text and chunk timings of streamed replies (not serialized)
+    stream: StreamBuffer | None = field(
+        default=None,
+        repr=False,
+        compare=False,
+        metadata=config(exclude=lambda _: True),
+    )
+
+    # static
+    # bumped on every change of a field that is sent to models, see RenderedHistory
+    _generation = 0
+    _RENDERED_FIELDS = frozenset(("role", "content", "chosen"))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in self._RENDERED_FIELDS:
+            Message._generation += 1
+            super().__setattr__("_revision", Message._generation)
+
+    @property
+    def current_content(self) -> str:
+        """Content, including the text received so far for a reply still streaming."""
+        if self.stream is not None and not self.stream.is_finished:
+            return self.stream.getvalue()
+        return self.content
 
     def __iter__(self):
         # converting to dict with dict(my_msg) uses this (and .to_dict is added by @dataclass_json)
@@ -51,16 +100,81 @@ class Message:
         return cls(role="assistant", content=content, **kwargs)
 
 
+class RenderedHistory:
+    """Incrementally maintained `[{role, content}]` rendering of an agent's messages,
+    entries being rendered again only when their message changed (see `Message`)."""
+
+    _sources: list[Message | list[Message]]
+    # :: length of alternatives lists (-1 for single messages)
+    _source_lens: list[int]
+    _rendered: list[MessageDict]
+    _rendered_generation: int
+
+    def __init__(self):
+        self._sources = []
+        self._source_lens = []
+        self._rendered = []
+        self._rendered_generation = Message._generation
+
+    def render(
+        self, messages: list[Message | list[Message]], end: int | None = None
+    ) -> list[MessageDict]:
+        """Renders `messages[:end]` (as a new list of dicts shared with later renders,
+        so not to be mutated)."""
+        if end is None:
+            end = len(messages)
+        elif end < 0:
+            end += len(messages)
+        valid_count = self._count_valid(messages, end)
+        del self._sources[valid_count:]
+        del self._source_lens[valid_count:]
+        del self._rendered[valid_count:]
+        for m in messages[valid_count:end]:
+            is_seq = isinstance(m, (list, tuple))
+            self._sources.append(m)
+            self._source_lens.append(len(m) if is_seq else -1)
+            self._rendered.append(self._render_one(m))
+        self._rendered_generation = Message._generation
+        return self._rendered[:end]
+
+    def _count_valid(self, messages: list[Message | list[Message]], end: int) -> int:
+        check_revisions = self._rendered_generation != Message._generation
+        for i in range(min(end, len(self._sources))):
+            m = messages[i]
+            if m is not self._sources[i]:
+                return i
+            if isinstance(m, (list, tuple)):
+                if len(m) != self._source_lens[i]:
+                    return i
+                if check_revisions and any(
+                    alt_m._revision > self._rendered_generation for alt_m in m
+                ):
+                    return i
+            elif check_revisions and m._revision > self._rendered_generation:
+                return i
+        return min(end, len(self._sources))
+
+    @staticmethod
+    def _render_one(m: Message | list[Message]) -> MessageDict:
+        if isinstance(m, (list, tuple)):
+            assert len(m) > 0
+            m = next((alt_m for alt_m in m if alt_m.chosen), m[-1])
+        return {"role": m.role, "content": m.content}
+
+
 class AgentInterface:
     name: str
     messages: list[Message]
     model_name: str
     params: dict[str, Any]
-    params_versions: list[HashableDict]
+    params_versions: ParamsRegistry
 
     logger: XLoggerInterface
-    raw_responses: dict[list]
+    raw_responses: RawResponsesStore
     connector: ModelConnectorInterface
+    cache: ResponseCacheInterface | None
+    use_cache: bool
+    timeouts: StreamTimeouts
 
     MODEL_CONNECTOR_CLASS: Type[ModelConnectorInterface] = None
 
@@ -74,30 +188,70 @@ class AgentInterface:
         params: dict[str, Any] | None = None,
         logger: XLoggerInterface | None = None,
         client_args: dict[str, Any] | None = None,
+        cache: ResponseCacheInterface | None = None,
+        raw_responses: RawResponsesStore | None = None,
+        params_versions: ParamsRegistry | None = None,
+        timeouts: StreamTimeouts | None = None,
     ): ...
 
     @abstractmethod
     def ask(
-        self, question: str | None = None, prefill: str | None = None, **kwargs
-    ) -> str: ...
+        self,
+        question: str | None = None,
+        prefill: str | None = None,
+        use_cache: bool | None = None,
+        n: int = 1,
+        **kwargs,
+    ) -> str | list[str]: ...
+
+    @abstractmethod
+    async def ask_async(
+        self,
+        question: str | None = None,
+        prefill: str | None = None,
+        use_cache: bool | None = None,
+        timeouts: StreamTimeouts | dict[str, float] | None = None,
+        n: int = 1,
+        **kwargs,
+    ) -> str | list[str]: ...
 
     @abstractmethod
     async def ask_async_stream(
-        self, question: str | None = None, prefill: str | None = None, **kwargs
+        self,
+        question: str | None = None,
+        prefill: str | None = None,
+        use_cache: bool | None = None,
+        timeouts: StreamTimeouts | dict[str, float] | None = None,
+        n: int = 1,
+        **kwargs,
     ) -> AsyncIterator[str]:
         yield ""
 
+    @abstractmethod
+    def cancel(self) -> None: ...
+
+    @abstractmethod
+    def supports_streaming(self) -> bool: ...
+
+    @abstractmethod
+    def branch(self) -> Self: ...
+
+    @abstractmethod
+    async def warmup(self) -> None: ...
+
 
 class BaseAgent(AgentInterface):
     name: str
     messages: list[Message]
     model_name: str
     params: dict[str, Any]
-    params_versions: list[HashableDict]
+    params_versions: ParamsRegistry
 
-    logger: XLoggerInterface
-    raw_responses: dict[list]
-    connector: ModelConnectorInterface
+    raw_responses: RawResponsesStore
+    cache: ResponseCacheInterface | None
+    use_cache: bool
+    timeouts: StreamTimeouts
+    coalescer: RequestCoalescer | None
 
     # static
     MODEL_CONNECTOR_CLASS: Type[ModelConnectorInterface] = None
@@ -106,6 +260,10 @@ class BaseAgent(AgentInterface):
         # "max_tokens": 1024,
     }
 
+    # (both created on first use, see the `logger` and `connector` properties)
+    _logger: XLoggerInterface | None
+    _connector: ModelConnectorInterface | None
+
     def __init__(
         self,
         model_name: str,
@@ -115,16 +273,30 @@ class BaseAgent(AgentInterface):
         params: dict[str, Any] | None = None,
         logger: XLoggerInterface | None = None,
         client_args: dict[str, Any] | None = None,
+        cache: ResponseCacheInterface | None = None,
+        raw_responses: RawResponsesStore | None = None,
+        params_versions: ParamsRegistry | None = None,
+        timeouts: StreamTimeouts | None = None,
+        coalescer: RequestCoalescer | None = g_request_coalescer,
     ):
         self.model_name = model_name
 
         self.name = name if name is not None else model_name
 
-        self.logger = logger if logger is not None else DefaultXLogger(name=self.name)
+        # (no SDK clients, api keys lookups or log files until actually needed, so
+        # that eg. deserialized agents are cheap until used)
+        self._logger = logger
+        self._connector = None
+        self._connector_args = dict(creds=creds, logger=logger, client_args=client_args)
 
-        self.connector = self.MODEL_CONNECTOR_CLASS(
-            creds=creds, logger=logger, client_args=client_args
-        )
+        self.cache = cache
+        self.use_cache = True
+
+        self.timeouts = timeouts if timeouts is not None else StreamTimeouts()
+        self._active_calls = set()
+
+        # (None to never share calls with other agents)
+        self.coalescer = coalescer
 
         self.messages = []
         if system_prompt is not None:
@@ -135,82 +307,298 @@ class BaseAgent(AgentInterface):
         else:
             self.params = deepcopy(params)
 
-        self.params_versions = []
+        self.params_versions = (
+            params_versions if params_versions is not None else ParamsRegistry()
+        )
         self._store_params_version(self.params)
 
-        self.raw_responses = defaultdict(list)
+        self.raw_responses = (
+            raw_responses if raw_responses is not None else RawResponsesStore()
+        )
 
-    def ask(
-        self, question: str | None = None, prefill: str | None = None, **kwargs
-    ) -> str:
-        if question is None:
-            assert (
-                prefill is None
-            ), "When re-asking (question is None), prefill must also be None"
+        self._rendered_history = RenderedHistory()
 
-        params_from_kwargs, left_kwargs = separate_prefixed(kwargs, "p_")
-        if left_kwargs:
-            self.logger.warning(
-                f"Warning in BaseAgent.ask: unexpected kwargs: {list(left_kwargs.keys())}"
-            )
+    @property
+    def logger(self) -> XLoggerInterface:
+        if self._logger is None:
+            self._logger = DefaultXLogger(name=self.name)
+        return self._logger
 
-        if question is not None:
-            self.messages.append(Message.user(question))
+    @logger.setter
+    def logger(self, logger: XLoggerInterface) -> None:
+        self._logger = logger
 
-        if prefill is not None:
-            self.messages.append(Message.assistant(prefill))
+    @property
+    def connector(self) -> ModelConnectorInterface:
+        if self._connector is None:
+            self._connector = self.MODEL_CONNECTOR_CLASS(**self._connector_args)
+        return self._connector
 
-        params = {**self.params, **params_from_kwargs}
-        params_version = self._store_params_version(params)
+    @connector.setter
+    def connector(self, connector: ModelConnectorInterface) -> None:
+        self._connector = connector
 
-        model_call_params = dict(
-            messages=self._make_agent_messages(
-                self.messages if question is not None else self.messages[:-1]
-            ),
-            model=self.model_name,
-            **params,
-            **left_kwargs,
+    def ask(
+        self,
+        question: str | None = None,
+        prefill: str | None = None,
+        use_cache: bool | None = None,
+        n: int = 1,
+        **kwargs,
+    ) -> str | list[str]:
+        """Asks the model for a reply, or with `n` > 1 for `n` alternative replies
+        (returned as a list, and stored as the alternatives of the last message)."""
+        model_call_params, params_version = self._begin_call(
+            "ask", question, prefill, kwargs
         )
+        if n > 1:
+            try:
+                samples = generate_n(self.connector, n=n, **model_call_params)
+                reply_messages = self._end_complete_call_n(
+                    model_call_params, params_version, question, samples
+                )
+            except Exception as exc:
+                self._log_call_error("ask", model_call_params, exc)
+                raise exc
+            return [m.content for m in reply_messages]
         try:
-            completion_text, completion_dict = self.connector.generate(
-                **model_call_params
-            )
-
-            reply_message = Message.assistant(completion_text, params=params_version)
-
-            if question is not None:
-                self.messages.append(reply_message)
+            cache_key = self._get_cache_key(model_call_params, "complete", use_cache)
+            cached = self._get_cached(cache_key, question)
 
+            if cached is not None:
+                completion_text, completion_dict = cached.text, cached.response
             else:
-                if not isinstance(self.messages[-1], (list, tuple)):
-                    self.messages[-1] = [self.messages[-1]]
-                self.messages[-1].append(reply_message)
+                completion_text, completion_dict = self.connector.generate(
+                    **model_call_params
+                )
+
+            self._end_complete_call(
+                model_call_params,
+                params_version,
+                question,
+                completion_text,
+                completion_dict,
+                cache_key,
+                cached,
+            )
 
-                self.raw_responses[len(self.messages)].append("<reask>")
+        except Exception as exc:
+            self._log_call_error("ask", model_call_params, exc)
+            raise exc
 
-            self.raw_responses[len(self.messages)].append(completion_dict)
+        return completion_text
 
-            log_path = self.logger.log_model_call(
-                req_content=model_call_params,
-                req_base_url=self.connector.get_base_url(),
-                res_content=completion_dict,
+    async def ask_async(
+        self,
+        question: str | None = None,
+        prefill: str | None = None,
+        use_cache: bool | None = None,
+        timeouts: StreamTimeouts | dict[str, float] | None = None,
+        n: int = 1,
+        **kwargs,
+    ) -> str | list[str]:
+        model_call_params, params_version = self._begin_call(
+            "ask_async", question, prefill, kwargs
+        )
+        guard = CallGuard(self.timeouts.merged(timeouts))
+        self._active_calls.add(guard)
+        try:
+            if n > 1:
+                samples = await guard.run(
+                    generate_async_n(self.connector, n=n, **model_call_params)
+                )
+                reply_messages = self._end_complete_call_n(
+                    model_call_params,
+                    params_version,
+                    question,
+                    # (None if timed out or cancelled)
+                    samples or [("", None)] * n,
+                    truncated=guard.truncated_reason,
+                )
+                return [m.content for m in reply_messages]
+
+            cache_key = self._get_cache_key(model_call_params, "complete", use_cache)
+            cached = self._get_cached(cache_key, question)
+
+            if cached is not None:
+                completion_text, completion_dict = cached.text, cached.response
+            else:
+                result = await guard.run(self._generate_async(model_call_params))
+                # (None if timed out or cancelled)
+                completion_text, completion_dict = result or ("", None)
+
+            self._end_complete_call(
+                model_call_params,
+                params_version,
+                question,
+                completion_text,
+                completion_dict,
+                cache_key,
+                cached,
+                truncated=guard.truncated_reason,
             )
-            reply_message.log_path = log_path
 
         except Exception as exc:
-            self.logger.exception("Error in BaseAgent.ask: %s", exc, exc_info=True)
-            self.logger.log_model_call(
-                req_content=model_call_params,
-                req_base_url=self.connector.get_base_url(),
-                error=exc,
-            )
+            self._log_call_error("ask_async", model_call_params, exc)
             raise exc
 
+        finally:
+            self._active_calls.discard(guard)
+
         return completion_text
 
     async def ask_async_stream(
-        self, question: str | None = None, prefill: str | None = None, **kwargs
+        self,
+        question: str | None = None,
+        prefill: str | None = None,
+        use_cache: bool | None = None,
+        timeouts: StreamTimeouts | dict[str, float] | None = None,
+        n: int = 1,
+        **kwargs,
     ) -> AsyncIterator[str]:
+        """Streams the model's reply. With `n` > 1 the `n` alternative replies are
+        streamed at once, their chunks interleaved (each reply's text is in its
+        message's `stream`)."""
+        model_call_params, params_version = self._begin_call(
+            "ask_async_stream", question, prefill, kwargs
+        )
+        guard = CallGuard(self.timeouts.merged(timeouts))
+        self._active_calls.add(guard)
+        # (id of the call's log, while it's open)
+        call_id = None
+        try:
+            if n > 1:
+                async for chunk_text in self._stream_n(
+                    model_call_params, params_version, question, n, guard
+                ):
+                    yield chunk_text
+                return
+
+            reply_message = Message.assistant("", params=params_version)
+            self._add_reply_message(reply_message, question)
+
+            cache_key = self._get_cache_key(model_call_params, "stream", use_cache)
+            cached = self._get_cached(cache_key, question)
+
+            if cached is not None:
+                stream = self._replay_cached_chunks(cached)
+            else:
+                stream = self._generate_async_stream(model_call_params)
+
+            reply_message.stream = StreamBuffer()
+            # (only kept for the cache, the chunks being logged as they arrive)
+            chunks = [] if cache_key is not None else None
+            if cached is None:
+                call_id = self.logger.begin_model_call(
+                    req_content=model_call_params,
+                    req_base_url=self.connector.get_base_url(),
+                )
+            try:
+                async for chunk_text, chunk_dict in guard.iterate(stream):
+                    if chunks is not None:
+                        chunks.append((chunk_text, chunk_dict))
+                    if call_id is not None:
+                        self.logger.log_model_call_chunk(call_id, chunk_dict)
+                    self.raw_responses.append(len(self.messages) - 1, chunk_dict)
+                    reply_message.stream.append(chunk_text)
+                    yield chunk_text
+            except (GeneratorExit, asyncio.CancelledError):
+                # (stopped early by its consumer, the reply being partial)
+                reply_message.truncated = "cancelled"
+                raise
+            finally:
+                reply_message.content = reply_message.stream.finish()
+
+            if guard.truncated_reason is not None:
+                reply_message.truncated = guard.truncated_reason
+
+            if cached is not None:
+                reply_message.log_path = cached.log_path
+            else:
+                # (cleared first, the call's log being closed even if this fails)
+                ended_call_id, call_id = call_id, None
+                reply_message.log_path = self.logger.end_model_call(
+                    ended_call_id,
+                    res_content=(
+                        {"truncated": reply_message.truncated}
+                        if reply_message.truncated is not None
+                        else None
+                    ),
+                )
+                if cache_key is not None and reply_message.truncated is None:
+                    self.cache.set(
+                        cache_key,
+                        CachedResponse(
+                            text=reply_message.content,
+                            chunks=chunks,
+                            log_path=reply_message.log_path,
+                        ),
+                    )
+            self.raw_responses.add_log_path(
+                len(self.messages) - 1, reply_message.log_path
+            )
+
+        except Exception as exc:
+            self._log_call_error("ask_async_stream", model_call_params, exc, call_id)
+            call_id = None
+            raise exc
+
+        finally:
+            if call_id is not None:
+                # (cancelled, or the stream closed early by its consumer)
+                self.logger.end_model_call(
+                    call_id, res_content={"truncated": "cancelled"}
+                )
+            self._active_calls.discard(guard)
+
+    def cancel(self) -> None:
+        """Stops all in-flight async calls of this agent, keeping partial replies."""
+        for guard in list(self._active_calls):
+            guard.cancel()
+
+    def supports_streaming(self) -> bool:
+        return self.connector.supports_streaming(self.model_name)
+
+    async def warmup(self) -> None:
+        """Connects to the model's endpoint (and eg. loads a local model) ahead of
+        the first call."""
+        try:
+            await self.connector.warmup(self.model_name)
+        except Exception as exc:
+            self.logger.warning("Warning in BaseAgent.warmup: %s", exc)
+
+    def wrap_connector(
+        self, wrapper_class: Type[ModelConnectorWrapper], **kwargs
+    ) -> ModelConnectorWrapper:
+        """Wraps the agent's connector, eg. `ag.wrap_connector(HedgingModelConnector)`
+        (the wrapper logging through the agent's logger unless given another one)."""
+        kwargs.setdefault("logger", self.logger)
+        self.connector = wrapper_class(self.connector, **kwargs)
+        return self.connector
+
+    def branch(self) -> Self:
+        """Makes an agent continuing this agent's conversation separately (with its own
+        messages, params and raw responses, sharing the connector, logger and cache)."""
+        # (created now if not yet, to be shared and not made again by every branch)
+        self.connector, self.logger
+        ag = copy(self)
+        ag.messages = [list(m) if isinstance(m, list) else m for m in self.messages]
+        ag.params = deepcopy(self.params)
+        ag.params_versions = self.params_versions.copy()
+        ag.raw_responses = self.raw_responses.new_empty()
+        ag._rendered_history = RenderedHistory()
+        ag._active_calls = set()
+        return ag
+
+    def _begin_call(
+        self,
+        method_name: str,
+        question: str | None,
+        prefill: str | None,
+        kwargs: dict[str, Any],
+    ) -> tuple[dict[str, Any], int]:
+        """Does the messages/params bookkeeping common to the ask* methods, returning
+        the model call's args and params version."""
         if question is None:
             assert (
                 prefill is None
@@ -219,7 +607,7 @@ class BaseAgent(AgentInterface):
         params_from_kwargs, left_kwargs = separate_prefixed(kwargs, "p_")
         if left_kwargs:
             self.logger.warning(
-                f"Warning in BaseAgent.ask: unexpected kwargs: {list(left_kwargs.keys())}"
+                f"Warning in BaseAgent.{method_name}: unexpected kwargs: {list(left_kwargs.keys())}"
             )
 
         if question is not None:
@@ -232,70 +620,261 @@ class BaseAgent(AgentInterface):
         params_version = self._store_params_version(params)
 
         model_call_params = dict(
-            messages=self._make_agent_messages(
-                self.messages if question is not None else self.messages[:-1]
+            messages=self._rendered_history.render(
+                self.messages, None if question is not None else -1
             ),
             model=self.model_name,
             **params,
             **left_kwargs,
         )
-        try:
-            reply_message = Message.assistant("")
-            reply_message.params = params_version
+        return model_call_params, params_version
 
-            if question is not None:
-                self.messages.append(reply_message)
-            else:
-                if not isinstance(self.messages[-1], (list, tuple)):
-                    self.messages[-1] = [self.messages[-1]]
-                self.messages[-1].append(reply_message)
-
-                self.raw_responses[len(self.messages) - 1].append("<reask>")
-
-            chunks_dicts = []
-            async for (
-                chunk_text,
-                chunk_dict,
-            ) in self.connector.generate_async_stream(**model_call_params):
-                chunks_dicts.append(chunk_dict)
-                self.raw_responses[len(self.messages) - 1].append(chunk_dict)
-                reply_message.content += chunk_text
-                yield chunk_text
+    def _end_complete_call(
+        self,
+        model_call_params: dict[str, Any],
+        params_version: int,
+        question: str | None,
+        completion_text: str,
+        completion_dict: dict | None,
+        cache_key: str | None,
+        cached: CachedResponse | None,
+        truncated: str | None = None,
+    ) -> Message:
+        """Does the bookkeeping after a (non-streaming) completion was received."""
+        reply_message = Message.assistant(
+            completion_text, params=params_version, truncated=truncated
+        )
+        self._add_reply_message(reply_message, question)
 
-            log_path = self.logger.log_model_call(
+        if completion_dict is not None:
+            self.raw_responses.append(len(self.messages) - 1, completion_dict)
+
+        if cached is not None:
+            reply_message.log_path = cached.log_path
+        else:
+            reply_message.log_path = self.logger.log_model_call(
                 req_content=model_call_params,
                 req_base_url=self.connector.get_base_url(),
-                res_content={"chunks": chunks_dicts},
+                res_content=(
+                    completion_dict
+                    if truncated is None
+                    else {**(completion_dict or {}), "truncated": truncated}
+                ),
             )
+            if cache_key is not None and truncated is None:
+                self.cache.set(
+                    cache_key,
+                    CachedResponse(
+                        text=completion_text,
+                        response=completion_dict,
+                        log_path=reply_message.log_path,
+                    ),
+                )
+        self.raw_responses.add_log_path(len(self.messages) - 1, reply_message.log_path)
+        return reply_message
+
+    def _end_complete_call_n(
+        self,
+        model_call_params: dict[str, Any],
+        params_version: int,
+        question: str | None,
+        samples: list[tuple[str, dict | None]],
+        truncated: str | None = None,
+    ) -> list[Message]:
+        """`_end_complete_call` for the replies of a multi-sample (`n` > 1) call."""
+        reply_messages = [
+            Message.assistant(text, params=params_version, truncated=truncated)
+            for text, _ in samples
+        ]
+        self._add_reply_messages(reply_messages, question)
+        self._end_call_n(
+            model_call_params,
+            question,
+            reply_messages,
+            [[d] if d is not None else [] for _, d in samples],
+        )
+        return reply_messages
+
+    async def _stream_n(
+        self,
+        model_call_params: dict[str, Any],
+        params_version: int,
+        question: str | None,
+        n: int,
+        guard: CallGuard,
+    ) -> AsyncIterator[str]:
+        reply_messages = [
+            Message.assistant("", params=params_version) for _ in range(n)
+        ]
+        self._add_reply_messages(reply_messages, question)
+        for reply_message in reply_messages:
+            reply_message.stream = StreamBuffer()
+
+        chunks_dicts = [[] for _ in range(n)]
+        try:
+            async for reply_idx, chunk_text, chunk_dict in guard.iterate(
+                generate_async_stream_n(self.connector, n=n, **model_call_params)
+            ):
+                chunks_dicts[reply_idx].append(chunk_dict)
+                reply_messages[reply_idx].stream.append(chunk_text)
+                yield chunk_text
+        except (GeneratorExit, asyncio.CancelledError):
+            # (stopped early by its consumer, the replies being partial)
+            for reply_message in reply_messages:
+                reply_message.truncated = "cancelled"
+            raise
+        finally:
+            for reply_message in reply_messages:
+                reply_message.content = reply_message.stream.finish()
+
+        for reply_message in reply_messages:
+            reply_message.truncated = guard.truncated_reason
+        self._end_call_n(model_call_params, question, reply_messages, chunks_dicts)
+
+    def _end_call_n(
+        self,
+        model_call_params: dict[str, Any],
+        question: str | None,
+        reply_messages: list[Message],
+        responses_dicts: list[list[dict]],
+    ) -> None:
+        """Logs a multi-sample call (as one record, shared by all the replies) and
+        stores its raw responses."""
+        res_content = {"samples": responses_dicts}
+        if reply_messages[0].truncated is not None:
+            res_content["truncated"] = reply_messages[0].truncated
+        log_path = self.logger.log_model_call(
+            req_content={**model_call_params, "n": len(reply_messages)},
+            req_base_url=self.connector.get_base_url(),
+            res_content=res_content,
+        )
+        message_idx = len(self.messages) - 1
+        for i, (reply_message, dicts) in enumerate(
+            zip(reply_messages, responses_dicts)
+        ):
             reply_message.log_path = log_path
+            if i > 0 or question is None:
+                self.raw_responses.append(message_idx, "<reask>")
+            for d in dicts:
+                self.raw_responses.append(message_idx, d)
+        self.raw_responses.add_log_path(message_idx, log_path)
 
-        except Exception as exc:
-            self.logger.exception(
-                "Error in BaseAgent.ask_async_stream: %s", exc, exc_info=True
-            )
-            self.logger.log_model_call(
-                req_content=model_call_params,
-                req_base_url=self.connector.get_base_url(),
-                error=exc,
-            )
-            raise exc
+    def _log_call_error(
+        self,
+        method_name: str,
+        model_call_params: dict[str, Any],
+        exc: Exception,
+        call_id: str | None = None,
+    ) -> None:
+        self.logger.exception(
+            f"Error in BaseAgent.{method_name}: %s", exc, exc_info=True
+        )
+        if call_id is not None:
+            # (in the log of the streamed call, with the chunks received before)
+            self.logger.end_model_call(call_id, error=exc)
+            return
+        self.logger.log_model_call(
+            req_content=model_call_params,
+            req_base_url=self.connector.get_base_url(),
+            error=exc,
+        )
 
-    def _store_params_version(self, params: dict[str, Any]) -> int:
-        hparams = HashableDict(params)
-        if hparams in self.params_versions:
-            return self.params_versions.index(hparams)
-        self.params_versions.append(hparams)
-        return len(self.params_versions) - 1
+    def _add_reply_message(self, reply_message: Message, question: str | None) -> None:
+        if question is not None:
+            self.messages.append(reply_message)
+        else:
+            if not isinstance(self.messages[-1], (list, tuple)):
+                self.messages[-1] = [self.messages[-1]]
+            self.messages[-1].append(reply_message)
 
-    @staticmethod
-    def _make_agent_messages(messages: list[Message]) -> list[dict]:
-        out = []
-        for i, m in enumerate(messages):
-            if not isinstance(m, (list, tuple)):
-                to_append = m
-            else:
-                assert len(m) > 0
-                chosen = [alt_m for alt_m in m if alt_m.chosen]
-                to_append = chosen[0] if chosen else m[-1]
-            out.append({"role": to_append.role, "content": to_append.content})
-        return out
+            self.raw_responses.append(len(self.messages) - 1, "<reask>")
+
+    def _add_reply_messages(
+        self, reply_messages: list[Message], question: str | None
+    ) -> None:
+        """Adds the replies of a multi-sample call as alternatives of the last
+        message (raw responses markers being added by `_end_call_n`)."""
+        if question is not None:
+            self.messages.append(list(reply_messages))
+        else:
+            if not isinstance(self.messages[-1], (list, tuple)):
+                self.messages[-1] = [self.messages[-1]]
+            self.messages[-1].extend(reply_messages)
+
+    def _get_cache_key(
+        self,
+        model_call_params: dict[str, Any],
+        mode: Literal["complete", "stream"],
+        use_cache: bool | None,
+    ) -> str | None:
+        if self.cache is None:
+            return None
+        if not (use_cache if use_cache is not None else self.use_cache):
+            return None
+        return self._get_request_key(model_call_params, mode)
+
+    def _get_cached(
+        self, cache_key: str | None, question: str | None
+    ) -> CachedResponse | None:
+        # (a re-ask wants another reply than the ones already got, so it's never
+        # answered from the cache, its fresh reply still being cached)
+        if cache_key is None or question is None:
+            return None
+        return self.cache.get(cache_key)
+
+    def _get_request_key(
+        self, model_call_params: dict[str, Any], mode: Literal["complete", "stream"]
+    ) -> str:
+        call_params = {
+            k: v for k, v in model_call_params.items() if k not in ("messages", "model")
+        }
+        return make_cache_key(
+            unwrap_connector(self.connector).__class__,
+            model_call_params["model"],
+            model_call_params["messages"],
+            call_params,
+            mode,
+        )
+
+    def _generate_async(
+        self, model_call_params: dict[str, Any]
+    ) -> Awaitable[Tuple[str, dict]]:
+        if self.coalescer is None or not self.coalescer.should_coalesce(
+            model_call_params
+        ):
+            return self.connector.generate_async(**model_call_params)
+        return self.coalescer.run(
+            (
+                get_account_key(self.connector),
+                self._get_request_key(model_call_params, "complete"),
+            ),
+            lambda: self.connector.generate_async(**model_call_params),
+        )
+
+    def _generate_async_stream(
+        self, model_call_params: dict[str, Any]
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        if self.coalescer is None or not self.coalescer.should_coalesce(
+            model_call_params
+        ):
+            return self.connector.generate_async_stream(**model_call_params)
+        # (every agent still gets all the chunks, to record its own message and log)
+        return self.coalescer.iterate(
+            (
+                get_account_key(self.connector),
+                self._get_request_key(model_call_params, "stream"),
+            ),
+            lambda: self.connector.generate_async_stream(**model_call_params),
+        )
+
+    async def _replay_cached_chunks(
+        self, cached: CachedResponse
+    ) -> AsyncIterator[tuple[str, dict]]:
+        for chunk_text, chunk_dict in cached.chunks or [(cached.text, cached.response)]:
+            # always give control back to the event loop, so that parallel streams
+            # (eg. other agents in an NBUI) still get displayed progressively
+            await asyncio.sleep(self.cache.replay_chunk_delay or 0)
+            yield chunk_text, chunk_dict
+
+    def _store_params_version(self, params: dict[str, Any]) -> int:
+        return self.params_versions.intern(params)
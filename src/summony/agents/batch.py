@@ -0,0 +1,113 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import logging
+from typing import Any, AsyncIterator, Sequence
+
+from ..model_connectors import unwrap_connector
+from ..model_connectors.priority import Priority, call_priority
+from .agents import AgentInterface
+
+
+g_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AskManyResult:
+    prompt_idx: int
+    agent_idx: int
+    prompt: str
+    # the conversation branch of the original agent that was used for this prompt
+    agent: AgentInterface
+    reply: str | None = None
+    error: Exception | None = None
+
+
+def get_provider_key(ag: AgentInterface) -> str:
+    """Key identifying the provider (endpoint) an agent sends its requests to."""
+    connector = unwrap_connector(ag.connector)
+    return f"{connector.__class__.__name__}@{connector.get_base_url()}"
+
+
+async def ask_many(
+    agents: Sequence[AgentInterface],
+    prompts: Sequence[str],
+    *,
+    concurrency: int | dict[str, int] = 8,
+    default_concurrency: int = 8,
+    raise_errors: bool = False,
+    priority: Priority = "bulk",
+    **kwargs,
+) -> AsyncIterator[AskManyResult]:
+    """Asks every prompt to every agent (on a branch of it), yielding results as they
+    complete, with at most `concurrency` requests in flight per provider (one limit,
+    or a dict by connector class name or `get_provider_key`)."""
+    # :: provider key -> (prompt idx, agent idx) of the pairs left to ask
+    pending: dict[str, deque[tuple[int, int]]] = {}
+    for prompt_idx in range(len(prompts)):
+        for agent_idx, ag in enumerate(agents):
+            pending.setdefault(get_provider_key(ag), deque()).append(
+                (prompt_idx, agent_idx)
+            )
+    results: asyncio.Queue[AskManyResult | Exception] = asyncio.Queue()
+
+    def get_concurrency(key: str, ag: AgentInterface) -> int:
+        if isinstance(concurrency, int):
+            return concurrency
+        return concurrency.get(
+            key,
+            concurrency.get(
+                unwrap_connector(ag.connector).__class__.__name__, default_concurrency
+            ),
+        )
+
+    async def run_one(prompt_idx: int, agent_idx: int) -> AskManyResult:
+        # (branched only once it's its turn, not to hold every branch at once)
+        ag = agents[agent_idx].branch()
+        result = AskManyResult(
+            prompt_idx=prompt_idx,
+            agent_idx=agent_idx,
+            prompt=prompts[prompt_idx],
+            agent=ag,
+        )
+        try:
+            with call_priority(priority):
+                result.reply = await ag.ask_async(prompts[prompt_idx], **kwargs)
+        except Exception as exc:
+            if raise_errors:
+                raise
+            g_logger.warning(
+                "ask_many: prompt %d to agent %d (%s) failed: %s",
+                prompt_idx,
+                agent_idx,
+                ag.name,
+                exc,
+            )
+            result.error = exc
+        return result
+
+    async def work(pairs: deque[tuple[int, int]]) -> None:
+        while pairs:
+            try:
+                results.put_nowait(await run_one(*pairs.popleft()))
+            except Exception as exc:
+                # (only with `raise_errors`)
+                results.put_nowait(exc)
+                return
+
+    # (each provider's pairs being asked by as many workers as its concurrency)
+    workers = [
+        asyncio.create_task(work(pairs))
+        for key, pairs in pending.items()
+        for _ in range(min(len(pairs), get_concurrency(key, agents[pairs[0][1]])))
+    ]
+    try:
+        for _ in range(len(prompts) * len(agents)):
+            result = await results.get()
+            if isinstance(result, Exception):
+                raise result
+            yield result
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
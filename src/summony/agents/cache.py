@@ -0,0 +1,258 @@
+from abc import abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import sha256
+import json
+import logging
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Literal, Type
+
+from dataclasses_json import dataclass_json
+
+from ..model_connectors import ModelConnectorInterface, MessageDict
+
+
+g_logger = logging.getLogger(__name__)
+
+
+@dataclass_json
+@dataclass
+class CachedResponse:
+    text: str
+    # full completion dict (non-streaming calls)
+    response: dict | None = None
+    # :: list of (<chunk_text>, <chunk_dict>) (streaming calls)
+    chunks: list[tuple[str, dict]] | None = None
+    log_path: str | None = None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    evictions: int = 0
+
+
+def make_cache_key(
+    connector_class: Type[ModelConnectorInterface] | str,
+    model: str,
+    messages: list[MessageDict],
+    params: dict[str, Any],
+    mode: Literal["complete", "stream"] = "complete",
+) -> str:
+    if not isinstance(connector_class, str):
+        connector_class = connector_class.__name__
+    normalized = json.dumps(
+        [
+            connector_class,
+            model,
+            mode,
+            [[m["role"], m["content"]] for m in messages],
+            params,
+        ],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ResponseCacheInterface:
+    stats: CacheStats
+
+    # seconds to wait between chunks when replaying a cached stream (None = full speed)
+    replay_chunk_delay: float | None
+
+    @abstractmethod
+    def get(self, key: str) -> CachedResponse | None: ...
+
+    @abstractmethod
+    def set(self, key: str, value: CachedResponse) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+
+class MemoryResponseCache(ResponseCacheInterface):
+    max_entries: int
+
+    _entries: OrderedDict[str, CachedResponse]
+
+    def __init__(
+        self, max_entries: int = 1024, replay_chunk_delay: float | None = None
+    ):
+        assert max_entries > 0
+        self.max_entries = max_entries
+        self.replay_chunk_delay = replay_chunk_delay
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self.stats.sets += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResponseCache(ResponseCacheInterface):
+    """On-disk cache that can be shared by multiple processes (SQLite in WAL mode)."""
+
+    path: Path
+    max_entries: int | None
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_entries: int | None = None,
+        replay_chunk_delay: float | None = None,
+        busy_timeout: float = 30.0,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.replay_chunk_delay = replay_chunk_delay
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path,
+            timeout=busy_timeout,
+            isolation_level=None,  # autocommit, transactions are explicit
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " accessed_at REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at"
+            " ON responses (accessed_at)"
+        )
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self.stats.hits += 1
+        try:
+            return CachedResponse.from_json(row[0])
+        except Exception as exc:
+            g_logger.warning(
+                "SQLiteResponseCache: Failed to decode entry %s: %s", key, exc
+            )
+            return None
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        encoded = value.to_json(ensure_ascii=False)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, accessed_at)"
+                    " VALUES (?, ?, ?)",
+                    (key, encoded, time.time()),
+                )
+                self.stats.sets += 1
+                if self.max_entries is not None:
+                    evicted = self._conn.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        " SELECT key FROM responses ORDER BY accessed_at DESC"
+                        " LIMIT -1 OFFSET ?"
+                        ")",
+                        (self.max_entries,),
+                    ).rowcount
+                    self.stats.evictions += max(evicted, 0)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class TieredResponseCache(ResponseCacheInterface):
+    """In-memory LRU in front of a (shared) on-disk cache."""
+
+    memory: MemoryResponseCache
+    disk: ResponseCacheInterface
+
+    def __init__(
+        self,
+        disk: ResponseCacheInterface,
+        memory: MemoryResponseCache | None = None,
+        replay_chunk_delay: float | None = None,
+    ):
+        self.disk = disk
+        self.memory = memory if memory is not None else MemoryResponseCache()
+        self.replay_chunk_delay = replay_chunk_delay
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> CachedResponse | None:
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+        self.stats.sets += 1
+        self.stats.evictions = self.memory.stats.evictions + self.disk.stats.evictions
+
+    def clear(self) -> None:
+        self.memory.clear()
+        self.disk.clear()
@@ -0,0 +1,133 @@
+import asyncio
+from dataclasses import dataclass
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, TypeVar
+
+
+g_logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class CoalescingStats:
+    # calls actually sent to the provider
+    upstream_calls: int = 0
+    # calls served by joining an identical in-flight one
+    coalesced: int = 0
+
+
+class _Flight:
+    """One in-flight upstream call and the callers waiting on it."""
+
+    __slots__ = ("task", "chunks", "done", "error", "subscribers", "changed")
+
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.chunks: list = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        # (replaced by a new one every time it's set)
+        self.changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class RequestCoalescer:
+    """Makes concurrent identical requests share one upstream call ("singleflight"),
+    stopped only if all its callers go away. By default only deterministic requests
+    (temperature 0) are coalesced."""
+
+    only_deterministic: bool
+    stats: CoalescingStats
+
+    # :: key -> in-flight call
+    _flights: dict[Hashable, _Flight]
+
+    def __init__(self, only_deterministic: bool = True):
+        self.only_deterministic = only_deterministic
+        self.stats = CoalescingStats()
+        self._flights = {}
+
+    def should_coalesce(self, params: dict[str, Any]) -> bool:
+        return not self.only_deterministic or params.get("temperature") == 0
+
+    async def run(self, key: Hashable, start: Callable[[], Awaitable[T]]) -> T:
+        key = (id(asyncio.get_running_loop()), "complete", key)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.ensure_future(start())
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.stats.upstream_calls += 1
+        else:
+            self.stats.coalesced += 1
+
+        flight.subscribers += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.task.done():
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    async def iterate(
+        self, key: Hashable, start: Callable[[], AsyncIterator[T]]
+    ) -> AsyncIterator[T]:
+        key = (id(asyncio.get_running_loop()), "stream", key)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.ensure_future(self._pump(flight, start()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.stats.upstream_calls += 1
+        else:
+            self.stats.coalesced += 1
+
+        flight.subscribers += 1
+        try:
+            i = 0
+            while True:
+                changed = flight.changed
+                if i < len(flight.chunks):
+                    yield flight.chunks[i]
+                    i += 1
+                elif flight.error is not None:
+                    raise flight.error
+                elif flight.done:
+                    return
+                else:
+                    await changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.task.done():
+                # (nobody is interested in the rest of the reply anymore)
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        # (new callers must not join a finished or cancelled call)
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    @staticmethod
+    async def _pump(flight: _Flight, stream: AsyncIterator[T]) -> None:
+        try:
+            async for chunk in stream:
+                flight.chunks.append(chunk)
+                flight.notify()
+        except Exception as exc:
+            flight.error = exc
+        finally:
+            flight.done = True
+            flight.notify()
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+g_request_coalescer = RequestCoalescer()
@@ -0,0 +1,171 @@
+import asyncio
+from dataclasses import dataclass, fields
+import logging
+from typing import Any, AsyncIterator, Awaitable, Literal, Self, TypeVar
+
+from ..model_connectors.model_connectors import CallDeadline, g_call_deadline
+
+
+g_logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TruncationReason = Literal[
+    "total_timeout", "first_chunk_timeout", "stall_timeout", "cancelled"
+]
+
+
+@dataclass
+class StreamTimeouts:
+    """Timeouts (in seconds) for a model call, None meaning no limit."""
+
+    # for the whole call
+    total: float | None = None
+    # until the first chunk arrives (time to first token)
+    first_chunk: float | None = None
+    # between two consecutive chunks
+    stall: float | None = None
+
+    def merged(self, overrides: Self | dict[str, Any] | None) -> Self:
+        """Returns a copy with the (non-None) values from `overrides` applied."""
+        if overrides is None:
+            return self
+        if isinstance(overrides, dict):
+            overrides = self.__class__(**overrides)
+        return self.__class__(
+            **{
+                f.name: (
+                    getattr(overrides, f.name)
+                    if getattr(overrides, f.name) is not None
+                    else getattr(self, f.name)
+                )
+                for f in fields(self)
+            }
+        )
+
+
+class CallGuard:
+    """Enforces timeouts on, and allows cancelling, one in-flight model call, ending it
+    with `truncated_reason` telling why (and its deadline shared as `CallDeadline`)."""
+
+    timeouts: StreamTimeouts
+    truncated_reason: TruncationReason | None
+
+    def __init__(self, timeouts: StreamTimeouts):
+        self.timeouts = timeouts
+        self.truncated_reason = None
+        self._cancelled = False
+        self._current_timeout: asyncio.Timeout | None = None
+        self._deadline = CallDeadline()
+
+    def cancel(self) -> None:
+        """Stops the call as soon as possible (to be called from the event loop)."""
+        self._cancelled = True
+        if self._current_timeout is not None:
+            # makes the pending wait end now (as a timeout)
+            self._current_timeout.reschedule(asyncio.get_running_loop().time())
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    async def iterate(self, stream: AsyncIterator[T]) -> AsyncIterator[T]:
+        loop = asyncio.get_running_loop()
+        total_deadline = (
+            loop.time() + self.timeouts.total
+            if self.timeouts.total is not None
+            else None
+        )
+        it = aiter(stream)
+        got_first_chunk = False
+        try:
+            while True:
+                if self._cancelled:
+                    self.truncated_reason = "cancelled"
+                    return
+                chunk_timeout = (
+                    self.timeouts.stall if got_first_chunk else self.timeouts.first_chunk
+                )
+                deadline = self._min_deadline(
+                    total_deadline,
+                    loop.time() + chunk_timeout if chunk_timeout is not None else None,
+                )
+                self._deadline.at = deadline
+                deadline_token = g_call_deadline.set(self._deadline)
+                try:
+                    async with asyncio.timeout_at(deadline) as self._current_timeout:
+                        item = await anext(it)
+                except StopAsyncIteration:
+                    return
+                except TimeoutError:
+                    if not self._current_timeout.expired():
+                        raise
+                    self.truncated_reason = self._get_timeout_reason(
+                        total_deadline,
+                        "stall_timeout" if got_first_chunk else "first_chunk_timeout",
+                    )
+                    return
+                finally:
+                    self._current_timeout = None
+                    g_call_deadline.reset(deadline_token)
+                got_first_chunk = True
+                yield item
+        finally:
+            aclose = getattr(it, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception as exc:
+                    g_logger.warning("CallGuard: Failed to close stream: %s", exc)
+
+    async def run(self, awaitable: Awaitable[T]) -> T | None:
+        """Awaits a (non-streamed) call, returning None if it timed out or was cancelled."""
+        if self._cancelled:
+            self.truncated_reason = "cancelled"
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            return None
+        loop = asyncio.get_running_loop()
+        total_deadline = (
+            loop.time() + self.timeouts.total
+            if self.timeouts.total is not None
+            else None
+        )
+        # for a non-streamed reply, the "first chunk" is the whole reply
+        deadline = self._min_deadline(
+            total_deadline,
+            loop.time() + self.timeouts.first_chunk
+            if self.timeouts.first_chunk is not None
+            else None,
+        )
+        self._deadline.at = deadline
+        deadline_token = g_call_deadline.set(self._deadline)
+        try:
+            async with asyncio.timeout_at(deadline) as self._current_timeout:
+                return await awaitable
+        except TimeoutError:
+            if not self._current_timeout.expired():
+                raise
+            self.truncated_reason = self._get_timeout_reason(
+                total_deadline, "first_chunk_timeout"
+            )
+            return None
+        finally:
+            self._current_timeout = None
+            g_call_deadline.reset(deadline_token)
+
+    def _get_timeout_reason(
+        self, total_deadline: float | None, chunk_reason: TruncationReason
+    ) -> TruncationReason:
+        if self._cancelled:
+            return "cancelled"
+        if (
+            total_deadline is not None
+            and asyncio.get_running_loop().time() >= total_deadline
+        ):
+            return "total_timeout"
+        return chunk_reason
+
+    @staticmethod
+    def _min_deadline(*deadlines: float | None) -> float | None:
+        return min((d for d in deadlines if d is not None), default=None)
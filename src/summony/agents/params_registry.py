@@ -0,0 +1,62 @@
+from copy import deepcopy
+from typing import Any, Iterable, Iterator, Self, Sequence
+
+from ..utils import FrozenKey, HashableDict
+
+
+class ParamsRegistry(Sequence[HashableDict]):
+    """Interned params versions, each distinct params dict getting a stable index
+    (can be shared by agents, whose `Message.params` then refer to the same ones)."""
+
+    _versions: list[HashableDict]
+    _index: dict[FrozenKey, int]
+
+    def __init__(self, versions: Iterable[dict[str, Any]] = ()):
+        self._versions = []
+        self._index = {}
+        for params in versions:
+            # keep indexes as they were even if there are duplicates
+            self._versions.append(HashableDict(deepcopy(params)))
+            self._index.setdefault(FrozenKey(params), len(self._versions) - 1)
+
+    def intern(self, params: dict[str, Any]) -> int:
+        key = FrozenKey(params)
+        idx = self._index.get(key)
+        if idx is None:
+            self._versions.append(HashableDict(deepcopy(params)))
+            idx = self._index[key] = len(self._versions) - 1
+        return idx
+
+    def index_of(self, params: dict[str, Any]) -> int | None:
+        return self._index.get(FrozenKey(params))
+
+    def copy(self) -> Self:
+        out = self.__class__()
+        out._versions = list(self._versions)
+        out._index = dict(self._index)
+        return out
+
+    def to_list(self) -> list[dict[str, Any]]:
+        return [dict(params) for params in self._versions]
+
+    def __getitem__(self, idx):
+        return self._versions[idx]
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def __iter__(self) -> Iterator[HashableDict]:
+        return iter(self._versions)
+
+    def __contains__(self, params: object) -> bool:
+        return isinstance(params, dict) and self.index_of(params) is not None
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ParamsRegistry):
+            return self._versions == other._versions
+        if isinstance(other, list):
+            return self._versions == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._versions!r})"
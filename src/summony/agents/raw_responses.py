@@ -0,0 +1,140 @@
+from collections import defaultdict, deque
+import json
+import logging
+from pathlib import Path
+import tempfile
+import threading
+import uuid
+from typing import IO, Any, Iterator, Literal, Self
+
+
+g_logger = logging.getLogger(__name__)
+
+
+class RawResponsesStore:
+    """Raw responses (completion dicts, stream chunks) of an agent, by message index,
+    kept JSON-encoded in memory up to `max_memory_bytes` and spilled to a file beyond
+    (or only as log paths, with `mode="log_path"`)."""
+
+    mode: Literal["full", "log_path"]
+    max_memory_bytes: int | None
+    spill_path: Path | None
+    memory_bytes: int
+    spilled_bytes: int
+
+    # :: <message_idx> -> <list of encoded entry | (<offset>, <length>) in spill file>
+    _entries: dict[int, list[bytes | tuple[int, int]]]
+    # :: FIFO of (<message_idx>, <entry_idx>) of entries still in memory
+    _in_memory: deque[tuple[int, int]]
+    _spill_file: IO[bytes] | None
+
+    # static
+    _DEFAULT_MAX_MEMORY_BYTES = 32 * 1024 * 1024
+    _REASK_MARKER = "<reask>"
+
+    def __init__(
+        self,
+        max_memory_bytes: int | None = _DEFAULT_MAX_MEMORY_BYTES,
+        spill_path: str | Path | None = None,
+        mode: Literal["full", "log_path"] = "full",
+    ):
+        self.mode = mode
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_path = Path(spill_path) if spill_path is not None else None
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self._entries = defaultdict(list)
+        self._in_memory = deque()
+        self._spill_file = None
+        self._lock = threading.RLock()
+
+    def new_empty(self) -> Self:
+        """Makes an empty store with the same settings (spilling to its own file)."""
+        spill_path = None
+        if self.spill_path is not None:
+            # (unique to the new store, all branches of this one needing their own)
+            spill_path = self.spill_path.with_name(
+                f"{self.spill_path.stem}-{uuid.uuid4().hex[:8]}{self.spill_path.suffix}"
+            )
+        return self.__class__(
+            max_memory_bytes=self.max_memory_bytes,
+            spill_path=spill_path,
+            mode=self.mode,
+        )
+
+    def append(self, message_idx: int, entry: dict | str) -> None:
+        if self.mode == "log_path" and entry != self._REASK_MARKER:
+            return
+        self._append(message_idx, entry)
+
+    def add_log_path(self, message_idx: int, log_path: str | None) -> None:
+        if self.mode == "log_path" and log_path is not None:
+            self._append(message_idx, {"log_path": log_path})
+
+    def __getitem__(self, message_idx: int) -> list[dict | str]:
+        with self._lock:
+            return [self._decode(e) for e in self._entries.get(message_idx, [])]
+
+    def __contains__(self, message_idx: int) -> bool:
+        return message_idx in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._entries.keys()))
+
+    def keys(self) -> list[int]:
+        return list(self._entries.keys())
+
+    def items(self) -> Iterator[tuple[int, list[dict | str]]]:
+        for message_idx in self.keys():
+            yield message_idx, self[message_idx]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def _append(self, message_idx: int, entry: Any) -> None:
+        encoded = json.dumps(
+            entry, ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode("utf-8")
+        with self._lock:
+            entries = self._entries[message_idx]
+            entries.append(encoded)
+            self._in_memory.append((message_idx, len(entries) - 1))
+            self.memory_bytes += len(encoded)
+            if self.max_memory_bytes is not None:
+                while self.memory_bytes > self.max_memory_bytes and self._in_memory:
+                    self._spill_oldest()
+
+    def _spill_oldest(self) -> None:
+        message_idx, entry_idx = self._in_memory.popleft()
+        encoded = self._entries[message_idx][entry_idx]
+        f = self._get_spill_file()
+        f.seek(0, 2)
+        offset = f.tell()
+        f.write(encoded)
+        self._entries[message_idx][entry_idx] = (offset, len(encoded))
+        self.memory_bytes -= len(encoded)
+        self.spilled_bytes += len(encoded)
+
+    def _get_spill_file(self) -> IO[bytes]:
+        if self._spill_file is None:
+            if self.spill_path is not None:
+                self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+                self._spill_file = open(self.spill_path, "w+b")
+            else:
+                self._spill_file = tempfile.TemporaryFile(prefix="summony-raw-")
+        return self._spill_file
+
+    def _decode(self, entry: bytes | tuple[int, int]) -> dict | str:
+        if isinstance(entry, tuple):
+            offset, length = entry
+            f = self._get_spill_file()
+            f.flush()
+            f.seek(offset)
+            entry = f.read(length)
+        return json.loads(entry)
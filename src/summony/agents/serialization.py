@@ -16,20 +16,8 @@ from typing import (
 from dataclasses_json import dataclass_json
 
 from .agents import AgentInterface, Message
-from .openai_agent import OpenAIAgent
-from .anthropic_agent import AnthropicAgent
-from .gemini_agent import GeminiAgent
-from .ollama_agent import OllamaAgent
-from .dummy_agent import DummyAgent
-
-
-agent_classes = {
-    "OpenAIAgent": OpenAIAgent,
-    "AnthropicAgent": AnthropicAgent,
-    "GeminiAgent": GeminiAgent,
-    "OllamaAgent": OllamaAgent,
-    "DummyAgent": DummyAgent,
-}
+from .params_registry import ParamsRegistry
+from .factory import agent_classes
 
 
 class ConversationData(TypedDict):
@@ -54,6 +42,7 @@ def conversation_to_dict(agents: list[AgentInterface]) -> ConversationData:
     messages_data = {}
     agent_messages = {}
     params = {}
+    params_lists = {}
 
     def add_to_messages_data(m: Message, ag_idx: int) -> str:
         m_clone = deepcopy(m)
@@ -78,7 +67,11 @@ def conversation_to_dict(agents: list[AgentInterface]) -> ConversationData:
                 "params": ag.params,
             }
         )
-        params[ag_idx] = ag.params_versions
+        # agents can share the same params registry
+        registry_id = id(ag.params_versions)
+        if registry_id not in params_lists:
+            params_lists[registry_id] = ag.params_versions.to_list()
+        params[ag_idx] = params_lists[registry_id]
         agent_messages[ag_idx] = []
         for m in ag.messages:
             if not isinstance(m, (tuple, list)):
@@ -109,7 +102,7 @@ def conversation_from_dict(data: ConversationData) -> list[AgentInterface]:
             model_name=ag_data["model_name"],
             params=ag_data["params"],
         )
-        ag.params_versions = data["params"][str(ag_idx)]
+        ag.params_versions = ParamsRegistry(data["params"][str(ag_idx)])
         ags.append(ag)
 
     for ag_idx, messages in data["agent_messages"].items():
@@ -0,0 +1,90 @@
+from bisect import bisect_right
+import time
+
+
+class StreamBuffer:
+    """Text of an in-progress streamed reply, kept as a list of chunks (joined once,
+    by `finish()`), with the chunks' arrival times."""
+
+    started_at: float
+    chunk_times: list[float]
+    finished_at: float | None
+
+    _chunks: list[str]
+    # :: end offset (in chars) of each chunk, for text_since
+    _chunk_ends: list[int]
+    _text: str | None
+
+    def __init__(self, started_at: float | None = None):
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.chunk_times = []
+        self.finished_at = None
+        self._chunks = []
+        self._chunk_ends = []
+        self._text = None
+
+    def append(self, chunk_text: str) -> None:
+        assert self._text is None, "StreamBuffer.append: buffer already finished"
+        self.chunk_times.append(time.monotonic())
+        self._chunks.append(chunk_text)
+        self._chunk_ends.append(len(self) + len(chunk_text))
+
+    def finish(self) -> str:
+        """Joins the chunks into the final text (and stops accepting new ones)."""
+        if self._text is None:
+            self._text = "".join(self._chunks)
+            self._chunks = []
+            self.finished_at = time.monotonic()
+        return self._text
+
+    @property
+    def is_finished(self) -> bool:
+        return self._text is not None
+
+    def getvalue(self) -> str:
+        return self._text if self._text is not None else "".join(self._chunks)
+
+    def text_since(self, offset: int) -> str:
+        if self._text is not None:
+            return self._text[offset:]
+        if offset >= len(self):
+            return ""
+        # first chunk ending after offset
+        chunk_idx = bisect_right(self._chunk_ends, offset)
+        chunk_start = self._chunk_ends[chunk_idx - 1] if chunk_idx > 0 else 0
+        return self._chunks[chunk_idx][offset - chunk_start :] + "".join(
+            self._chunks[chunk_idx + 1 :]
+        )
+
+    def __len__(self) -> int:
+        return self._chunk_ends[-1] if self._chunk_ends else 0
+
+    @property
+    def chunks_count(self) -> int:
+        return len(self._chunk_ends)
+
+    @property
+    def time_to_first_token(self) -> float | None:
+        return self.chunk_times[0] - self.started_at if self.chunk_times else None
+
+    @property
+    def inter_token_latencies(self) -> list[float]:
+        return [b - a for a, b in zip(self.chunk_times, self.chunk_times[1:])]
+
+    @property
+    def mean_inter_token_latency(self) -> float | None:
+        if len(self.chunk_times) < 2:
+            return None
+        return (self.chunk_times[-1] - self.chunk_times[0]) / (
+            len(self.chunk_times) - 1
+        )
+
+    def get_timings(self) -> dict[str, float | int | None]:
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "mean_inter_token_latency": self.mean_inter_token_latency,
+            "chunks_count": self.chunks_count,
+            "total_time": (
+                (self.finished_at or time.monotonic()) - self.started_at
+            ),
+        }
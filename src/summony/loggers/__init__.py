@@ -0,0 +1,10 @@
+from .loggers import (
+    XLoggerInterface,
+    BaseXLogger,
+    DefaultXLogger,
+    make_default_logger,
+    get_shared_logger,
+)
+from .writer import LogWriter, g_log_writer
+from .segments import SegmentedLogStore, SegmentedXLogger, get_segmented_log_store
+from .message_blobs import MessageBlobStore, get_message_blob_store
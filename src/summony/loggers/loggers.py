@@ -0,0 +1,490 @@
+from abc import abstractmethod
+import logging
+import uuid
+from pathlib import Path
+import time
+import datetime
+import traceback
+import json
+import threading
+from typing import IO
+
+from .writer import LogWriter, encode_compact, g_log_writer
+from .message_blobs import MessageBlobStore
+
+
+logger = logging.getLogger(__name__)
+
+# (src/summony/logs)
+_DEFAULT_LOGS_PATH = Path(__file__).resolve().parent.parent / "logs"
+
+
+def make_default_logger(
+    name: str | None = None, level: int = logging.DEBUG, file_path: str | None = None
+):
+    if name is None:
+        name = f"logger-{uuid.uuid4().hex[:8]}"
+
+    logger = logging.Logger(name)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(level)
+
+    formatter = logging.Formatter("%(levelname)s %(asctime)s %(message)s @%(name)s")
+
+    console_handler.setFormatter(formatter)
+
+    logger.addHandler(console_handler)
+
+    if file_path is not None:
+        file_handler = logging.FileHandler(file_path)
+        file_handler.setLevel(level)
+        file_handler.setFormatter(formatter)
+
+        logger.addHandler(file_handler)
+
+    return logger
+
+
+class _LazyFileHandler(logging.FileHandler):
+    """Opens its file (creating its directory) only once there's something to log."""
+
+    def __init__(self, file_path: str | Path):
+        super().__init__(file_path, delay=True)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+class _XLoggerNameFilter(logging.Filter):
+    """Gives the records logged without an `xlogger` field the logger's name."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "xlogger"):
+            record.xlogger = record.name
+        return True
+
+
+# :: log file path -> logger writing to it (and the console)
+_g_shared_loggers: dict[Path, logging.Logger] = {}
+_g_shared_loggers_lock = threading.Lock()
+
+
+def get_shared_logger(
+    file_path: str | Path | None = None, level: int = logging.DEBUG
+) -> logging.Logger:
+    """Returns the logger shared by the XLoggers logging to `file_path` (by default
+    `logs/log.log`), creating it if needed, their records having their name as
+    `xlogger` field."""
+    file_path = (
+        Path(file_path).resolve()
+        if file_path is not None
+        else _DEFAULT_LOGS_PATH / "log.log"
+    )
+    with _g_shared_loggers_lock:
+        shared_logger = _g_shared_loggers.get(file_path)
+        if shared_logger is not None:
+            return shared_logger
+
+        shared_logger = logging.Logger(f"summony-{file_path.stem}")
+        formatter = logging.Formatter(
+            "%(levelname)s %(asctime)s %(message)s @%(xlogger)s"
+        )
+        for handler in (logging.StreamHandler(), _LazyFileHandler(file_path)):
+            handler.setLevel(level)
+            handler.setFormatter(formatter)
+            handler.addFilter(_XLoggerNameFilter())
+            shared_logger.addHandler(handler)
+
+        _g_shared_loggers[file_path] = shared_logger
+        return shared_logger
+
+
+class XLoggerInterface:
+    # --- logging.Logger methods
+    @abstractmethod
+    def log(self, level: int, msg, *args, **kwargs): ...
+
+    @abstractmethod
+    def debug(self, msg: str, *args, **kwargs) -> None: ...
+
+    @abstractmethod
+    def info(self, msg: str, *args, **kwargs) -> None: ...
+
+    @abstractmethod
+    def warning(self, msg: str, *args, **kwargs) -> None: ...
+
+    @abstractmethod
+    def error(self, msg: str, *args, **kwargs) -> None: ...
+
+    @abstractmethod
+    def exception(self, msg: str, *args, exc_info=True, **kwargs) -> None:
+        self.error(msg, *args, **kwargs)
+
+    @abstractmethod
+    def critical(self, msg: str, *args, **kwargs) -> None: ...
+
+    @abstractmethod
+    def fatal(self, msg: str, *args, **kwargs) -> None: ...
+
+    def log_model_call(
+        self,
+        *,
+        req_content: dict,
+        req_base_url: str | None = None,
+        req_url: str | None = None,
+        req_headers: dict | None = None,
+        res_content: dict = None,
+        res_status_code: int | None = None,
+        res_headers: dict | None = None,
+        error: Exception | None = None,
+    ): ...
+
+    def begin_model_call(
+        self,
+        *,
+        req_content: dict,
+        req_base_url: str | None = None,
+        req_url: str | None = None,
+        req_headers: dict | None = None,
+    ) -> str:
+        """Starts logging a streamed model call, whose chunks are then logged with
+        `log_model_call_chunk` until `end_model_call`, returning the call's log id."""
+        call_id = uuid.uuid4().hex
+        self._get_open_calls()[call_id] = (
+            dict(
+                req_content=req_content,
+                req_base_url=req_base_url,
+                req_url=req_url,
+                req_headers=req_headers,
+            ),
+            [],
+        )
+        return call_id
+
+    def log_model_reply_chunk(self, chunk: dict, error: Exception | None = None):
+        """Called with every chunk of streamed replies (by `log_model_call_chunk`)."""
+
+    def log_model_call_chunk(
+        self, call_id: str, chunk: dict, error: Exception | None = None
+    ) -> None:
+        """Logs a chunk of the streamed model call `call_id` (see
+        `begin_model_call`)."""
+        chunks = self._get_open_calls()[call_id][1]
+        chunks.append(chunk if error is None else {"error": str(error)})
+        self.log_model_reply_chunk(chunk, error)
+
+    def end_model_call(
+        self,
+        call_id: str,
+        *,
+        res_content: dict | None = None,
+        error: Exception | None = None,
+    ) -> str | None:
+        """Finishes the log of a streamed model call (with the response's fields
+        other than its chunks), returning its log path."""
+        kwargs, chunks = self._get_open_calls().pop(call_id)
+        return self.log_model_call(
+            **kwargs, res_content={"chunks": chunks, **(res_content or {})}, error=error
+        )
+
+    def read_model_call(self, log_path: str) -> dict | None:
+        """The record of a model call, by the log path `log_model_call` returned."""
+        return None
+
+    def flush(self) -> None:
+        """Waits for the logged model calls to be written (if done in background)."""
+
+    def _get_open_calls(self) -> dict[str, tuple[dict, list[dict]]]:
+        # :: call id -> (`begin_model_call` args, chunks) of streamed calls being logged
+        return self.__dict__.setdefault("_open_calls", {})
+
+
+class BaseXLogger(XLoggerInterface):
+    """Base for XLoggers sending their messages to a `logging.Logger` (by default
+    the shared one, see `get_shared_logger`), and their model calls' messages to
+    `message_blobs` if given (records then having `message_ids`)."""
+
+    message_blobs: MessageBlobStore | None
+    _name: str
+    _logger: logging.Logger
+    # timestamp int + random 4-char hex, for names unique to this logger
+    _suffix: str
+
+    def __init__(
+        self,
+        logger: logging.Logger | None = None,
+        name: str | None = None,
+        message_blobs: MessageBlobStore | None = None,
+    ):
+        super().__init__()
+        self.message_blobs = message_blobs
+
+        self._suffix = str(int(time.time() * 1000)) + "-" + uuid.uuid4().hex[:4]
+        self._logger = logger if logger is not None else get_shared_logger()
+
+        if name is None:
+            name = logger.name if logger is not None else f"logger-{self._suffix}"
+        self._name = name
+
+    def log(self, level: int, msg, *args, **kwargs):
+        kwargs["extra"] = {"xlogger": self._name, **(kwargs.get("extra") or {})}
+        self._logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, msg: str, *args, **kwargs) -> None:
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg: str, *args, **kwargs) -> None:
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg: str, *args, **kwargs) -> None:
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    def error(self, msg: str, *args, **kwargs) -> None:
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg: str, *args, exc_info=True, **kwargs) -> None:
+        self.error(msg, *args, **kwargs)
+
+    def critical(self, msg: str, *args, **kwargs) -> None:
+        self.log(logging.CRITICAL, msg, *args, **kwargs)
+
+    def fatal(self, msg: str, *args, **kwargs) -> None:
+        self.log(logging.CRITICAL, msg, *args, **kwargs)
+
+    def _make_model_call_record(
+        self,
+        req_content: dict,
+        req_base_url: str | None = None,
+        req_url: str | None = None,
+        req_headers: dict | None = None,
+        res_content: dict = None,
+        res_status_code: int | None = None,
+        res_headers: dict | None = None,
+        error: Exception | None = None,
+    ) -> dict:
+        req = {}
+        if req_base_url is not None:
+            req["request_base_url"] = req_base_url
+        if req_url is not None:
+            req["request_url"] = req_url
+        if req_headers is not None:
+            req["request_headers"] = req_headers
+        req.update(req_content)
+        if self.message_blobs is not None and "messages" in req:
+            req["message_ids"] = self.message_blobs.put_all(req.pop("messages"))
+
+        res = {}
+        if res_status_code is not None:
+            res["response_status_code"] = res_status_code
+        if res_headers is not None:
+            res["response_headers"] = res_headers
+        if res_content is not None:
+            res.update(res_content)
+
+        err = {}
+        if error is not None:
+            err["error"] = str(error)
+            # (here, while the exception is still being handled)
+            if stacktrace := traceback.format_exc():
+                err["stacktrace"] = stacktrace
+
+        to_log = {"request": req}
+        if res:
+            to_log["response"] = res
+        if err:
+            to_log["error"] = err
+        return to_log
+
+    def _expand_record(self, record: dict) -> dict:
+        """Puts back the messages of a record logged with `message_blobs`."""
+        req = record.get("request", {})
+        if self.message_blobs is not None and "message_ids" in req:
+            req["messages"] = self.message_blobs.get_all(req.pop("message_ids"))
+        return record
+
+
+class DefaultXLogger(BaseXLogger):
+    """Logs every model call to its own JSON file (streamed ones to a JSON lines file
+    appended to as chunks arrive), in a directory per logger, from the `writer`'s
+    thread."""
+
+    flush_interval: float
+    _model_logs_path: Path
+    _model_logs_path_created: bool
+    # (None to write model call logs inline)
+    _writer: LogWriter | None
+    # :: log path -> [open log file, when it was last flushed] of streamed calls
+    #    (only used from the writer's thread)
+    _open_call_files: dict[str, list[IO[bytes] | float]]
+    _periodic_flush_added: bool
+
+    def __init__(
+        self,
+        logger: logging.Logger | None = None,
+        model_logs_path: str | None = None,
+        name: str | None = None,
+        writer: LogWriter | None = g_log_writer,
+        flush_interval: float = 1.0,
+        message_blobs: MessageBlobStore | None = None,
+    ):
+        super().__init__(logger, name, message_blobs)
+
+        if model_logs_path is None:
+            model_logs_path = _DEFAULT_LOGS_PATH / f"agent-{self._name}-{self._suffix}"
+        # (created with the first log, many loggers never logging a model call)
+        self._model_logs_path = Path(model_logs_path)
+        self._model_logs_path_created = False
+        self._writer = writer
+        self.flush_interval = flush_interval
+        self._open_call_files = {}
+        self._periodic_flush_added = False
+
+    def log_model_call(
+        self,
+        *,
+        req_content: dict,
+        req_base_url: str | None = None,
+        req_url: str | None = None,
+        req_headers: dict | None = None,
+        res_content: dict = None,
+        res_status_code: int | None = None,
+        res_headers: dict | None = None,
+        error: Exception | None = None,
+    ):
+        filename = self._make_log_filename(".json")
+        log_path = Path(self._model_logs_path).name + "/" + filename
+
+        to_log = self._make_model_call_record(
+            req_content,
+            req_base_url,
+            req_url,
+            req_headers,
+            res_content,
+            res_status_code,
+            res_headers,
+            error,
+        )
+
+        self._run_io(self._ensure_model_logs_path)
+        # (the path is returned right away, the file being written in background)
+        if self._writer is not None:
+            self._writer.write(self._model_logs_path / filename, to_log)
+        else:
+            with open(self._model_logs_path / filename, "w") as f:
+                json.dump(to_log, f, ensure_ascii=True, indent=2)
+        return log_path
+
+    def begin_model_call(
+        self,
+        *,
+        req_content: dict,
+        req_base_url: str | None = None,
+        req_url: str | None = None,
+        req_headers: dict | None = None,
+    ) -> str:
+        filename = self._make_log_filename(".jsonl")
+        log_path = Path(self._model_logs_path).name + "/" + filename
+        record = self._make_model_call_record(
+            req_content, req_base_url, req_url, req_headers
+        )
+        if self._writer is not None and not self._periodic_flush_added:
+            # (for the streams that stall, the others being flushed as chunks arrive)
+            self._writer.add_periodic_flush(self._flush_call_files)
+            self._periodic_flush_added = True
+        self._run_io(self._open_call_file, log_path, filename, record)
+        return log_path
+
+    def log_model_call_chunk(
+        self, call_id: str, chunk: dict, error: Exception | None = None
+    ) -> None:
+        self._run_io(
+            self._write_call_line,
+            call_id,
+            {"chunk": chunk} if error is None else {"error": str(error)},
+        )
+        self.log_model_reply_chunk(chunk, error)
+
+    def end_model_call(
+        self,
+        call_id: str,
+        *,
+        res_content: dict | None = None,
+        error: Exception | None = None,
+    ) -> str | None:
+        end = self._make_model_call_record({}, res_content=res_content, error=error)
+        del end["request"]
+        self._run_io(self._close_call_file, call_id, {"end": True, **end})
+        return call_id
+
+    def read_model_call(self, log_path: str) -> dict | None:
+        self.flush()
+        try:
+            with open(self._model_logs_path.parent / log_path, "rb") as f:
+                if not log_path.endswith(".jsonl"):
+                    return self._expand_record(json.load(f))
+                lines = [json.loads(line) for line in f]
+        except FileNotFoundError:
+            return None
+
+        # (a streamed call's log)
+        record = lines[0]
+        chunks = [line.get("chunk", line) for line in lines[1:] if "end" not in line]
+        record["response"] = {"chunks": chunks}
+        if "end" in lines[-1]:
+            record["response"].update(lines[-1].get("response", {}))
+            if "error" in lines[-1]:
+                record["error"] = lines[-1]["error"]
+        else:
+            # (the process died, or is still receiving the reply)
+            record["incomplete"] = True
+        return self._expand_record(record)
+
+    def flush(self) -> None:
+        self._run_io(self._flush_call_files)
+        if self._writer is not None:
+            self._writer.flush()
+
+    def _run_io(self, fn, *args) -> None:
+        if self._writer is not None:
+            self._writer.submit(fn, *args)
+        else:
+            fn(*args)
+
+    # (the methods below run on the writer's thread)
+
+    def _open_call_file(self, log_path: str, filename: str, record: dict) -> None:
+        self._ensure_model_logs_path()
+        f = open(self._model_logs_path / filename, "wb")
+        f.write(encode_compact(record) + b"\n")
+        f.flush()
+        self._open_call_files[log_path] = [f, time.monotonic()]
+
+    def _write_call_line(self, log_path: str, line: dict) -> None:
+        open_file = self._open_call_files[log_path]
+        f = open_file[0]
+        f.write(encode_compact(line) + b"\n")
+        now = time.monotonic()
+        if now - open_file[1] >= self.flush_interval:
+            f.flush()
+            open_file[1] = now
+
+    def _close_call_file(self, log_path: str, end: dict) -> None:
+        f, _ = self._open_call_files.pop(log_path)
+        with f:
+            f.write(encode_compact(end) + b"\n")
+
+    def _flush_call_files(self) -> None:
+        for f, _ in list(self._open_call_files.values()):
+            f.flush()
+
+    def _ensure_model_logs_path(self) -> None:
+        if not self._model_logs_path_created:
+            self._model_logs_path.mkdir(parents=True, exist_ok=True)
+            self._model_logs_path_created = True
+
+    @staticmethod
+    def _make_log_filename(ext: str) -> str:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return now.strftime("%Y-%m-%d_%H-%M-%S-%f_") + uuid.uuid4().hex[:8] + ext
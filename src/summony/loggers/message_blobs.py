@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from hashlib import sha1
+import json
+import logging
+from pathlib import Path
+import threading
+
+from .writer import LogWriter, g_log_writer
+
+
+g_logger = logging.getLogger(__name__)
+
+
+def hash_message_dict(m: dict) -> str:
+    """Content id of a `{role, content}` message (the same as `hash_msg` gives for
+    the `Message`, so log and conversation archive ids match)."""
+    return sha1(str((m["role"], m["content"])).encode("utf-8")).hexdigest()
+
+
+class MessageBlobStore:
+    """Content-addressed store of messages (`<path>/<id[:2]>/<id>.json`), for model
+    call logs to refer to their requests' messages by id instead of repeating them."""
+
+    path: Path
+
+    _writer: LogWriter | None
+    # :: ids of messages known to be stored
+    _stored: set[str]
+    # :: ids of messages queued to be written, not written yet
+    _unwritten: set[str]
+    # (blob directories known to exist)
+    _dirs: set[Path]
+    # :: id() of recently hashed message dicts -> (the dict, its id), since agents
+    #    send the same (not mutated) dicts again with every call of a conversation
+    _hashed: OrderedDict[int, tuple[dict, str]]
+
+    # static
+    _MAX_HASHED = 4096
+
+    def __init__(self, path: str | Path, writer: LogWriter | None = g_log_writer):
+        self.path = Path(path)
+        self._writer = writer
+        self._stored = set()
+        self._unwritten = set()
+        self._dirs = set()
+        self._hashed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put_all(self, messages: list[dict]) -> list[str]:
+        """Stores the messages not stored yet, returning all their ids."""
+        return [self.put(m) for m in messages]
+
+    def put(self, message: dict) -> str:
+        message_id = self._hash(message)
+        with self._lock:
+            if message_id in self._stored:
+                return message_id
+            self._stored.add(message_id)
+            self._unwritten.add(message_id)
+        if self._writer is not None:
+            self._writer.submit(self._write_blob, message_id, message)
+        else:
+            self._write_blob(message_id, message)
+        return message_id
+
+    def get(self, message_id: str) -> dict:
+        return self.get_all([message_id])[0]
+
+    def get_all(self, message_ids: list[str]) -> list[dict]:
+        with self._lock:
+            unwritten = not self._unwritten.isdisjoint(message_ids)
+        if unwritten and self._writer is not None:
+            self._writer.flush()
+        messages = []
+        for message_id in message_ids:
+            with open(self._get_blob_path(message_id)) as f:
+                messages.append(json.load(f))
+        return messages
+
+    def _write_blob(self, message_id: str, message: dict) -> None:
+        # (on the writer's thread, if any)
+        blob_path = self._get_blob_path(message_id)
+        try:
+            if blob_path.parent not in self._dirs:
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                self._dirs.add(blob_path.parent)
+            if not blob_path.exists():
+                # (else stored by an earlier run, or another process)
+                with open(blob_path, "w") as f:
+                    json.dump(message, f, ensure_ascii=True)
+        finally:
+            with self._lock:
+                self._unwritten.discard(message_id)
+
+    def _hash(self, message: dict) -> str:
+        key = id(message)
+        with self._lock:
+            hashed = self._hashed.get(key)
+            if hashed is not None and hashed[0] is message:
+                self._hashed.move_to_end(key)
+                return hashed[1]
+        message_id = hash_message_dict(message)
+        with self._lock:
+            # (keeping a reference to the dict, so that its id() is not reused)
+            self._hashed[key] = (message, message_id)
+            if len(self._hashed) > self._MAX_HASHED:
+                self._hashed.popitem(last=False)
+        return message_id
+
+    def _get_blob_path(self, message_id: str) -> Path:
+        return self.path / message_id[:2] / f"{message_id}.json"
+
+
+# :: directory -> store of the messages in it
+_g_message_blob_stores: dict[Path, MessageBlobStore] = {}
+_g_message_blob_stores_lock = threading.Lock()
+
+
+def get_message_blob_store(path: str | Path, **kwargs) -> MessageBlobStore:
+    """Returns the store of a directory, creating it (with `kwargs`) if needed."""
+    path = Path(path).resolve()
+    with _g_message_blob_stores_lock:
+        store = _g_message_blob_stores.get(path)
+        if store is None:
+            store = _g_message_blob_stores[path] = MessageBlobStore(path, **kwargs)
+        return store
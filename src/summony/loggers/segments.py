@@ -0,0 +1,384 @@
+import atexit
+from bisect import bisect_right
+import datetime
+import gzip
+import importlib
+import importlib.util
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+import uuid
+from typing import IO, Any, Literal
+
+from .loggers import BaseXLogger, _DEFAULT_LOGS_PATH
+from .message_blobs import MessageBlobStore
+from .writer import LogWriter, encode_compact, g_log_writer
+
+
+g_logger = logging.getLogger(__name__)
+
+
+Compression = Literal["gzip", "zstd"]
+
+
+class SegmentedLogStore:
+    """Append-only store of log records, as JSON lines in segment files rotated by
+    size or age (and then compressed by blocks), referenced as `"<segment>#<offset>"`
+    so that reading one takes a single seek. I/O is done by `writer` (if any)."""
+
+    path: Path
+    max_segment_bytes: int
+    max_segment_age: float | None
+    compression: Compression | None
+    block_size: int
+
+    _writer: LogWriter | None
+    _run: str
+    # (the segment records are appended to, as of `append`)
+    _segment_idx: int
+    _segment_name: str | None
+    _segment_size: int
+    _segment_started_at: float
+    # :: segment name -> bytes written (and flushed) of this store's segments still
+    #    being written
+    _flushed_sizes: dict[str, int]
+    # (the segment file being written to, only used from the writer's thread)
+    _file: IO[bytes] | None
+    _file_name: str | None
+    # :: segment name -> its `.idx` data (compression, blocks)
+    _indexes: dict[str, dict[str, Any]]
+    _swept: bool
+
+    # static
+    _COMPRESSED_EXTS = {"gzip": ".gz", "zstd": ".zst"}
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_age: float | None = 24 * 3600,
+        compression: Compression | None = "gzip",
+        block_size: int = 1024 * 1024,
+        writer: LogWriter | None = g_log_writer,
+    ):
+        if compression == "zstd" and importlib.util.find_spec("zstandard") is None:
+            g_logger.warning(
+                "SegmentedLogStore: `zstandard` is not installed, using gzip"
+            )
+            compression = "gzip"
+        self.path = Path(path)
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.compression = compression
+        self.block_size = block_size
+        self._writer = writer
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self._run = (
+            now.strftime("%Y-%m-%d_%H-%M-%S_") + f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        )
+        self._segment_idx = 0
+        self._segment_name = None
+        self._segment_size = 0
+        self._segment_started_at = 0.0
+        self._flushed_sizes = {}
+        self._file = None
+        self._file_name = None
+        self._indexes = {}
+        self._swept = False
+        # (reentrant, records being written under it when there's no writer)
+        self._lock = threading.RLock()
+        if writer is not None:
+            writer.add_periodic_flush(self._flush_file)
+
+    def append(self, record: dict[str, Any]) -> str:
+        """Appends a record, returning its reference."""
+        encoded = encode_compact(record) + b"\n"
+        with self._lock:
+            if self._segment_name is None or self._should_rotate():
+                # (<date>_<time>_<pid>-<random>_<segment number>)
+                self._segment_name = f"{self._run}_{self._segment_idx:06d}"
+                self._segment_idx += 1
+                self._segment_size = 0
+                self._segment_started_at = time.monotonic()
+                self._flushed_sizes[self._segment_name] = 0
+            name = self._segment_name
+            offset = self._segment_size
+            self._segment_size += len(encoded)
+            if self._writer is None:
+                self._write_record(name, encoded)
+        if self._writer is not None:
+            self._writer.submit(self._write_record, name, encoded)
+        return f"{name}#{offset}"
+
+    def read(self, ref: str) -> dict[str, Any]:
+        name, offset = ref.rsplit("#", 1)
+        offset = int(offset)
+        with self._lock:
+            flushed_size = self._flushed_sizes.get(name)
+        if flushed_size is not None and offset >= flushed_size:
+            # (not written yet)
+            self.flush()
+        try:
+            with open(self.path / f"{name}.jsonl", "rb") as f:
+                f.seek(offset)
+                return json.loads(f.readline())
+        except FileNotFoundError:
+            # (compressed since)
+            return self._read_compressed(name, offset)
+
+    def flush(self) -> None:
+        """Waits for the records appended so far to be written (and flushed)."""
+        self._run_io(self._flush_file)
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self) -> None:
+        """Closes the active segment, left to be compressed by the next store using
+        the directory."""
+        self._run_io(self._close_file, False)
+        if self._writer is not None:
+            self._writer.flush()
+
+    def _should_rotate(self) -> bool:
+        return self._segment_size >= self.max_segment_bytes or (
+            self.max_segment_age is not None
+            and time.monotonic() - self._segment_started_at >= self.max_segment_age
+        )
+
+    def _run_io(self, fn, *args) -> None:
+        if self._writer is not None:
+            self._writer.submit(fn, *args)
+        else:
+            with self._lock:
+                fn(*args)
+
+    # (the methods below run on the writer's thread)
+
+    def _write_record(self, name: str, encoded: bytes) -> None:
+        if self._file_name != name:
+            self._close_file(compress=True)
+            self._open_file(name)
+        self._file.write(encoded)
+
+    def _open_file(self, name: str) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not self._swept:
+            self._swept = True
+            self._compress_orphans()
+        self._file = open(self.path / f"{name}.jsonl", "ab")
+        self._file_name = name
+
+    def _close_file(self, compress: bool) -> None:
+        if self._file is None:
+            return
+        self._flush_file()
+        self._file.close()
+        name = self._file_name
+        self._file = self._file_name = None
+        with self._lock:
+            rotated = name != self._segment_name
+            if rotated:
+                # (so fully written)
+                self._flushed_sizes.pop(name, None)
+        if rotated and compress and self.compression is not None:
+            self._compress(name)
+
+    def _flush_file(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            with self._lock:
+                self._flushed_sizes[self._file_name] = self._file.tell()
+
+    def _compress_orphans(self) -> None:
+        """Compresses the segments left uncompressed by processes that exited."""
+        if self.compression is None:
+            return
+        for raw_path in self.path.glob("*.jsonl"):
+            try:
+                # (<date>_<time>_<pid>-<random>_<segment number>)
+                pid = int(raw_path.stem.split("_")[2].split("-")[0])
+            except (IndexError, ValueError):
+                continue
+            if pid != os.getpid() and not _is_process_alive(pid):
+                self._compress(raw_path.stem)
+
+    def _compress(self, name: str) -> None:
+        raw_path = self.path / f"{name}.jsonl"
+        compressed_path = self._get_compressed_path(name)
+        compress = _get_compress(self.compression)
+        # :: [uncompressed start, compressed start] of every block
+        blocks = []
+        try:
+            with open(raw_path, "rb") as src, open(
+                _get_tmp_path(compressed_path), "wb"
+            ) as dst:
+                raw_offset = 0
+                while block := src.read(self.block_size):
+                    # (blocks end with a whole record)
+                    block += src.readline()
+                    blocks.append([raw_offset, dst.tell()])
+                    dst.write(compress(block))
+                    raw_offset += len(block)
+                blocks.append([raw_offset, dst.tell()])
+            index = {"compression": self.compression, "blocks": blocks}
+            index_path = self.path / f"{name}.idx"
+            with open(_get_tmp_path(index_path), "w") as f:
+                json.dump(index, f)
+            # (the raw segment is removed only once both are in place, for readers)
+            _get_tmp_path(compressed_path).replace(compressed_path)
+            _get_tmp_path(index_path).replace(index_path)
+            with self._lock:
+                self._indexes[name] = index
+            raw_path.unlink()
+        except Exception as exc:
+            g_logger.warning(
+                "SegmentedLogStore: Failed to compress segment %s: %s", name, exc
+            )
+
+    # (and these on the readers')
+
+    def _load_index(self, name: str) -> dict[str, Any]:
+        with open(self.path / f"{name}.idx") as f:
+            index = json.load(f)
+        with self._lock:
+            self._indexes[name] = index
+        return index
+
+    def _read_compressed(self, name: str, offset: int) -> dict[str, Any]:
+        with self._lock:
+            index = self._indexes.get(name)
+        if index is None:
+            index = self._load_index(name)
+        raw_starts = [b[0] for b in index["blocks"]]
+        compressed_starts = [b[1] for b in index["blocks"]]
+        compression = index["compression"]
+        block_idx = bisect_right(raw_starts, offset) - 1
+        if not 0 <= block_idx < len(raw_starts) - 1:
+            raise ValueError(f"SegmentedLogStore: no record at {name}#{offset}")
+        with open(self._get_compressed_path(name, compression), "rb") as f:
+            f.seek(compressed_starts[block_idx])
+            block = _get_decompress(compression)(
+                f.read(compressed_starts[block_idx + 1] - compressed_starts[block_idx])
+            )
+        start = offset - raw_starts[block_idx]
+        return json.loads(block[start : block.index(b"\n", start)])
+
+    def _get_compressed_path(
+        self, name: str, compression: Compression | None = None
+    ) -> Path:
+        ext = self._COMPRESSED_EXTS[compression or self.compression]
+        return self.path / f"{name}.jsonl{ext}"
+
+
+def _get_tmp_path(path: Path) -> Path:
+    # (per process, in case several compress the same orphaned segment)
+    return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+
+def _is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # (alive, but someone else's)
+        return True
+    return True
+
+
+def _get_compress(compression: Compression):
+    if compression == "zstd":
+        return importlib.import_module("zstandard").ZstdCompressor().compress
+    return gzip.compress
+
+
+def _get_decompress(compression: Compression):
+    if compression == "zstd":
+        return importlib.import_module("zstandard").ZstdDecompressor().decompress
+    return gzip.decompress
+
+
+# :: directory -> store appending to it (shared by all loggers of the process)
+_g_segmented_log_stores: dict[Path, SegmentedLogStore] = {}
+_g_segmented_log_stores_lock = threading.Lock()
+
+
+def get_segmented_log_store(
+    path: str | Path | None = None, **kwargs
+) -> SegmentedLogStore:
+    """Returns the store of a directory (by default `logs/segments`), creating it
+    (with `kwargs`) if needed."""
+    path = Path(path).resolve() if path is not None else _DEFAULT_LOGS_PATH / "segments"
+    with _g_segmented_log_stores_lock:
+        store = _g_segmented_log_stores.get(path)
+        if store is None:
+            store = _g_segmented_log_stores[path] = SegmentedLogStore(path, **kwargs)
+        return store
+
+
+def _close_segmented_log_stores() -> None:
+    with _g_segmented_log_stores_lock:
+        stores = list(_g_segmented_log_stores.values())
+    for store in stores:
+        store.close()
+
+
+atexit.register(_close_segmented_log_stores)
+
+
+class SegmentedXLogger(BaseXLogger):
+    """Logs model calls as records of a (shared) `SegmentedLogStore` instead of one file
+    per call, log paths being the records' references."""
+
+    store: SegmentedLogStore
+
+    def __init__(
+        self,
+        logger: logging.Logger | None = None,
+        name: str | None = None,
+        store: SegmentedLogStore | None = None,
+        message_blobs: MessageBlobStore | None = None,
+    ):
+        super().__init__(logger, name, message_blobs)
+        self.store = store if store is not None else get_segmented_log_store()
+
+    def log_model_call(
+        self,
+        *,
+        req_content: dict,
+        req_base_url: str | None = None,
+        req_url: str | None = None,
+        req_headers: dict | None = None,
+        res_content: dict = None,
+        res_status_code: int | None = None,
+        res_headers: dict | None = None,
+        error: Exception | None = None,
+    ):
+        to_log = {
+            # (what the file names say, for the one file per call logs)
+            "logger": self._name,
+            "logged_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            **self._make_model_call_record(
+                req_content,
+                req_base_url,
+                req_url,
+                req_headers,
+                res_content,
+                res_status_code,
+                res_headers,
+                error,
+            ),
+        }
+        return self.store.append(to_log)
+
+    def read_model_call(self, log_path: str) -> dict | None:
+        try:
+            return self._expand_record(self.store.read(log_path))
+        except (FileNotFoundError, ValueError, IndexError):
+            return None
+
+    def flush(self) -> None:
+        self.store.flush()
@@ -0,0 +1,184 @@
+import atexit
+import importlib
+import importlib.util
+import json
+import logging
+from pathlib import Path
+import queue
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable
+import weakref
+
+
+g_logger = logging.getLogger(__name__)
+
+
+class LogWriter:
+    """Writes model call logs (and runs other log I/O, see `submit`) from a
+    background thread, in batches, so that logging a call only costs queueing it."""
+
+    # (single line JSON records, see `encode_compact`)
+    compact: bool
+    max_batch_size: int
+    # (seconds between calls of the `add_periodic_flush` callbacks)
+    flush_interval: float
+
+    _queue: queue.Queue
+    _thread: threading.Thread | None
+    _closed: bool
+    # (weak, not to keep their loggers alive)
+    _periodic_flushes: list[weakref.WeakMethod]
+
+    # static
+    _STOP = object()
+
+    def __init__(
+        self,
+        compact: bool = False,
+        max_queue_size: int = 1024,
+        max_batch_size: int = 64,
+        flush_interval: float = 1.0,
+    ):
+        self.compact = compact
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._closed = False
+        self._periodic_flushes = []
+        self._lock = threading.Lock()
+
+    def write(self, path: Path, record: dict[str, Any]) -> None:
+        """Queues `record` (not to be mutated afterwards) to be written, JSON encoded,
+        to the file at `path`."""
+        self.submit(self._write_file, path, record)
+
+    def submit(self, fn: Callable[..., Any], *args) -> None:
+        """Queues `fn(*args)` to be run on the writer thread (after everything
+        queued before it), or runs it right away once the writer is closed."""
+        if self._closed:
+            self._run_batch([(fn, args)])
+            return
+        self._ensure_started()
+        self._queue.put((fn, args))
+
+    def add_periodic_flush(self, flush: Callable[[], None]) -> None:
+        """Has the (bound) method `flush` called from the writer thread every
+        `flush_interval` seconds, as long as its object lives."""
+        with self._lock:
+            self._periodic_flushes.append(weakref.WeakMethod(flush))
+
+    def flush(self) -> None:
+        """Waits for everything queued so far to be done."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(self._STOP)
+            thread.join()
+
+    def encode(self, record: dict[str, Any]) -> bytes:
+        if not self.compact:
+            return json.dumps(record, ensure_ascii=True, indent=2).encode("utf-8")
+        return encode_compact(record)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="summony-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        next_flush_at = time.monotonic() + self.flush_interval
+        while True:
+            # (only waking up for periodic flushes when there are some)
+            timeout = (
+                max(0.0, next_flush_at - time.monotonic())
+                if self._periodic_flushes
+                else None
+            )
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._run_batch([item for item in batch if item is not self._STOP])
+                if time.monotonic() >= next_flush_at:
+                    self._run_periodic_flushes()
+                    next_flush_at = time.monotonic() + self.flush_interval
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if any(item is self._STOP for item in batch):
+                self._run_periodic_flushes()
+                return
+
+    def _run_batch(self, batch: list[tuple[Callable[..., Any], tuple]]) -> None:
+        for fn, args in batch:
+            try:
+                fn(*args)
+            except Exception as exc:
+                g_logger.warning("LogWriter: Failed to run %s: %s", fn.__name__, exc)
+
+    def _run_periodic_flushes(self) -> None:
+        with self._lock:
+            flushes = [f() for f in self._periodic_flushes]
+            self._periodic_flushes = [
+                f for f, flush in zip(self._periodic_flushes, flushes) if flush
+            ]
+        self._run_batch([(flush, ()) for flush in flushes if flush is not None])
+
+    def _write_file(self, path: Path, record: dict[str, Any]) -> None:
+        try:
+            encoded = self.encode(record)
+            with open(path, "wb") as f:
+                f.write(encoded)
+        except Exception as exc:
+            g_logger.warning("LogWriter: Failed to write %s: %s", path, exc)
+
+
+def encode_compact(record: dict[str, Any]) -> bytes:
+    """Single line JSON encoding of a log record (with `orjson` if installed)."""
+    orjson = _get_orjson()
+    if orjson is not None:
+        return orjson.dumps(record, default=str)
+    return json.dumps(
+        record, ensure_ascii=False, separators=(",", ":"), default=str
+    ).encode("utf-8")
+
+
+_g_orjson: ModuleType | None | bool = False
+
+
+def _get_orjson() -> ModuleType | None:
+    global _g_orjson
+    if _g_orjson is False:
+        _g_orjson = (
+            importlib.import_module("orjson")
+            if importlib.util.find_spec("orjson") is not None
+            else None
+        )
+    return _g_orjson
+
+
+# (shared by all loggers, so there's a single writer thread)
+g_log_writer = LogWriter()
+
+atexit.register(g_log_writer.close)
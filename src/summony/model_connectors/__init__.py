@@ -1,11 +1,24 @@
 from .model_connectors import MessageDict
 from .model_connectors import ModelConnectorInterface
-from .openai_model_connector import OpenAIModelConnector
-from .xai_model_connector import XAIModelConnector
-from .deepseek_model_connector import DeepSeekModelConnector
-from .anthropic_model_connector import AnthropicModelConnector
-from .gemini_model_connector import GeminiModelConnector
-from .ollama_model_connector import OllamaModelConnector
-from .dummy_model_connector import DummyModelConnector
+from .model_connectors import ModelConnectorWrapper, unwrap_connector
+from .client_pool import ClientPool, ClientPoolConfig, g_client_pool
+from .hedging import HedgingModelConnector
+from .retrying import RetryingModelConnector
+from .rate_limiting import RateLimitedModelConnector
+from .priority import Priority, call_priority
+from .adaptive_concurrency import AdaptiveConcurrencyModelConnector
+from .circuit_breaker import (
+    CircuitBreakerModelConnector,
+    CircuitOpenError,
+    get_circuit_breaker,
+)
 
-from .factory import get_default_connector_for_model
+from .factory import connector_classes, get_default_connector_for_model
+
+
+def __getattr__(name: str):
+    # connector classes (eg. `OpenAIModelConnector`) are imported on first use, with
+    # their SDK
+    if name in connector_classes:
+        return connector_classes[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,336 @@
+import asyncio
+from dataclasses import dataclass
+import logging
+import threading
+import time
+from typing import AsyncIterator, Iterator, Literal, Tuple
+
+from .model_connectors import (
+    ModelConnectorInterface,
+    ModelConnectorWrapper,
+    MessageDict,
+    is_call_timed_out,
+    unwrap_connector,
+)
+from .priority import (
+    Priority,
+    PriorityWaitQueue,
+    QueueWaiter,
+    QueueWaitStats,
+    get_call_priority,
+    is_event_loop_thread,
+)
+from .retrying import get_error_status_code
+
+
+g_logger = logging.getLogger(__name__)
+
+
+# status codes meaning the endpoint is overloaded (or we are over its limits)
+_OVERLOAD_STATUS_CODES = frozenset((408, 429, 503, 504, 529))
+
+CallOutcome = Literal["ok", "overload", "error", "cancelled"]
+
+
+@dataclass
+class ConcurrencyStats:
+    admitted: int = 0
+    increases: int = 0
+    decreases: int = 0
+    overloads: int = 0
+    latency_spikes: int = 0
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    status_code = get_error_status_code(exc)
+    if status_code is not None:
+        return status_code in _OVERLOAD_STATUS_CODES
+    return isinstance(exc, TimeoutError) or any(
+        "Timeout" in cls.__name__ for cls in type(exc).__mro__
+    )
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limits in-flight requests to an endpoint, growing the limit additively while it's
+    reached and cutting it on overloads and latency spikes (time to first chunk).
+    Waiting requests are admitted by priority. Thread (and event loop) safe."""
+
+    limit: float
+    min_limit: int
+    max_limit: int
+    increase: float
+    decrease_factor: float
+    latency_spike_ratio: float
+    decrease_cooldown: float
+    stats: ConcurrencyStats
+
+    in_flight: int
+    # moving average of healthy latencies
+    _baseline_latency: float | None
+    _last_decrease_at: float
+    _waiting: PriorityWaitQueue
+
+    # static
+    _BASELINE_ALPHA = 0.1
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_spike_ratio: float = 3.0,
+        decrease_cooldown: float = 1.0,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_spike_ratio = latency_spike_ratio
+        self.decrease_cooldown = decrease_cooldown
+        self.stats = ConcurrencyStats()
+        self.in_flight = 0
+        self._baseline_latency = None
+        self._last_decrease_at = float("-inf")
+        self._waiting = PriorityWaitQueue()
+        self._lock = threading.Lock()
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def queue_stats(self) -> dict[Priority, QueueWaitStats]:
+        """Queue wait time stats per priority class."""
+        return self._waiting.stats
+
+    async def acquire(self) -> None:
+        waiter = QueueWaiter(asyncio.get_running_loop())
+        ticket = self._enqueue(waiter)
+        try:
+            while True:
+                waiter.clear()
+                if self._try_admit(ticket):
+                    break
+                await waiter.wait_async()
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+
+    def acquire_sync(self) -> None:
+        waiter = QueueWaiter()
+        # (when blocking an event loop, its waiting requests can't go before this one,
+        # nor its in-flight ones free their slots)
+        blocks_loop = is_event_loop_thread()
+        ticket = self._enqueue(waiter, ahead=blocks_loop)
+        try:
+            while True:
+                waiter.clear()
+                if self._try_admit(ticket, over_limit=blocks_loop):
+                    break
+                waiter.wait()
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+
+    def release(self, outcome: CallOutcome, latency: float | None = None) -> None:
+        """Frees a slot, adapting the limit to the call's outcome and latency (time to
+        first chunk, for streams)."""
+        with self._lock:
+            # (only growing when the limit is what holds requests back)
+            saturated = self.in_flight >= int(self.limit) or len(self._waiting) > 0
+            self.in_flight -= 1
+            if outcome == "overload":
+                self.stats.overloads += 1
+                self._decrease()
+            elif outcome == "ok":
+                baseline = self._baseline_latency
+                if (
+                    latency is not None
+                    and baseline is not None
+                    and latency > self.latency_spike_ratio * baseline
+                ):
+                    self.stats.latency_spikes += 1
+                    self._decrease()
+                else:
+                    if latency is not None:
+                        self._baseline_latency = (
+                            latency
+                            if baseline is None
+                            else baseline + self._BASELINE_ALPHA * (latency - baseline)
+                        )
+                    if saturated:
+                        self._increase()
+            # (handing the freed slot, or the new ones, to the next request)
+            self._waiting.wake_next()
+
+    def _increase(self) -> None:
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self.stats.increases += 1
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease_at < self.decrease_cooldown:
+            return
+        self._last_decrease_at = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self.stats.decreases += 1
+
+    def _enqueue(
+        self, waiter: QueueWaiter, ahead: bool = False
+    ) -> tuple[Priority, int]:
+        with self._lock:
+            return self._waiting.enqueue(get_call_priority(), waiter, ahead)
+
+    def _dequeue(self, ticket: tuple[Priority, int]) -> None:
+        with self._lock:
+            self._waiting.remove(ticket)
+
+    def _try_admit(
+        self, ticket: tuple[Priority, int], over_limit: bool = False
+    ) -> bool:
+        with self._lock:
+            if not self._waiting.is_next(ticket) or (
+                self.in_flight >= int(self.limit) and not over_limit
+            ):
+                return False
+            self._waiting.pop(ticket)
+            self.in_flight += 1
+            self.stats.admitted += 1
+            return True
+
+
+# :: base url -> limiter shared by all connectors sending requests there
+_g_concurrency_limiters: dict[str, AdaptiveConcurrencyLimiter] = {}
+_g_concurrency_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(base_url: str, **kwargs) -> AdaptiveConcurrencyLimiter:
+    """Returns the limiter of the endpoint, creating it (with `kwargs`) if needed
+    (differing settings being ignored, with a warning)."""
+    with _g_concurrency_limiters_lock:
+        limiter = _g_concurrency_limiters.get(base_url)
+        if limiter is None:
+            limiter = _g_concurrency_limiters[base_url] = AdaptiveConcurrencyLimiter(
+                **kwargs
+            )
+            return limiter
+    ignored = {
+        k: v
+        for k, v in kwargs.items()
+        # (the initial limit having adapted since)
+        if k != "initial_limit" and getattr(limiter, k) != v
+    }
+    if ignored:
+        g_logger.warning(
+            "get_concurrency_limiter: %s already has a limiter, ignoring %s",
+            base_url,
+            ignored,
+        )
+    return limiter
+
+
+def get_concurrency_limiters() -> dict[str, AdaptiveConcurrencyLimiter]:
+    """All endpoints' limiters, eg. for monitoring their `current_limit` and
+    `queue_depth`."""
+    with _g_concurrency_limiters_lock:
+        return dict(_g_concurrency_limiters)
+
+
+class AdaptiveConcurrencyModelConnector(ModelConnectorWrapper):
+    """Caps in-flight requests per endpoint (`get_base_url()`) with an adaptive limit,
+    see `AdaptiveConcurrencyLimiter`."""
+
+    limiter: AdaptiveConcurrencyLimiter
+
+    def __init__(
+        self,
+        inner: ModelConnectorInterface,
+        logger: logging.Logger | None = None,
+        **limiter_kwargs,
+    ):
+        super().__init__(inner, logger)
+        self.limiter = get_concurrency_limiter(
+            unwrap_connector(inner).get_base_url(), **limiter_kwargs
+        )
+
+    def generate(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        self.limiter.acquire_sync()
+        try:
+            result = self.inner.generate(messages, model, **kwargs)
+        except BaseException as exc:
+            self.limiter.release(self._get_error_outcome(exc))
+            raise
+        self.limiter.release("ok")
+        return result
+
+    async def generate_async(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        await self.limiter.acquire()
+        try:
+            result = await self.inner.generate_async(messages, model, **kwargs)
+        except BaseException as exc:
+            self.limiter.release(self._get_error_outcome(exc))
+            raise
+        self.limiter.release("ok")
+        return result
+
+    def generate_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Iterator[Tuple[str, dict]]:
+        self.limiter.acquire_sync()
+        started_at = time.monotonic()
+        first_chunk_latency = None
+        outcome = "cancelled"
+        try:
+            for chunk in self.inner.generate_stream(messages, model, **kwargs):
+                if first_chunk_latency is None:
+                    first_chunk_latency = time.monotonic() - started_at
+                yield chunk
+            outcome = "ok"
+        except BaseException as exc:
+            outcome = self._get_error_outcome(exc)
+            raise
+        finally:
+            self.limiter.release(outcome, first_chunk_latency)
+
+    async def generate_async_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        await self.limiter.acquire()
+        started_at = time.monotonic()
+        first_chunk_latency = None
+        outcome = "cancelled"
+        try:
+            async for chunk in self.inner.generate_async_stream(
+                messages, model, **kwargs
+            ):
+                if first_chunk_latency is None:
+                    first_chunk_latency = time.monotonic() - started_at
+                yield chunk
+            outcome = "ok"
+        except BaseException as exc:
+            outcome = self._get_error_outcome(exc)
+            raise
+        finally:
+            self.limiter.release(outcome, first_chunk_latency)
+
+    @staticmethod
+    def _get_error_outcome(exc: BaseException) -> CallOutcome:
+        if not isinstance(exc, Exception) and is_call_timed_out():
+            # (stopped at its deadline, see `CallDeadline`)
+            return "overload"
+        if not isinstance(exc, Exception):
+            # (cancelled, or the stream closed early by its consumer)
+            return "cancelled"
+        return "overload" if is_overload_error(exc) else "error"
@@ -5,16 +5,23 @@ from typing import (
     AsyncIterator,
     Callable,
     Coroutine,
+    Hashable,
     Iterator,
     Literal,
     Self,
     Tuple,
 )
 
-from anthropic import Anthropic, AsyncAnthropic
+from anthropic import (
+    Anthropic,
+    AsyncAnthropic,
+    DefaultHttpxClient,
+    DefaultAsyncHttpxClient,
+)
 from anthropic.types import Message as AnthropicMessage, MessageStreamEvent
 
-from .model_connectors import ModelConnectorInterface, MessageDict
+from .model_connectors import ModelConnectorInterface, MessageDict, warm_up_http_client
+from .client_pool import g_client_pool, make_client_key
 
 
 g_logger = logging.getLogger(__name__)
@@ -24,7 +31,8 @@ class AnthropicModelConnector(ModelConnectorInterface):
     logger: logging.Logger
 
     client: Anthropic
-    async_client: AsyncAnthropic
+    _async_client_key: Hashable
+    _make_async_client: Callable[[], AsyncAnthropic]
 
     # static
     _DEFAULT_MAX_TOKENS = 4096
@@ -53,10 +61,26 @@ class AnthropicModelConnector(ModelConnectorInterface):
         api_key = creds.get("api_key") if creds else os.environ["ANTHROPIC_API_KEY"]
         if client_args is None:
             client_args = {}
-        self.client = Anthropic(api_key=api_key, **client_args)
-        self.async_client = AsyncAnthropic(api_key=api_key, **client_args)
+        # (shared with all connectors using the same api key and client args)
+        self.client = g_client_pool.get(
+            make_client_key(Anthropic, api_key, client_args),
+            lambda: Anthropic(
+                api_key=api_key,
+                **g_client_pool.with_http_client_args(client_args, DefaultHttpxClient),
+            ),
+        )
+        self._async_client_key = make_client_key(AsyncAnthropic, api_key, client_args)
+        self._make_async_client = lambda: AsyncAnthropic(
+            api_key=api_key,
+            **g_client_pool.with_http_client_args(client_args, DefaultAsyncHttpxClient),
+        )
         self.logger = logger if logger is not None else g_logger
 
+    @property
+    def async_client(self) -> AsyncAnthropic:
+        # (one per event loop, see `ClientPool.get_async`)
+        return g_client_pool.get_async(self._async_client_key, self._make_async_client)
+
     def generate(
         self, messages: list[MessageDict], model: str, **kwargs
     ) -> Tuple[str, dict]:
@@ -97,11 +121,15 @@ class AnthropicModelConnector(ModelConnectorInterface):
             **self._make_message_create_args(messages, model, kwargs), stream=True
         )
         i = 0
-        async for event in stream:
-            chunk_text, chunk_dict = self._process_stream_event(event, i)
-            if chunk_text:
-                yield chunk_text, chunk_dict
-            i += 1
+        try:
+            async for event in stream:
+                chunk_text, chunk_dict = self._process_stream_event(event, i)
+                if chunk_text:
+                    yield chunk_text, chunk_dict
+                i += 1
+        finally:
+            # (also when the consumer stops early, eg. on timeouts or cancelling)
+            await stream.close()
 
     def _process_stream_event(
         self, event: MessageStreamEvent, event_idx: int
@@ -126,6 +154,11 @@ class AnthropicModelConnector(ModelConnectorInterface):
     def get_base_url(self) -> str:
         return str(self.client.base_url)
 
+    async def warmup(self, model: str) -> None:
+        await warm_up_http_client(
+            self.async_client._client, self.get_base_url(), self.logger
+        )
+
     @classmethod
     def _make_message_create_args(
         cls, messages: list[dict], model: str, extra_args: dict
@@ -0,0 +1,316 @@
+from dataclasses import dataclass
+import logging
+import threading
+import time
+from typing import AsyncIterator, Iterator, Literal, Tuple
+
+from .model_connectors import (
+    ModelConnectorInterface,
+    ModelConnectorWrapper,
+    MessageDict,
+    is_call_timed_out,
+    unwrap_connector,
+)
+from .retrying import get_error_status_code, is_retryable_error
+
+
+g_logger = logging.getLogger(__name__)
+
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+    def __init__(self, base_url: str, retry_in: float):
+        super().__init__(
+            f"Endpoint {base_url} is unavailable (circuit open), "
+            f"next try in {retry_in:.0f}s"
+        )
+        self.base_url = base_url
+        self.retry_in = retry_in
+
+
+@dataclass
+class CircuitBreakerStats:
+    calls: int = 0
+    failures: int = 0
+    # calls failed fast, without reaching the endpoint
+    rejected: int = 0
+    opened: int = 0
+
+
+def is_endpoint_failure(exc: BaseException) -> bool:
+    """Whether an error means the endpoint is unhealthy (5xx, connection errors,
+    timeouts), as opposed to eg. a bad request or being rate limited."""
+    status_code = get_error_status_code(exc)
+    if status_code is not None:
+        return status_code >= 500
+    return is_retryable_error(exc)
+
+
+class CircuitBreaker:
+    """Tracks an endpoint's health: opens after `failure_threshold` consecutive failures
+    (timeouts included, unless `timeouts_are_failures` is False), rejecting calls for
+    `recovery_timeout` seconds, then lets probes through to close it again."""
+
+    base_url: str
+    failure_threshold: int
+    recovery_timeout: float
+    half_open_max_calls: int
+    timeouts_are_failures: bool
+    stats: CircuitBreakerStats
+
+    _state: CircuitState
+    _consecutive_failures: int
+    _opened_at: float
+    _probes_in_flight: int
+
+    def __init__(
+        self,
+        base_url: str = "",
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        timeouts_are_failures: bool = True,
+    ):
+        self.base_url = base_url
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.timeouts_are_failures = timeouts_are_failures
+        self.stats = CircuitBreakerStats()
+        self._state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._get_state()
+
+    def allows_calls(self) -> bool:
+        """Whether a call made now would go through (and not fail fast)."""
+        with self._lock:
+            state = self._get_state()
+            return state == "closed" or (
+                state == "half_open"
+                and self._probes_in_flight < self.half_open_max_calls
+            )
+
+    def get_retry_in(self) -> float:
+        """Seconds until calls are let through again (0 if they already are)."""
+        with self._lock:
+            if self._get_state() != "open":
+                return 0.0
+            return self._opened_at + self.recovery_timeout - time.monotonic()
+
+    def before_call(self) -> bool:
+        """Raises `CircuitOpenError` if the call must fail fast, else returns whether
+        it is a (half-open) probe."""
+        with self._lock:
+            state = self._get_state()
+            if state == "closed":
+                self.stats.calls += 1
+                return False
+            if (
+                state == "half_open"
+                and self._probes_in_flight < self.half_open_max_calls
+            ):
+                self.stats.calls += 1
+                self._probes_in_flight += 1
+                return True
+            self.stats.rejected += 1
+            retry_in = max(
+                0.0, self._opened_at + self.recovery_timeout - time.monotonic()
+            )
+        raise CircuitOpenError(self.base_url, retry_in)
+
+    def record_success(self, is_probe: bool) -> None:
+        with self._lock:
+            if is_probe:
+                self._probes_in_flight -= 1
+            if self._state != "closed":
+                g_logger.info("CircuitBreaker: %s recovered", self.base_url)
+            self._state = "closed"
+            self._consecutive_failures = 0
+
+    def record_failure(self, is_probe: bool) -> None:
+        with self._lock:
+            if is_probe:
+                self._probes_in_flight -= 1
+            self.stats.failures += 1
+            self._consecutive_failures += 1
+            if is_probe or (
+                self._state == "closed"
+                and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._open()
+
+    def record_neutral(self, is_probe: bool) -> None:
+        """For calls that ended without telling anything about the endpoint's health
+        (eg. cancelled)."""
+        with self._lock:
+            if is_probe:
+                self._probes_in_flight -= 1
+
+    def _open(self) -> None:
+        if self._state != "open":
+            self.stats.opened += 1
+            g_logger.warning(
+                "CircuitBreaker: %s is failing, opening the circuit for %.0fs",
+                self.base_url,
+                self.recovery_timeout,
+            )
+        self._state = "open"
+        self._opened_at = time.monotonic()
+
+    def _get_state(self) -> CircuitState:
+        if (
+            self._state == "open"
+            and time.monotonic() >= self._opened_at + self.recovery_timeout
+        ):
+            self._state = "half_open"
+        return self._state
+
+
+# :: base url -> breaker shared by all connectors sending requests there
+_g_circuit_breakers: dict[str, CircuitBreaker] = {}
+_g_circuit_breakers_lock = threading.Lock()
+
+
+def get_endpoint_circuit_breaker(base_url: str, **kwargs) -> CircuitBreaker:
+    """Returns the breaker of the endpoint, creating it (with `kwargs`) if needed."""
+    with _g_circuit_breakers_lock:
+        breaker = _g_circuit_breakers.get(base_url)
+        if breaker is None:
+            breaker = _g_circuit_breakers[base_url] = CircuitBreaker(base_url, **kwargs)
+        return breaker
+
+
+def get_circuit_breaker(connector: ModelConnectorInterface) -> CircuitBreaker | None:
+    """The breaker guarding a (wrapped) connector, if any."""
+    while isinstance(connector, ModelConnectorWrapper):
+        if isinstance(connector, CircuitBreakerModelConnector):
+            return connector.breaker
+        connector = connector.inner
+    return None
+
+
+class CircuitBreakerModelConnector(ModelConnectorWrapper):
+    """Fails fast (`CircuitOpenError`) while the endpoint is down, see `CircuitBreaker`
+    (to be wrapped by the `RetryingModelConnector`, if any)."""
+
+    breaker: CircuitBreaker
+
+    def __init__(
+        self,
+        inner: ModelConnectorInterface,
+        logger: logging.Logger | None = None,
+        **breaker_kwargs,
+    ):
+        super().__init__(inner, logger)
+        self.breaker = get_endpoint_circuit_breaker(
+            unwrap_connector(inner).get_base_url(), **breaker_kwargs
+        )
+
+    def generate(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        is_probe = self.breaker.before_call()
+        try:
+            result = self.inner.generate(messages, model, **kwargs)
+        except BaseException as exc:
+            self._record_error(exc, is_probe)
+            raise
+        self.breaker.record_success(is_probe)
+        return result
+
+    async def generate_async(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        is_probe = self.breaker.before_call()
+        try:
+            result = await self.inner.generate_async(messages, model, **kwargs)
+        except BaseException as exc:
+            self._record_error(exc, is_probe)
+            raise
+        self.breaker.record_success(is_probe)
+        return result
+
+    def generate_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Iterator[Tuple[str, dict]]:
+        is_probe = self.breaker.before_call()
+        recorded = False
+        try:
+            for chunk in self.inner.generate_stream(messages, model, **kwargs):
+                if not recorded:
+                    # (the endpoint answers, whatever happens next)
+                    self.breaker.record_success(is_probe)
+                    recorded = True
+                yield chunk
+        except BaseException as exc:
+            if not recorded:
+                self._record_error(exc, is_probe)
+                recorded = True
+            elif self._is_timeout(exc):
+                # (the endpoint stalled mid-reply)
+                self.breaker.record_failure(False)
+            raise
+        finally:
+            if not recorded:
+                self.breaker.record_success(is_probe)
+
+    async def generate_async_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        is_probe = self.breaker.before_call()
+        recorded = False
+        try:
+            async for chunk in self.inner.generate_async_stream(
+                messages, model, **kwargs
+            ):
+                if not recorded:
+                    # (the endpoint answers, whatever happens next)
+                    self.breaker.record_success(is_probe)
+                    recorded = True
+                yield chunk
+        except BaseException as exc:
+            if not recorded:
+                self._record_error(exc, is_probe)
+                recorded = True
+            elif self._is_timeout(exc):
+                # (the endpoint stalled mid-reply)
+                self.breaker.record_failure(False)
+            raise
+        finally:
+            if not recorded:
+                # (an empty reply)
+                self.breaker.record_success(is_probe)
+
+    def _record_error(self, exc: BaseException, is_probe: bool) -> None:
+        if self._is_timeout(exc):
+            self.breaker.record_failure(is_probe)
+        elif not isinstance(exc, Exception):
+            # (cancelled, or the stream closed early by its consumer)
+            self.breaker.record_neutral(is_probe)
+        elif is_endpoint_failure(exc):
+            self.breaker.record_failure(is_probe)
+        elif get_error_status_code(exc) is not None:
+            # the endpoint did answer (eg. 400 or 429)
+            self.breaker.record_success(is_probe)
+        else:
+            self.breaker.record_neutral(is_probe)
+
+    def _is_timeout(self, exc: BaseException) -> bool:
+        """Whether the call was stopped for reaching its deadline (and that counts as
+        a failure)."""
+        return (
+            self.breaker.timeouts_are_failures
+            and not isinstance(exc, Exception)
+            and is_call_timed_out()
+        )
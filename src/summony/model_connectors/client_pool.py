@@ -0,0 +1,181 @@
+import asyncio
+import atexit
+from dataclasses import dataclass
+import hashlib
+import importlib.util
+import logging
+import threading
+from typing import Any, Callable, Hashable, TypeVar
+import weakref
+
+from ..utils import FrozenKey
+
+
+g_logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class ClientPoolConfig:
+    max_connections: int | None = 100
+    max_keepalive_connections: int | None = 20
+    # seconds an idle connection is kept open
+    keepalive_expiry: float | None = 60.0
+    # (only used if the `h2` package is installed)
+    http2: bool = True
+
+
+class ClientPool:
+    """Shares provider SDK clients, and so their HTTP connection pools, between the
+    connectors using the same provider, api key and client args (async ones per event
+    loop)."""
+
+    config: ClientPoolConfig
+
+    # :: key -> client
+    _clients: dict[Hashable, Any]
+    # :: event loop -> key -> async client
+    _async_clients: weakref.WeakKeyDictionary[
+        asyncio.AbstractEventLoop, dict[Hashable, Any]
+    ]
+
+    def __init__(self, config: ClientPoolConfig | None = None):
+        self.config = config if config is not None else ClientPoolConfig()
+        self._clients = {}
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, make_client: Callable[[], T]) -> T:
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = make_client()
+            return client
+
+    def get_async(self, key: Hashable, make_client: Callable[[], T]) -> T:
+        """`get` for async clients, which are shared per event loop only (their
+        connections belonging to the loop they were opened from). Outside of a running
+        loop, a new client is returned."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return make_client()
+        with self._lock:
+            clients = self._async_clients.get(loop)
+            if clients is None:
+                clients = self._async_clients[loop] = {}
+            client = clients.get(key)
+            if client is None:
+                client = clients[key] = make_client()
+            return client
+
+    def get_http_client_args(self, http2: bool = True) -> dict[str, Any]:
+        """Args for `httpx.Client`/`httpx.AsyncClient` (or the SDKs' subclasses of
+        them), with the pool's limits and keep-alive."""
+        import httpx
+
+        return dict(
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections,
+                max_keepalive_connections=self.config.max_keepalive_connections,
+                keepalive_expiry=self.config.keepalive_expiry,
+            ),
+            http2=http2 and self.config.http2 and _is_http2_available(),
+        )
+
+    def with_http_client_args(
+        self,
+        client_args: dict[str, Any],
+        http_client_class: type | None = None,
+        http2: bool = True,
+    ) -> dict[str, Any]:
+        """Adds the pool's HTTP settings to an SDK client's args, as an
+        `http_client` made with `http_client_class` if given, else directly
+        (keeping the settings given in `client_args`)."""
+        if http_client_class is not None:
+            if "http_client" in client_args:
+                return client_args
+            return {
+                **client_args,
+                "http_client": http_client_class(**self.get_http_client_args(http2)),
+            }
+        return {**self.get_http_client_args(http2), **client_args}
+
+    def close(self) -> None:
+        """Closes the sync clients' connections and forgets all clients (the async
+        ones can only be closed from their event loop, see `aclose`)."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+        for client in clients:
+            http_client = _get_http_client(client)
+            close = getattr(http_client, "close", None)
+            if close is not None and not asyncio.iscoroutinefunction(close):
+                try:
+                    close()
+                except Exception as exc:
+                    g_logger.warning("ClientPool: Failed to close client: %s", exc)
+
+    async def aclose(self) -> None:
+        """Closes the sync clients' and this event loop's async clients' connections,
+        and forgets them."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            clients += self._async_clients.pop(
+                asyncio.get_running_loop(), {}
+            ).values()
+        for client in clients:
+            http_client = _get_http_client(client)
+            try:
+                if hasattr(http_client, "aclose"):
+                    await http_client.aclose()
+                elif hasattr(http_client, "close"):
+                    http_client.close()
+            except Exception as exc:
+                g_logger.warning("ClientPool: Failed to close client: %s", exc)
+
+    def __len__(self) -> int:
+        return len(self._clients) + sum(
+            len(clients) for clients in self._async_clients.values()
+        )
+
+
+def make_client_key(
+    client_class: type, api_key: str | None, client_args: dict[str, Any]
+) -> Hashable:
+    """Pool key for a client, by its class, api key and args (including base_url)."""
+    try:
+        args_key = FrozenKey(client_args)
+    except TypeError:
+        # unhashable args (eg. a custom http_client): only shared with the same ones
+        args_key = tuple(sorted((k, id(v)) for k, v in client_args.items()))
+    return (
+        f"{client_class.__module__}.{client_class.__qualname__}",
+        hashlib.sha256(str(api_key).encode()).hexdigest() if api_key else None,
+        args_key,
+    )
+
+
+def _get_http_client(client: Any) -> Any:
+    # the httpx client of openai, anthropic and ollama clients
+    return getattr(client, "_client", client)
+
+
+_g_is_http2_available: bool | None = None
+
+
+def _is_http2_available() -> bool:
+    global _g_is_http2_available
+    if _g_is_http2_available is None:
+        _g_is_http2_available = importlib.util.find_spec("h2") is not None
+        if not _g_is_http2_available:
+            g_logger.debug("ClientPool: `h2` is not installed, using HTTP/1.1")
+    return _g_is_http2_available
+
+
+g_client_pool = ClientPool()
+
+atexit.register(g_client_pool.close)
@@ -15,8 +15,6 @@ from typing import (
     Tuple,
 )
 
-from openai import OpenAI, AsyncOpenAI
-
 from .model_connectors import ModelConnectorInterface, MessageDict
 
 
@@ -26,8 +24,6 @@ g_logger = logging.getLogger(__name__)
 class DummyModelConnector(ModelConnectorInterface):
     model_name: str
     logger: logging.Logger
-    client: OpenAI
-    async_client: AsyncOpenAI
 
     def __init__(
         self,
@@ -40,6 +36,17 @@ class DummyModelConnector(ModelConnectorInterface):
     def generate(
         self, messages: list[MessageDict], model: str, **kwargs
     ) -> Tuple[str, dict]:
+        time.sleep(random.uniform(0.3, 0.6))
+        return self._load_random_completion()
+
+    async def generate_async(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        await asyncio.sleep(random.uniform(0.3, 0.6))
+        return self._load_random_completion()
+
+    @staticmethod
+    def _load_random_completion() -> Tuple[str, dict]:
         data_dir = (
             Path(__file__).parent.resolve() / "dummy_model_connector_data" / "simple"
         )
@@ -49,14 +56,8 @@ class DummyModelConnector(ModelConnectorInterface):
             data = json.load(f)
         completion_dict = data["response"]
         completion_text = completion_dict["choices"][0]["message"]["content"]
-        time.sleep(random.uniform(0.3, 0.6))
         return completion_text, completion_dict
 
-    async def generate_async(
-        self, messages: list[MessageDict], model: str, **kwargs
-    ) -> Tuple[str, dict]:
-        return self.generate(messages, model, **kwargs)
-
     def generate_stream(
         self, messages: list[MessageDict], model: str, **kwargs
     ) -> Iterator[Tuple[str, dict]]:
@@ -1,28 +1,37 @@
+from ..utils import LazyClassRegistry
 from .model_connectors import ModelConnectorInterface
-from .anthropic_model_connector import AnthropicModelConnector
-from .openai_model_connector import OpenAIModelConnector
-from .xai_model_connector import XAIModelConnector
-from .deepseek_model_connector import DeepSeekModelConnector
-from .gemini_model_connector import GeminiModelConnector
-from .ollama_model_connector import OllamaModelConnector
-from .dummy_model_connector import DummyModelConnector
+
+
+# (provider SDKs only get imported when their connector is first used)
+connector_classes = LazyClassRegistry(
+    __package__,
+    {
+        "OpenAIModelConnector": "openai_model_connector",
+        "XAIModelConnector": "xai_model_connector",
+        "DeepSeekModelConnector": "deepseek_model_connector",
+        "AnthropicModelConnector": "anthropic_model_connector",
+        "GeminiModelConnector": "gemini_model_connector",
+        "OllamaModelConnector": "ollama_model_connector",
+        "DummyModelConnector": "dummy_model_connector",
+    },
+)
 
 
 def get_default_connector_for_model(model: str) -> ModelConnectorInterface:
     if model.startswith("dummy"):
-        return DummyModelConnector()
+        return connector_classes["DummyModelConnector"]()
     elif model.startswith("gpt") or model.startswith("o1"):
-        return OpenAIModelConnector()
+        return connector_classes["OpenAIModelConnector"]()
     elif model.startswith("grok"):
-        return XAIModelConnector()
+        return connector_classes["XAIModelConnector"]()
     elif model.startswith("deepseek"):
-        return DeepSeekModelConnector()
+        return connector_classes["DeepSeekModelConnector"]()
     elif model.startswith("claude"):
-        return AnthropicModelConnector()
+        return connector_classes["AnthropicModelConnector"]()
     elif model.startswith("gemini"):
-        return GeminiModelConnector()
+        return connector_classes["GeminiModelConnector"]()
     elif model.startswith("ollama::"):
-        return OllamaModelConnector()
+        return connector_classes["OllamaModelConnector"]()
     else:
         raise ValueError(
             f"Don't know how to create default model connector for model: {model!r}"
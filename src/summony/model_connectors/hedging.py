@@ -0,0 +1,156 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable, Tuple, TypeVar
+
+from .model_connectors import (
+    ModelConnectorInterface,
+    ModelConnectorWrapper,
+    MessageDict,
+)
+
+
+g_logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class HedgingStats:
+    requests: int = 0
+    # requests for which a duplicate (hedge) request was sent
+    hedged: int = 0
+    # hedged requests where the hedge request won
+    hedge_won: int = 0
+    # hedges not sent because the budget was exhausted
+    budget_exhausted: int = 0
+
+
+class HedgingModelConnector(ModelConnectorWrapper):
+    """Sends the request again if no first chunk (or result) arrived within the hedge
+    delay (fixed, or a percentile of recent ones), using whichever answers first.
+    Only async calls are hedged, for at most `max_hedge_ratio` of requests."""
+
+    delay: float | None
+    delay_percentile: float
+    max_hedge_ratio: float
+    min_samples: int
+    stats: HedgingStats
+
+    _latencies: deque[float]
+
+    # static
+    _DEFAULT_DELAY = 5.0
+
+    def __init__(
+        self,
+        inner: ModelConnectorInterface,
+        logger: logging.Logger | None = None,
+        delay: float | None = None,
+        delay_percentile: float = 0.95,
+        max_hedge_ratio: float = 0.1,
+        min_samples: int = 20,
+        window_size: int = 500,
+    ):
+        super().__init__(inner, logger)
+        self.delay = delay
+        self.delay_percentile = delay_percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.stats = HedgingStats()
+        self._latencies = deque(maxlen=window_size)
+
+    def get_hedge_delay(self) -> float:
+        if self.delay is not None:
+            return self.delay
+        if len(self._latencies) < self.min_samples:
+            return self._DEFAULT_DELAY
+        latencies = sorted(self._latencies)
+        idx = min(int(len(latencies) * self.delay_percentile), len(latencies) - 1)
+        return latencies[idx]
+
+    async def generate_async(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        return await self._race(
+            lambda: self.inner.generate_async(messages, model, **kwargs)
+        )
+
+    async def generate_async_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        streams = []
+
+        async def start_stream():
+            stream = self.inner.generate_async_stream(messages, model, **kwargs)
+            streams.append(stream)
+            try:
+                return stream, await anext(stream)
+            except StopAsyncIteration:
+                return stream, None
+
+        try:
+            stream, first_chunk = await self._race(start_stream)
+            for other_stream in streams:
+                if other_stream is not stream:
+                    await other_stream.aclose()
+            if first_chunk is None:
+                return
+            yield first_chunk
+            async for chunk in stream:
+                yield chunk
+        finally:
+            for stream in streams:
+                await stream.aclose()
+
+    async def _race(self, start: Callable[[], Awaitable[T]]) -> T:
+        """Runs `start()`, and a second one if the first is slow, returning the first result."""
+        self.stats.requests += 1
+        started_at = time.monotonic()
+        primary = asyncio.ensure_future(start())
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.get_hedge_delay())
+            if done:
+                result = primary.result()
+                self._latencies.append(time.monotonic() - started_at)
+                return result
+
+            if self.stats.hedged + 1 > self.max_hedge_ratio * self.stats.requests:
+                self.stats.budget_exhausted += 1
+                result = await primary
+                self._latencies.append(time.monotonic() - started_at)
+                return result
+
+            self.stats.hedged += 1
+            hedge = asyncio.ensure_future(start())
+            pending = {primary, hedge}
+            try:
+                while True:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    winner = next((t for t in done if not t.exception()), None)
+                    if winner is not None:
+                        break
+                    if not pending:
+                        # both failed: raise the primary request's error
+                        return primary.result()
+                if winner is hedge:
+                    self.stats.hedge_won += 1
+                self._latencies.append(time.monotonic() - started_at)
+                return winner.result()
+            finally:
+                await self._cancel_and_wait(pending)
+        finally:
+            if not primary.done():
+                await self._cancel_and_wait({primary})
+
+    @staticmethod
+    async def _cancel_and_wait(tasks: set[asyncio.Future]) -> None:
+        # (waiting, so that the losers' streams are no longer running when closed)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
@@ -1,4 +1,6 @@
 from abc import abstractmethod
+import asyncio
+from contextvars import ContextVar
 import logging
 from typing import (
     Any,
@@ -21,6 +23,40 @@ class MessageDict(TypedDict):
     content: str
 
 
+class CallDeadline:
+    """When the model call of the current context will be stopped (in loop time), set
+    by whoever enforces its timeouts (eg. `CallGuard`), for connectors to tell timed
+    out calls from cancelled ones."""
+
+    __slots__ = ("at",)
+
+    at: float | None
+
+    def __init__(self, at: float | None = None):
+        self.at = at
+
+    def expired(self) -> bool:
+        if self.at is None:
+            return False
+        try:
+            return asyncio.get_running_loop().time() >= self.at
+        except RuntimeError:
+            # (no event loop, so no deadline enforced here)
+            return False
+
+
+g_call_deadline: ContextVar[CallDeadline | None] = ContextVar(
+    "g_call_deadline", default=None
+)
+
+
+def is_call_timed_out() -> bool:
+    """Whether the model call made in the current context is being stopped because
+    its deadline was reached (eg. when it gets cancelled)."""
+    deadline = g_call_deadline.get()
+    return deadline is not None and deadline.expired()
+
+
 class ModelConnectorInterface:
     logger: logging.Logger
 
@@ -54,3 +90,95 @@ class ModelConnectorInterface:
 
     @abstractmethod
     def get_base_url(self) -> str: ...
+
+    def supports_streaming(self, model: str) -> bool:
+        return True
+
+    def supports_n(self, model: str) -> bool:
+        """Whether an `n` arg gets several replies with one request (see
+        `multi_sample`), their texts then being given by `split_choices` and the
+        streamed ones' by `split_chunk_choices`."""
+        return False
+
+    def split_choices(self, completion_dict: dict) -> list[Tuple[str, dict]]:
+        raise NotImplementedError
+
+    def split_chunk_choices(
+        self, chunk_text: str, chunk_dict: dict
+    ) -> list[Tuple[int, str, dict]]:
+        """Splits a chunk streamed with `n` into `(reply index, text, dict)` of every
+        reply it has a part of."""
+        return [(0, chunk_text, chunk_dict)]
+
+    async def warmup(self, model: str) -> None:
+        """Does the setup that would make the first call slow (connecting to the
+        endpoint, loading the model...) ahead of it."""
+
+
+class ModelConnectorWrapper(ModelConnectorInterface):
+    """Base for connectors adding some behavior around another (inner) connector, to
+    which everything else (including attributes, eg. `client`) is delegated."""
+
+    inner: ModelConnectorInterface
+
+    def __init__(
+        self, inner: ModelConnectorInterface, logger: logging.Logger | None = None
+    ):
+        self.inner = inner
+        self.logger = logger if logger is not None else inner.logger
+
+    def generate(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        return self.inner.generate(messages, model, **kwargs)
+
+    async def generate_async(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        return await self.inner.generate_async(messages, model, **kwargs)
+
+    def generate_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Iterator[Tuple[str, dict]]:
+        return self.inner.generate_stream(messages, model, **kwargs)
+
+    async def generate_async_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        async for chunk in self.inner.generate_async_stream(messages, model, **kwargs):
+            yield chunk
+
+    def get_base_url(self) -> str:
+        return self.inner.get_base_url()
+
+    def supports_streaming(self, model: str) -> bool:
+        return self.inner.supports_streaming(model)
+
+    def supports_n(self, model: str) -> bool:
+        return self.inner.supports_n(model)
+
+    async def warmup(self, model: str) -> None:
+        await self.inner.warmup(model)
+
+    def __getattr__(self, name: str) -> Any:
+        # (only called for attributes not found on the wrapper itself)
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+
+def unwrap_connector(connector: ModelConnectorInterface) -> ModelConnectorInterface:
+    """Returns the innermost connector (the one actually talking to the provider)."""
+    while isinstance(connector, ModelConnectorWrapper):
+        connector = connector.inner
+    return connector
+
+
+async def warm_up_http_client(http_client: Any, url: str, logger: logging.Logger):
+    """Opens a (kept alive) connection to `url` with an httpx async client, so that
+    DNS, TCP and TLS setup are done before the first real request."""
+    try:
+        # (whatever the response, the connection stays open in the client's pool)
+        await http_client.head(url)
+    except Exception as exc:
+        logger.warning("Failed to warm up connection to %s: %s", url, exc)
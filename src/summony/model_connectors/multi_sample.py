@@ -0,0 +1,129 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from typing import AsyncIterator, Tuple
+
+from .model_connectors import ModelConnectorInterface, MessageDict, unwrap_connector
+
+
+g_logger = logging.getLogger(__name__)
+
+
+def supports_native_n(connector: ModelConnectorInterface, model: str) -> bool:
+    """Whether the (wrapped) connector can get several replies with one request."""
+    return unwrap_connector(connector).supports_n(model)
+
+
+def generate_n(
+    connector: ModelConnectorInterface,
+    messages: list[MessageDict],
+    model: str,
+    n: int,
+    **kwargs,
+) -> list[Tuple[str, dict]]:
+    """Generates `n` replies: with one request if the provider supports it (see
+    `ModelConnectorInterface.supports_n`), else with `n` requests in parallel."""
+    if supports_native_n(connector, model):
+        _, completion_dict = connector.generate(messages, model, n=n, **kwargs)
+        return unwrap_connector(connector).split_choices(completion_dict)
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        return list(
+            executor.map(
+                lambda _: connector.generate(messages, model, **kwargs), range(n)
+            )
+        )
+
+
+async def generate_async_n(
+    connector: ModelConnectorInterface,
+    messages: list[MessageDict],
+    model: str,
+    n: int,
+    **kwargs,
+) -> list[Tuple[str, dict]]:
+    """Async `generate_n`."""
+    if supports_native_n(connector, model):
+        _, completion_dict = await connector.generate_async(
+            messages, model, n=n, **kwargs
+        )
+        return unwrap_connector(connector).split_choices(completion_dict)
+    tasks = [
+        asyncio.ensure_future(connector.generate_async(messages, model, **kwargs))
+        for _ in range(n)
+    ]
+    try:
+        return list(await asyncio.gather(*tasks))
+    finally:
+        # (when one failed or we were cancelled, the others are not needed anymore)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def generate_async_stream_n(
+    connector: ModelConnectorInterface,
+    messages: list[MessageDict],
+    model: str,
+    n: int,
+    **kwargs,
+) -> AsyncIterator[Tuple[int, str, dict]]:
+    """Streams `n` replies at once, as `(reply index, chunk text, chunk dict)`: from
+    one request if the provider supports it, else from `n` parallel streams."""
+    if supports_native_n(connector, model):
+        inner = unwrap_connector(connector)
+        async for chunk_text, chunk_dict in connector.generate_async_stream(
+            messages, model, n=n, **kwargs
+        ):
+            # (a chunk may have parts of several replies, eg. all of them when
+            # streaming is emulated)
+            for chunk in inner.split_chunk_choices(chunk_text, chunk_dict):
+                yield chunk
+        return
+    async for chunk in _merge_streams(
+        [
+            connector.generate_async_stream(messages, model, **kwargs)
+            for _ in range(n)
+        ]
+    ):
+        yield chunk
+
+
+_DONE = object()
+
+
+async def _merge_streams(
+    streams: list[AsyncIterator[Tuple[str, dict]]],
+) -> AsyncIterator[Tuple[int, str, dict]]:
+    queue = asyncio.Queue()
+
+    async def pump(idx: int, stream: AsyncIterator[Tuple[str, dict]]) -> None:
+        try:
+            async for chunk_text, chunk_dict in stream:
+                queue.put_nowait((idx, chunk_text, chunk_dict))
+            queue.put_nowait(_DONE)
+        except Exception as exc:
+            queue.put_nowait(exc)
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    tasks = [
+        asyncio.ensure_future(pump(idx, stream)) for idx, stream in enumerate(streams)
+    ]
+    try:
+        running = len(tasks)
+        while running:
+            item = await queue.get()
+            if item is _DONE:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        # (one stream failed, or the consumer stopped early)
+        for task in tasks:
+            task.cancel()
+        # (letting the streams close before going on)
+        await asyncio.gather(*tasks, return_exceptions=True)
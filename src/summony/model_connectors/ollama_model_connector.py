@@ -5,6 +5,7 @@ from typing import (
     AsyncIterator,
     Callable,
     Coroutine,
+    Hashable,
     Iterator,
     Literal,
     Self,
@@ -15,6 +16,7 @@ from ollama import Client, AsyncClient, ChatResponse
 
 
 from .model_connectors import ModelConnectorInterface, MessageDict
+from .client_pool import g_client_pool, make_client_key
 
 
 g_logger = logging.getLogger(__name__)
@@ -24,7 +26,11 @@ class OllamaModelConnector(ModelConnectorInterface):
     logger: logging.Logger
 
     client: Client
-    async_client: AsyncClient
+    _async_client_key: Hashable
+    _make_async_client: Callable[[], AsyncClient]
+
+    # static
+    _WARMUP_KEEP_ALIVE = "30m"
 
     def __init__(
         self,
@@ -37,10 +43,25 @@ class OllamaModelConnector(ModelConnectorInterface):
             client_args = {}
         if api_key:
             client_args["api_key"] = api_key
-        self.client = Client(**client_args)
-        self.async_client = AsyncClient(**client_args)
+        # (shared with all connectors using the same client args, and no HTTP/2 since
+        # ollama's server only speaks HTTP/1.1)
+        self.client = g_client_pool.get(
+            make_client_key(Client, api_key, client_args),
+            lambda: Client(
+                **g_client_pool.with_http_client_args(client_args, http2=False)
+            ),
+        )
+        self._async_client_key = make_client_key(AsyncClient, api_key, client_args)
+        self._make_async_client = lambda: AsyncClient(
+            **g_client_pool.with_http_client_args(client_args, http2=False)
+        )
         self.logger = logger if logger is not None else g_logger
 
+    @property
+    def async_client(self) -> AsyncClient:
+        # (one per event loop, see `ClientPool.get_async`)
+        return g_client_pool.get_async(self._async_client_key, self._make_async_client)
+
     def generate(
         self, messages: list[MessageDict], model: str, **kwargs
     ) -> Tuple[str, dict]:
@@ -88,12 +109,28 @@ class OllamaModelConnector(ModelConnectorInterface):
             messages=messages, model=model, stream=True, options=kwargs
         )
         i = 0
-        async for chunk in stream:
-            chunk_text, chunk = self._process_chunk(chunk, i)
-            if chunk_text:
-                yield chunk_text, chunk
-            i += 1
+        try:
+            async for chunk in stream:
+                chunk_text, chunk = self._process_chunk(chunk, i)
+                if chunk_text:
+                    yield chunk_text, chunk
+                i += 1
+        finally:
+            # (also when the consumer stops early, eg. on timeouts or cancelling)
+            await stream.aclose()
 
     def get_base_url(self) -> str:
         _client = getattr(self.client, "_client", None)
         return str(getattr(_client, "base_url", ""))
+
+    async def warmup(self, model: str) -> None:
+        # a chat request without messages just loads the model into memory (and
+        # keeps it there for `keep_alive`), which also opens the connection
+        try:
+            await self.async_client.chat(
+                model=model, keep_alive=self._WARMUP_KEEP_ALIVE
+            )
+        except Exception as exc:
+            self.logger.warning(
+                "OllamaModelConnector: Failed to preload model %s: %s", model, exc
+            )
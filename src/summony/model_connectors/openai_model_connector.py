@@ -1,4 +1,3 @@
-from copy import deepcopy
 import os
 import logging
 from typing import (
@@ -6,16 +5,18 @@ from typing import (
     AsyncIterator,
     Callable,
     Coroutine,
+    Hashable,
     Iterator,
     Literal,
     Self,
     Tuple,
 )
 
-from openai import OpenAI, AsyncOpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 from openai.types.chat import ChatCompletion, ChatCompletionChunk
 
-from .model_connectors import ModelConnectorInterface, MessageDict
+from .model_connectors import ModelConnectorInterface, MessageDict, warm_up_http_client
+from .client_pool import g_client_pool, make_client_key
 
 
 g_logger = logging.getLogger(__name__)
@@ -25,7 +26,8 @@ class OpenAIModelConnector(ModelConnectorInterface):
     logger: logging.Logger
 
     client: OpenAI
-    async_client: AsyncOpenAI
+    _async_client_key: Hashable
+    _make_async_client: Callable[[], AsyncOpenAI]
 
     def __init__(
         self,
@@ -36,15 +38,28 @@ class OpenAIModelConnector(ModelConnectorInterface):
         api_key = creds.get("api_key") if creds else os.environ["OPENAI_API_KEY"]
         if client_args is None:
             client_args = {}
-        self.client = OpenAI(
-            api_key=api_key,
-            **client_args,
+        self._init_clients(api_key, client_args)
+        self.logger = logger if logger is not None else g_logger
+
+    def _init_clients(self, api_key: str, client_args: dict[str, Any]) -> None:
+        # (shared with all connectors using the same api key and client args)
+        self.client = g_client_pool.get(
+            make_client_key(OpenAI, api_key, client_args),
+            lambda: OpenAI(
+                api_key=api_key,
+                **g_client_pool.with_http_client_args(client_args, DefaultHttpxClient),
+            ),
         )
-        self.async_client = AsyncOpenAI(
+        self._async_client_key = make_client_key(AsyncOpenAI, api_key, client_args)
+        self._make_async_client = lambda: AsyncOpenAI(
             api_key=api_key,
-            **client_args,
+            **g_client_pool.with_http_client_args(client_args, DefaultAsyncHttpxClient),
         )
-        self.logger = logger if logger is not None else g_logger
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        # (one per event loop, see `ClientPool.get_async`)
+        return g_client_pool.get_async(self._async_client_key, self._make_async_client)
 
     def generate(
         self, messages: list[MessageDict], model: str, **kwargs
@@ -78,8 +93,8 @@ class OpenAIModelConnector(ModelConnectorInterface):
         completion_create_args = self._make_completion_create_args(
             messages, model, kwargs
         )
-        if model.startswith("o1"):
-            yield self.generate_async(**completion_create_args)
+        if not self.supports_streaming(model):
+            yield self.generate(**completion_create_args)
             return
         stream = self.client.chat.completions.create(
             **completion_create_args, stream=True
@@ -97,7 +112,7 @@ class OpenAIModelConnector(ModelConnectorInterface):
         completion_create_args = self._make_completion_create_args(
             messages, model, kwargs
         )
-        if model.startswith("o1"):
+        if not self.supports_streaming(model):
             completion_text, completion_dict = await self.generate_async(
                 **completion_create_args
             )
@@ -107,11 +122,15 @@ class OpenAIModelConnector(ModelConnectorInterface):
             **completion_create_args, stream=True
         )
         i = 0
-        async for chunk in stream:
-            chunk_text, chunk_dict = self._process_chunk(chunk, i)
-            if chunk_text:
-                yield chunk_text, chunk_dict
-            i += 1
+        try:
+            async for chunk in stream:
+                chunk_text, chunk_dict = self._process_chunk(chunk, i)
+                if chunk_text:
+                    yield chunk_text, chunk_dict
+                i += 1
+        finally:
+            # (also when the consumer stops early, eg. on timeouts or cancelling)
+            await stream.close()
 
     def _process_chunk(
         self, chunk: ChatCompletionChunk, chunk_idx: int
@@ -132,6 +151,40 @@ class OpenAIModelConnector(ModelConnectorInterface):
     def get_base_url(self) -> str:
         return str(self.client.base_url)
 
+    async def warmup(self, model: str) -> None:
+        await warm_up_http_client(
+            self.async_client._client, self.get_base_url(), self.logger
+        )
+
+    def supports_streaming(self, model: str) -> bool:
+        return not model.startswith("o1")
+
+    def supports_n(self, model: str) -> bool:
+        return True
+
+    def split_choices(self, completion_dict: dict) -> list[Tuple[str, dict]]:
+        return [
+            (choice["message"]["content"], {**completion_dict, "choices": [choice]})
+            for choice in sorted(completion_dict["choices"], key=lambda c: c["index"])
+        ]
+
+    def split_chunk_choices(
+        self, chunk_text: str, chunk_dict: dict
+    ) -> list[Tuple[int, str, dict]]:
+        choices = chunk_dict.get("choices")
+        if not choices:
+            return [(0, chunk_text, chunk_dict)]
+        return [
+            (
+                choice["index"],
+                # (a whole completion when streaming is emulated, eg. for o1)
+                (choice.get("delta") or choice.get("message") or {}).get("content")
+                or "",
+                {**chunk_dict, "choices": [choice]},
+            )
+            for choice in sorted(choices, key=lambda c: c["index"])
+        ]
+
     @classmethod
     def _make_completion_create_args(
         cls, messages: list[dict], model: str, extra_args: dict
@@ -139,7 +192,7 @@ class OpenAIModelConnector(ModelConnectorInterface):
         out = dict(messages=messages, model=model)
         if model.startswith("o1"):
             if len(out["messages"]) and out["messages"][0]["role"] == "system":
-                out["messages"] = deepcopy(messages)
-                out["messages"][0]["role"] = "user"
+                # (messages dicts are shared with the agent's rendered history)
+                out["messages"] = [{**messages[0], "role": "user"}, *messages[1:]]
         out.update(extra_args)
         return out
@@ -0,0 +1,189 @@
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import itertools
+import threading
+import time
+from typing import Iterator, Literal, get_args
+
+
+Priority = Literal["interactive", "bulk"]
+
+PRIORITIES: tuple[Priority, ...] = get_args(Priority)
+
+# priority of the model calls made in the current context (task)
+g_call_priority: ContextVar[Priority] = ContextVar(
+    "g_call_priority", default="interactive"
+)
+
+
+def get_call_priority() -> Priority:
+    return g_call_priority.get()
+
+
+def is_event_loop_thread() -> bool:
+    """Whether an event loop is running in the current thread (so that blocking it
+    also blocks the loop's tasks)."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+@contextmanager
+def call_priority(priority: Priority) -> Iterator[None]:
+    """Makes the model calls made inside the block have `priority`, eg.
+    `with call_priority("bulk"): await ag.ask_async("...")`."""
+    assert priority in PRIORITIES, f"call_priority: unknown priority {priority!r}"
+    token = g_call_priority.set(priority)
+    try:
+        yield
+    finally:
+        g_call_priority.reset(token)
+
+
+@dataclass
+class QueueWaitStats:
+    admitted: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float | None:
+        return self.total_wait / self.admitted if self.admitted else None
+
+
+class QueueWaiter:
+    """What a request waiting in a `PriorityWaitQueue` sleeps on (on `loop` if given,
+    else blocking its thread), until woken from any thread or its timeout is over."""
+
+    __slots__ = ("_loop", "_event")
+
+    _loop: asyncio.AbstractEventLoop | None
+    _event: asyncio.Event | threading.Event
+
+    def __init__(self, loop: asyncio.AbstractEventLoop | None = None):
+        self._loop = loop
+        self._event = asyncio.Event() if loop is not None else threading.Event()
+
+    def clear(self) -> None:
+        """Forgets past wake-ups (called before checking whether it's its turn, so
+        that wake-ups coming after the check are not missed)."""
+        self._event.clear()
+
+    def wake(self) -> None:
+        if self._loop is None:
+            self._event.set()
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # (its loop is closed, so nobody is waiting anymore)
+            pass
+
+    async def wait_async(self, timeout: float | None = None) -> None:
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def wait(self, timeout: float | None = None) -> None:
+        self._event.wait(timeout)
+
+
+class PriorityWaitQueue:
+    """Decides which waiting request goes next: ones enqueued `ahead` (eg. blocking an
+    event loop), then interactive ones, bulk ones getting at least `bulk_min_share`.
+    Not thread-safe, owners use it under their lock and `wake_next()` on changes."""
+
+    bulk_min_share: float
+    stats: dict[Priority, QueueWaitStats]
+
+    # :: priority -> (ticket, enqueued at, waiter) of waiting requests, in arrival
+    #    order
+    _waiting: dict[Priority, deque[tuple[int, float, QueueWaiter | None]]]
+    # :: priorities of the last admitted requests
+    _recent: deque[Priority]
+    # :: tickets of the requests enqueued ahead
+    _ahead: set[int]
+
+    def __init__(self, bulk_min_share: float = 0.1, history_size: int = 50):
+        self.bulk_min_share = bulk_min_share
+        self.stats = {p: QueueWaitStats() for p in PRIORITIES}
+        self._waiting = {p: deque() for p in PRIORITIES}
+        self._recent = deque(maxlen=history_size)
+        self._ahead = set()
+        self._tickets = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._waiting.values())
+
+    def depth(self, priority: Priority) -> int:
+        return len(self._waiting[priority])
+
+    def enqueue(
+        self, priority: Priority, waiter: QueueWaiter | None = None, ahead: bool = False
+    ) -> tuple[Priority, int]:
+        ticket = next(self._tickets)
+        entry = (ticket, time.monotonic(), waiter)
+        if ahead:
+            self._waiting[priority].appendleft(entry)
+            self._ahead.add(ticket)
+        else:
+            self._waiting[priority].append(entry)
+        return priority, ticket
+
+    def remove(self, entry: tuple[Priority, int]) -> None:
+        priority, ticket = entry
+        queue = self._waiting[priority]
+        for i, (t, _, _) in enumerate(queue):
+            if t == ticket:
+                del queue[i]
+                break
+        self._ahead.discard(ticket)
+        # (it may have been the next one)
+        self.wake_next()
+
+    def wake_next(self) -> None:
+        """Wakes the next request up, to check whether it can go."""
+        next_priority = self._get_next_priority()
+        if next_priority is not None:
+            waiter = self._waiting[next_priority][0][2]
+            if waiter is not None:
+                waiter.wake()
+
+    def is_next(self, entry: tuple[Priority, int]) -> bool:
+        priority, ticket = entry
+        next_priority = self._get_next_priority()
+        return (
+            next_priority == priority and self._waiting[priority][0][0] == ticket
+        )
+
+    def pop(self, entry: tuple[Priority, int]) -> None:
+        """Removes the (next) request, as admitted, waking the one after it."""
+        priority, _ = entry
+        ticket, enqueued_at, _ = self._waiting[priority].popleft()
+        self._ahead.discard(ticket)
+        wait = time.monotonic() - enqueued_at
+        stats = self.stats[priority]
+        stats.admitted += 1
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        self._recent.append(priority)
+        self.wake_next()
+
+    def _get_next_priority(self) -> Priority | None:
+        if self._ahead:
+            for priority in PRIORITIES:
+                queue = self._waiting[priority]
+                if queue and queue[0][0] in self._ahead:
+                    return priority
+        if self._waiting["bulk"] and (
+            not self._waiting["interactive"]
+            or self._recent.count("bulk") < self.bulk_min_share * len(self._recent)
+        ):
+            return "bulk"
+        return "interactive" if self._waiting["interactive"] else None
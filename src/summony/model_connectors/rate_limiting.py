@@ -0,0 +1,439 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, Tuple
+
+from .model_connectors import (
+    ModelConnectorInterface,
+    ModelConnectorWrapper,
+    MessageDict,
+    unwrap_connector,
+)
+from .priority import (
+    Priority,
+    PriorityWaitQueue,
+    QueueWaiter,
+    QueueWaitStats,
+    get_call_priority,
+    is_event_loop_thread,
+)
+
+
+g_logger = logging.getLogger(__name__)
+
+
+# rough, but good enough for budgeting (and the budget is corrected from real usage)
+_CHARS_PER_TOKEN = 4
+_TOKENS_PER_MESSAGE = 4
+
+_MAX_TOKENS_ARGS = ("max_tokens", "max_completion_tokens", "max_output_tokens")
+
+
+@dataclass
+class RateLimitStats:
+    admitted: int = 0
+    # admitted requests that had to wait for budget
+    delayed: int = 0
+    total_wait_time: float = 0.0
+    # requests whose budget was corrected from reported usage
+    corrected: int = 0
+
+
+class RateLimitReservation:
+    """Budget taken in a `RateLimiter` window by one request."""
+
+    __slots__ = ("at", "tokens")
+
+    at: float
+    tokens: int
+
+    def __init__(self, at: float, tokens: int):
+        self.at = at
+        self.tokens = tokens
+
+
+class RateLimiter:
+    """Admits requests under requests-per-minute and tokens-per-minute budgets (over
+    `window` seconds), by priority then in FIFO order. Thread (and event loop) safe."""
+
+    rpm: int | None
+    tpm: int | None
+    window: float
+    stats: RateLimitStats
+
+    _reservations: deque[RateLimitReservation]
+    _tokens_in_window: int
+    _waiting: PriorityWaitQueue
+
+    # static
+    # (shortest sleep, and shortest wait counted as a delay)
+    _MIN_WAIT = 0.01
+
+    def __init__(
+        self, rpm: int | None = None, tpm: int | None = None, window: float = 60.0
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.stats = RateLimitStats()
+        self._reservations = deque()
+        self._tokens_in_window = 0
+        self._waiting = PriorityWaitQueue()
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def queue_stats(self) -> dict[Priority, QueueWaitStats]:
+        """Queue wait time stats per priority class."""
+        return self._waiting.stats
+
+    def get_usage(self) -> Tuple[int, int]:
+        """Returns the (requests, tokens) used in the current window."""
+        with self._lock:
+            self._prune(time.monotonic())
+            return len(self._reservations), self._tokens_in_window
+
+    async def acquire(self, tokens: int) -> RateLimitReservation:
+        waiter = QueueWaiter(asyncio.get_running_loop())
+        ticket = self._enqueue(waiter)
+        started_at = time.monotonic()
+        try:
+            while True:
+                waiter.clear()
+                admitted = self._try_admit(ticket, tokens)
+                if isinstance(admitted, RateLimitReservation):
+                    break
+                await waiter.wait_async(admitted)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        self._on_admitted(started_at)
+        return admitted
+
+    def acquire_sync(self, tokens: int) -> RateLimitReservation:
+        waiter = QueueWaiter()
+        # (when blocking an event loop, its waiting requests can't go before this one)
+        ticket = self._enqueue(waiter, ahead=is_event_loop_thread())
+        started_at = time.monotonic()
+        try:
+            while True:
+                waiter.clear()
+                admitted = self._try_admit(ticket, tokens)
+                if isinstance(admitted, RateLimitReservation):
+                    break
+                waiter.wait(admitted)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        self._on_admitted(started_at)
+        return admitted
+
+    def correct(self, reservation: RateLimitReservation, tokens: int) -> None:
+        """Replaces a request's estimated tokens with the actually used ones."""
+        with self._lock:
+            if reservation in self._reservations:
+                self._tokens_in_window += tokens - reservation.tokens
+                if tokens < reservation.tokens:
+                    # (the next request may fit now)
+                    self._waiting.wake_next()
+            reservation.tokens = tokens
+            self.stats.corrected += 1
+
+    def set_limits(self, rpm: int | None = None, tpm: int | None = None) -> None:
+        """Changes the limits that are given."""
+        with self._lock:
+            if rpm is not None:
+                self.rpm = rpm
+            if tpm is not None:
+                self.tpm = tpm
+            self._waiting.wake_next()
+
+    def _enqueue(
+        self, waiter: QueueWaiter, ahead: bool = False
+    ) -> tuple[Priority, int]:
+        with self._lock:
+            return self._waiting.enqueue(get_call_priority(), waiter, ahead)
+
+    def _dequeue(self, ticket: tuple[Priority, int]) -> None:
+        with self._lock:
+            self._waiting.remove(ticket)
+
+    def _try_admit(
+        self, ticket: tuple[Priority, int], tokens: int
+    ) -> RateLimitReservation | float | None:
+        """Admits the request if it is its turn and there is budget, returning its
+        reservation, else returns how long to wait for budget (or None to wait for its
+        turn, being woken then)."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            if not self._waiting.is_next(ticket):
+                return None
+
+            wait = 0.0
+            if self.rpm is not None and len(self._reservations) >= self.rpm:
+                wait = self._reservations[-self.rpm].at + self.window - now
+            # (a request bigger than the whole budget is let through on an empty window)
+            if (
+                self.tpm is not None
+                and self._reservations
+                and self._tokens_in_window + tokens > self.tpm
+            ):
+                wait = max(wait, self._get_tokens_wait(now, tokens))
+            if wait > 0:
+                return max(wait, self._MIN_WAIT)
+
+            self._waiting.pop(ticket)
+            reservation = RateLimitReservation(now, tokens)
+            self._reservations.append(reservation)
+            self._tokens_in_window += tokens
+            return reservation
+
+    def _get_tokens_wait(self, now: float, tokens: int) -> float:
+        # time until enough of the oldest reservations leave the window
+        to_free = self._tokens_in_window + tokens - self.tpm
+        for reservation in self._reservations:
+            to_free -= reservation.tokens
+            if to_free <= 0:
+                return reservation.at + self.window - now
+        return self._reservations[-1].at + self.window - now
+
+    def _prune(self, now: float) -> None:
+        while self._reservations and self._reservations[0].at + self.window <= now:
+            self._tokens_in_window -= self._reservations.popleft().tokens
+
+    def _on_admitted(self, started_at: float) -> None:
+        waited = time.monotonic() - started_at
+        with self._lock:
+            self.stats.admitted += 1
+            if waited >= self._MIN_WAIT:
+                self.stats.delayed += 1
+                self.stats.total_wait_time += waited
+
+
+# :: account key -> limiter shared by all connectors using that account
+_g_rate_limiters: dict[str, RateLimiter] = {}
+_g_rate_limiters_lock = threading.Lock()
+
+
+def get_account_key(connector: ModelConnectorInterface) -> str:
+    """Key identifying the provider account (endpoint + api key) of a connector."""
+    connector = unwrap_connector(connector)
+    key = f"{connector.__class__.__name__}@{connector.get_base_url()}"
+    api_key = getattr(getattr(connector, "client", None), "api_key", None)
+    if api_key:
+        key += "#" + hashlib.sha256(str(api_key).encode()).hexdigest()[:16]
+    return key
+
+
+def get_rate_limiter(
+    account_key: str, rpm: int | None = None, tpm: int | None = None
+) -> RateLimiter:
+    """Returns the limiter shared by everyone using the account, (re)setting its
+    limits if any are given."""
+    with _g_rate_limiters_lock:
+        limiter = _g_rate_limiters.get(account_key)
+        if limiter is None:
+            limiter = _g_rate_limiters[account_key] = RateLimiter(rpm, tpm)
+        else:
+            limiter.set_limits(rpm, tpm)
+        return limiter
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+def estimate_prompt_tokens(messages: list[MessageDict]) -> int:
+    return sum(
+        estimate_tokens(msg["content"] or "") + _TOKENS_PER_MESSAGE for msg in messages
+    )
+
+
+def get_reported_usage(completion_dict: dict | None) -> Tuple[int, int] | None:
+    """Returns the (input, output) tokens reported in a completion or chunk dict
+    (OpenAI-compatible, Anthropic, Gemini or Ollama)."""
+    if not isinstance(completion_dict, dict):
+        return None
+    # anthropic's message_start stream event
+    if isinstance(completion_dict.get("message"), dict) and "usage" in (
+        completion_dict["message"]
+    ):
+        completion_dict = completion_dict["message"]
+    usage = completion_dict.get("usage")
+    if isinstance(usage, dict):
+        if "prompt_tokens" in usage or "completion_tokens" in usage:
+            return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+        if "input_tokens" in usage or "output_tokens" in usage:
+            return usage.get("input_tokens") or 0, usage.get("output_tokens") or 0
+    usage = completion_dict.get("usage_metadata")
+    if isinstance(usage, dict) and usage:
+        return (
+            usage.get("prompt_token_count") or 0,
+            usage.get("candidates_token_count") or 0,
+        )
+    if "prompt_eval_count" in completion_dict or "eval_count" in completion_dict:
+        return (
+            completion_dict.get("prompt_eval_count") or 0,
+            completion_dict.get("eval_count") or 0,
+        )
+    return None
+
+
+class RateLimitedModelConnector(ModelConnectorWrapper):
+    """Queues requests to stay within the RPM/TPM limits of the provider account (see
+    `get_account_key`), counting their estimated tokens until usage is reported."""
+
+    limiter: RateLimiter
+    default_max_tokens: int
+
+    def __init__(
+        self,
+        inner: ModelConnectorInterface,
+        logger: logging.Logger | None = None,
+        rpm: int | None = None,
+        tpm: int | None = None,
+        default_max_tokens: int = 1024,
+        account_key: str | None = None,
+    ):
+        super().__init__(inner, logger)
+        self.limiter = get_rate_limiter(
+            account_key if account_key is not None else get_account_key(inner),
+            rpm,
+            tpm,
+        )
+        # (eg. anthropic's connector sends a default max_tokens itself)
+        self.default_max_tokens = getattr(
+            unwrap_connector(inner), "_DEFAULT_MAX_TOKENS", default_max_tokens
+        )
+
+    def estimate_request_tokens(
+        self, messages: list[MessageDict], kwargs: dict[str, Any]
+    ) -> int:
+        max_tokens = next(
+            (kwargs[k] for k in _MAX_TOKENS_ARGS if kwargs.get(k) is not None),
+            self.default_max_tokens,
+        )
+        # (with `n`, every one of the replies can use up to max_tokens)
+        return estimate_prompt_tokens(messages) + max_tokens * (kwargs.get("n") or 1)
+
+    def generate(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        reservation = self.limiter.acquire_sync(
+            self.estimate_request_tokens(messages, kwargs)
+        )
+        completion_text, completion_dict = self.inner.generate(
+            messages, model, **kwargs
+        )
+        self._correct(reservation, messages, completion_dict, completion_text)
+        return completion_text, completion_dict
+
+    async def generate_async(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        reservation = await self.limiter.acquire(
+            self.estimate_request_tokens(messages, kwargs)
+        )
+        completion_text, completion_dict = await self.inner.generate_async(
+            messages, model, **kwargs
+        )
+        self._correct(reservation, messages, completion_dict, completion_text)
+        return completion_text, completion_dict
+
+    def generate_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Iterator[Tuple[str, dict]]:
+        reservation = self.limiter.acquire_sync(
+            self.estimate_request_tokens(messages, kwargs)
+        )
+        usage = _StreamUsage()
+        try:
+            for chunk_text, chunk_dict in self.inner.generate_stream(
+                messages, model, **kwargs
+            ):
+                usage.add(chunk_text, chunk_dict)
+                yield chunk_text, chunk_dict
+        finally:
+            self._correct_from_stream(reservation, messages, usage)
+
+    async def generate_async_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        reservation = await self.limiter.acquire(
+            self.estimate_request_tokens(messages, kwargs)
+        )
+        usage = _StreamUsage()
+        try:
+            async for chunk_text, chunk_dict in self.inner.generate_async_stream(
+                messages, model, **kwargs
+            ):
+                usage.add(chunk_text, chunk_dict)
+                yield chunk_text, chunk_dict
+        finally:
+            self._correct_from_stream(reservation, messages, usage)
+
+    def _correct(
+        self,
+        reservation: RateLimitReservation,
+        messages: list[MessageDict],
+        completion_dict: dict | None,
+        completion_text: str | None,
+    ) -> None:
+        reported = get_reported_usage(completion_dict)
+        if reported is not None:
+            self.limiter.correct(reservation, sum(reported))
+        else:
+            self.limiter.correct(
+                reservation,
+                estimate_prompt_tokens(messages)
+                + estimate_tokens(completion_text or ""),
+            )
+
+    def _correct_from_stream(
+        self,
+        reservation: RateLimitReservation,
+        messages: list[MessageDict],
+        usage: "_StreamUsage",
+    ) -> None:
+        if usage.reported is not None:
+            self.limiter.correct(reservation, sum(usage.reported))
+        else:
+            self.limiter.correct(
+                reservation,
+                estimate_prompt_tokens(messages) + estimate_tokens(usage.text),
+            )
+
+
+class _StreamUsage:
+    """Usage reported across a stream's chunks (which may each report part of it)."""
+
+    reported: Tuple[int, int] | None
+    _text_parts: list[str]
+
+    def __init__(self):
+        self.reported = None
+        self._text_parts = []
+
+    def add(self, chunk_text: str | None, chunk_dict: dict | None) -> None:
+        if chunk_text:
+            self._text_parts.append(chunk_text)
+        chunk_usage = get_reported_usage(chunk_dict)
+        if chunk_usage is not None:
+            # (counts in chunks are cumulative, or split between input and output)
+            self.reported = (
+                chunk_usage
+                if self.reported is None
+                else tuple(map(max, self.reported, chunk_usage))
+            )
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text_parts)
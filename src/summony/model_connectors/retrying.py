@@ -0,0 +1,275 @@
+import asyncio
+from dataclasses import dataclass
+import datetime
+from email.utils import parsedate_to_datetime
+import logging
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, Tuple
+
+from .model_connectors import (
+    ModelConnectorInterface,
+    ModelConnectorWrapper,
+    MessageDict,
+)
+
+
+g_logger = logging.getLogger(__name__)
+
+
+_RETRYABLE_STATUS_CODES = frozenset((408, 409, 425, 429, 500, 502, 503, 504, 529))
+
+# status codes whose responses may tell how long to wait (rate limited, overloaded)
+_RETRY_AFTER_STATUS_CODES = frozenset((429, 503, 529))
+
+# (checked by name to not have to import every provider's SDK)
+_RETRYABLE_ERROR_CLASS_NAMES = frozenset(
+    (
+        "APIConnectionError",  # openai, anthropic (incl. APITimeoutError)
+        "TransportError",  # httpx (connect/read/write errors and timeouts)
+        "ServiceUnavailable",  # google.api_core
+        "DeadlineExceeded",  # google.api_core
+    )
+)
+
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+@dataclass
+class RetryStats:
+    calls: int = 0
+    retries: int = 0
+    # calls that failed even after retrying
+    gave_up: int = 0
+
+
+def get_error_status_code(exc: BaseException) -> int | None:
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        # google.api_core errors have the HTTP status as .code
+        status_code = getattr(exc, "code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def get_error_headers(exc: BaseException) -> dict[str, str] | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is None:
+        return None
+    try:
+        return {k.lower(): v for k, v in headers.items()}
+    except Exception:
+        return None
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    status_code = get_error_status_code(exc)
+    if status_code is not None:
+        return status_code in _RETRYABLE_STATUS_CODES or status_code >= 500
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    return any(
+        cls.__name__ in _RETRYABLE_ERROR_CLASS_NAMES for cls in type(exc).__mro__
+    )
+
+
+def parse_duration(value: str) -> float | None:
+    """Parses durations like "20ms", "1.5s" or "6m0s" (OpenAI rate limit headers)."""
+    parts = _DURATION_PART_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def get_retry_after(headers: dict[str, str] | None) -> float | None:
+    """Seconds to wait before retrying, as told by a (rate limited or overloaded)
+    response's headers."""
+    if not headers:
+        return None
+    if (v := headers.get("retry-after-ms")) is not None:
+        try:
+            return float(v) / 1000
+        except ValueError:
+            pass
+    if (v := headers.get("retry-after")) is not None:
+        try:
+            return float(v)
+        except ValueError:
+            try:
+                return max(
+                    0.0,
+                    (
+                        parsedate_to_datetime(v)
+                        - datetime.datetime.now(datetime.timezone.utc)
+                    ).total_seconds(),
+                )
+            except (TypeError, ValueError):
+                pass
+    resets = []
+    for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        if (v := headers.get(name)) is not None and (d := parse_duration(v)):
+            resets.append(d)
+    for name in (
+        "anthropic-ratelimit-requests-reset",
+        "anthropic-ratelimit-tokens-reset",
+    ):
+        if (v := headers.get(name)) is not None:
+            try:
+                reset_at = datetime.datetime.fromisoformat(v.replace("Z", "+00:00"))
+                resets.append(
+                    (
+                        reset_at - datetime.datetime.now(datetime.timezone.utc)
+                    ).total_seconds()
+                )
+            except ValueError:
+                pass
+    resets = [r for r in resets if r > 0]
+    return max(resets) if resets else None
+
+
+class RetryingModelConnector(ModelConnectorWrapper):
+    """Retries calls failed with rate limiting (429), server (5xx) or connection errors,
+    with exponential backoff or as long as the provider says, logging retried attempts.
+    Streams are only retried if they failed before their first chunk."""
+
+    max_retries: int
+    base_delay: float
+    max_delay: float
+    jitter: bool
+    stats: RetryStats
+
+    def __init__(
+        self,
+        inner: ModelConnectorInterface,
+        logger: logging.Logger | None = None,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        jitter: bool = True,
+    ):
+        super().__init__(inner, logger)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.stats = RetryStats()
+
+    def generate(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        self.stats.calls += 1
+        attempt = 0
+        while True:
+            try:
+                return self.inner.generate(messages, model, **kwargs)
+            except Exception as exc:
+                time.sleep(self._on_error(exc, attempt, messages, model, kwargs))
+                attempt += 1
+
+    async def generate_async(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Tuple[str, dict]:
+        self.stats.calls += 1
+        attempt = 0
+        while True:
+            try:
+                return await self.inner.generate_async(messages, model, **kwargs)
+            except Exception as exc:
+                await asyncio.sleep(
+                    self._on_error(exc, attempt, messages, model, kwargs)
+                )
+                attempt += 1
+
+    def generate_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> Iterator[Tuple[str, dict]]:
+        self.stats.calls += 1
+        attempt = 0
+        while True:
+            got_chunk = False
+            try:
+                for chunk in self.inner.generate_stream(messages, model, **kwargs):
+                    got_chunk = True
+                    yield chunk
+                return
+            except Exception as exc:
+                if got_chunk:
+                    raise
+                time.sleep(self._on_error(exc, attempt, messages, model, kwargs))
+                attempt += 1
+
+    async def generate_async_stream(
+        self, messages: list[MessageDict], model: str, **kwargs
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        self.stats.calls += 1
+        attempt = 0
+        while True:
+            got_chunk = False
+            try:
+                async for chunk in self.inner.generate_async_stream(
+                    messages, model, **kwargs
+                ):
+                    got_chunk = True
+                    yield chunk
+                return
+            except Exception as exc:
+                if got_chunk:
+                    raise
+                await asyncio.sleep(
+                    self._on_error(exc, attempt, messages, model, kwargs)
+                )
+                attempt += 1
+
+    def get_retry_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return random.uniform(delay / 2, delay) if self.jitter else delay
+
+    def _on_error(
+        self,
+        exc: Exception,
+        attempt: int,
+        messages: list[MessageDict],
+        model: str,
+        kwargs: dict[str, Any],
+    ) -> float:
+        """Logs a failed attempt and returns how long to wait before retrying
+        (re-raising the error if it should not, or can no longer, be retried)."""
+        if attempt >= self.max_retries or not is_retryable_error(exc):
+            if attempt > 0:
+                self.stats.gave_up += 1
+            raise exc
+
+        status_code = get_error_status_code(exc)
+        headers = get_error_headers(exc)
+        log_model_call = getattr(self.logger, "log_model_call", None)
+        if log_model_call is not None:
+            log_model_call(
+                req_content=dict(messages=messages, model=model, **kwargs),
+                req_base_url=self.get_base_url(),
+                # (attempt number of the retried call, 0 for the first try)
+                res_content={"attempt": attempt},
+                res_status_code=status_code,
+                res_headers=headers,
+                error=exc,
+            )
+
+        delay = self.get_retry_delay(
+            attempt,
+            (
+                get_retry_after(headers)
+                if status_code in _RETRY_AFTER_STATUS_CODES
+                else None
+            ),
+        )
+        self.stats.retries += 1
+        self.logger.warning(
+            "RetryingModelConnector: attempt %d failed (%s: %s), retrying in %.2fs",
+            attempt,
+            type(exc).__name__,
+            exc,
+            delay,
+        )
+        return delay
@@ -2,8 +2,6 @@ import logging
 import os
 from typing import Any
 
-from openai import OpenAI, AsyncOpenAI
-
 from .openai_model_connector import OpenAIModelConnector
 
 
@@ -22,12 +20,5 @@ class XAIModelConnector(OpenAIModelConnector):
             client_args = {}
         if "base_url" not in client_args:
             client_args["base_url"] = "https://api.x.ai/v1"
-        self.client = OpenAI(
-            api_key=api_key,
-            **client_args,
-        )
-        self.async_client = AsyncOpenAI(
-            api_key=api_key,
-            **client_args,
-        )
+        self._init_clients(api_key, client_args)
         self.logger = logger if logger is not None else g_logger
@@ -2,10 +2,21 @@ import asyncio
 from collections import defaultdict
 from IPython.display import Markdown, HTML, display
 import ipywidgets as widgets
+import logging
 from typing import Any, AsyncIterator, Callable, Coroutine, Literal, Self
 
-from ..agents import AgentInterface, Message, get_default_agent_for_model
+from ..agents import (
+    AgentInterface,
+    Message,
+    StreamTimeouts,
+    get_default_agent_for_model,
+)
 from ..agents.serialization import hash_msg
+from ..model_connectors import CircuitOpenError, get_circuit_breaker
+from ..model_connectors.priority import call_priority
+
+
+g_logger = logging.getLogger(__name__)
 
 
 class NBUI:
@@ -22,6 +33,7 @@ class NBUI:
         system_prompt: str | None = None,
         system_prompts: list[str] | None = None,
         mode: Literal["ipywidgets.table", "ipywidgets.grid"] = "ipywidgets.grid",
+        warmup: bool = False,
         **kwargs,
     ):
         assert (models is not None) or (agents is not None)
@@ -61,28 +73,43 @@ class NBUI:
 
         self.mode = mode
 
+        self._warmup_task = self._start_warmup() if warmup else None
+
     async def __call__(
         self,
         q: str | None = None,
         prefill: str | None = None,
         to: list[int] | None = None,
+        timeouts: StreamTimeouts | dict[str, float] | None = None,
+        n: int = 1,
     ):
-        await self.ask(q, prefill, to)
+        await self.ask(q, prefill, to, timeouts, n)
 
     async def ask(
         self,
         q: str | None = None,
         prefill: str | None = None,
         to: list[int] | None = None,
+        timeouts: StreamTimeouts | dict[str, float] | None = None,
+        n: int = 1,
     ):
-        self._begin_show_reply_streams(to)
+        """Asks the agents (all active ones, or those in `to`), streaming their
+        replies side by side. With `n` > 1 every agent gives `n` alternative replies
+        (in one request where the provider supports it)."""
+        self._begin_show_reply_streams(to, n)
 
         self._agent_coros = []
         for i in range(len(self.agents)):
             if self.is_agent_active[i]:
                 if to is None or i in to:
+                    if (unavailable := self._get_unavailable_reason(i)) is not None:
+                        # (skipped, instead of holding up the other agents' replies)
+                        self._set_agent_unavailable(i, unavailable)
+                        continue
                     self._agent_coros.append(
-                        self._ask_and_update_reply_stream_display(i, q, prefill, to)
+                        self._ask_and_update_reply_stream_display(
+                            i, q, prefill, to, timeouts, n
+                        )
                     )
             else:
                 if to is not None and i in to:
@@ -90,7 +117,12 @@ class NBUI:
                         f"ERROR in NBUI.ask: IGNORING agent {i} it's not active, but was requested to reply"
                     )
 
-        await asyncio.gather(*self._agent_coros)
+        if self._unavailable_agents:
+            self._update_reply_streams_display(to)
+
+        # (a person is waiting on these, so they go before any background batch calls)
+        with call_priority("interactive"):
+            await asyncio.gather(*self._agent_coros)
 
         self._agent_coros = []
 
@@ -98,35 +130,146 @@ class NBUI:
 
         self._show_last_replies(to)
 
+    async def warmup(self):
+        """Connects to all agents' endpoints (and loads local models) in parallel."""
+        await asyncio.gather(*(ag.warmup() for ag in self.agents))
+
+    def _start_warmup(self) -> asyncio.Task | None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # (the async clients' connections would be tied to a throwaway loop)
+            g_logger.warning(
+                "NBUI: warmup needs a running event loop (eg. in a notebook), skipping"
+            )
+            return None
+        return loop.create_task(self.warmup())
+
+    def cancel(self, to: list[int] | None = None):
+        """Stops the replies being generated, keeping what was received so far."""
+        for i, ag in enumerate(self.agents):
+            if to is None or i in to:
+                ag.cancel()
+
     def set_active_agents(self, active_agent_idxs):
         self.is_agent_active = [
             (i in active_agent_idxs) for i in range(len(self.agents))
         ]
 
-    async def _ask_and_update_reply_stream_display(self, ag_idx, q, prefill, to):
+    async def _ask_and_update_reply_stream_display(
+        self, ag_idx, q, prefill, to, timeouts=None, n=1
+    ):
         ag = self.agents[ag_idx]
-        stream = ag.ask_async_stream(q, prefill)
-
-        async for _ in stream:
-            texts = [
-                (
-                    ag.messages[-1].content
-                    if not isinstance(ag.messages[-1], (list, tuple))
-                    else ag.messages[-1][-1].content
-                ).replace("\n", "<br>")
-                for i, ag in enumerate(self.agents)
-                if self.is_agent_active[i] and (to is None or i in to)
-            ]
-            if self.mode == "ipywidgets.table":
-                self._render_reply_streams_mode_ipwtable(texts)
-            elif self.mode == "ipywidgets.grid":
-                self._render_reply_streams_mode_ipwgridbox(texts)
-            else:
-                raise ValueError(
-                    f"ERROR in NBUI._update_reply_stream_display: Unknown mode: {self.mode}"
+
+        try:
+            if not ag.supports_streaming():
+                await ag.ask_async(q, prefill, timeouts=timeouts, n=n)
+                self._update_reply_streams_display(to)
+                return
+
+            stream = ag.ask_async_stream(q, prefill, timeouts=timeouts, n=n)
+
+            async for _ in stream:
+                self._update_reply_streams_display(to)
+        except CircuitOpenError as exc:
+            self._set_agent_unavailable(ag_idx, str(exc))
+            self._update_reply_streams_display(to)
+
+    def _get_unavailable_reason(self, ag_idx) -> str | None:
+        breaker = get_circuit_breaker(self.agents[ag_idx].connector)
+        if breaker is None or breaker.allows_calls():
+            return None
+        return (
+            f"{breaker.base_url} is down, next try in {breaker.get_retry_in():.0f}s"
+        )
+
+    def _set_agent_unavailable(self, ag_idx, reason):
+        self._unavailable_agents[ag_idx] = reason
+        if ag_idx in self._current_reply_agent_idxs:
+            j = self._current_reply_agent_idxs.index(ag_idx)
+            self._current_reply_htmls[j] = f"<i>[unavailable: {reason}]</i>"
+
+    def _update_reply_streams_display(self, to):
+        # only the text received since the last update gets converted to html
+        for j, ag_idx in enumerate(self._current_reply_agent_idxs):
+            if ag_idx in self._unavailable_agents:
+                continue
+            reply_msgs = self._get_current_reply_messages(
+                self.agents[ag_idx], self._current_n
+            )
+            if len(reply_msgs) != len(self._current_reply_msgs[j]) or any(
+                m is not current_m
+                for m, current_m in zip(reply_msgs, self._current_reply_msgs[j])
+            ):
+                self._current_reply_msgs[j] = reply_msgs
+                self._current_reply_offsets[j] = [0] * len(reply_msgs)
+                self._current_variant_htmls[j] = [""] * len(reply_msgs)
+            changed = False
+            for k, reply_msg in enumerate(reply_msgs):
+                offset = self._current_reply_offsets[j][k]
+                new_text = (
+                    reply_msg.stream.text_since(offset)
+                    if reply_msg.stream is not None
+                    else reply_msg.content[offset:]
+                )
+                if new_text:
+                    self._current_reply_offsets[j][k] += len(new_text)
+                    self._current_variant_htmls[j][k] += new_text.replace(
+                        "\n", "<br>"
+                    )
+                    changed = True
+            if changed or not reply_msgs:
+                self._current_reply_htmls[j] = self._make_variants_html(
+                    self._current_variant_htmls[j]
                 )
+        texts = self._current_reply_htmls
+        if self.mode == "ipywidgets.table":
+            self._render_reply_streams_mode_ipwtable(texts)
+        elif self.mode == "ipywidgets.grid":
+            self._render_reply_streams_mode_ipwgridbox(texts)
+        else:
+            raise ValueError(
+                f"ERROR in NBUI._update_reply_stream_display: Unknown mode: {self.mode}"
+            )
+
+    @staticmethod
+    def _get_last_messages(ag: AgentInterface, n: int = 1) -> list[Message]:
+        # (the last `n` alternatives, for multi-sample replies)
+        if isinstance(ag.messages[-1], (list, tuple)):
+            return list(ag.messages[-1][-n:])
+        return [ag.messages[-1]]
+
+    @classmethod
+    def _get_current_reply_messages(
+        cls, ag: AgentInterface, n: int = 1
+    ) -> list[Message]:
+        # non-streaming agents only append their replies when they're complete
+        return [m for m in cls._get_last_messages(ag, n) if m.role == "assistant"]
+
+    @staticmethod
+    def _make_variants_html(htmls: list[str]) -> str:
+        if len(htmls) <= 1:
+            return htmls[0] if htmls else ""
+        cols = "".join(
+            f'<div style="flex: 1; min-width: 0"><b>#{k}</b><br>{h}</div>'
+            for k, h in enumerate(htmls)
+        )
+        return f'<div style="display: flex; gap: 0.5rem">{cols}</div>'
 
-    def _begin_show_reply_streams(self, to):
+    def _begin_show_reply_streams(self, to, n=1):
+        self._current_reply_agent_idxs = [
+            i
+            for i in range(len(self.agents))
+            if self.is_agent_active[i] and (to is None or i in to)
+        ]
+        self._current_n = n
+        # :: per agent, its (n) replies being streamed, and their offsets and htmls
+        self._current_reply_msgs = [[] for _ in self._current_reply_agent_idxs]
+        self._current_reply_offsets = [[] for _ in self._current_reply_agent_idxs]
+        self._current_variant_htmls = [[] for _ in self._current_reply_agent_idxs]
+        self._current_reply_htmls = [""] * len(self._current_reply_agent_idxs)
+        # :: agent idx -> why it could not reply
+        self._unavailable_agents = {}
         self._show_reply_stream_style()
         self._current_reply_streams_container = self._build_reply_streams_container(to)
         self._current_reply_streams_accordion = widgets.Accordion(
@@ -328,12 +471,20 @@ class NBUI:
         for i, ag in enumerate(self.agents):
             if self.is_agent_active[i] and (to is None or i in to):
                 display(HTML(self._make_avatar_html(i, "Agent " + ag.model_name)))
-                last_msg = (
-                    ag.messages[-1]
-                    if not isinstance(ag.messages[-1], (list, tuple))
-                    else ag.messages[-1][-1]
-                )
-                display(Markdown(last_msg.content.replace("\n", "\n\n")))
+                if i in self._unavailable_agents:
+                    display(
+                        HTML(f"<i>[unavailable: {self._unavailable_agents[i]}]</i>")
+                    )
+                    if i == len(self.agents) - 1:
+                        display(HTML("<hr>"))
+                    continue
+                last_msgs = self._get_last_messages(ag, self._current_n)
+                for k, last_msg in enumerate(last_msgs):
+                    if len(last_msgs) > 1:
+                        display(HTML(f"<b>#{k}</b>"))
+                    display(Markdown(last_msg.content.replace("\n", "\n\n")))
+                    if last_msg.truncated:
+                        display(HTML(f"<i>[truncated: {last_msg.truncated}]</i>"))
                 if i == len(self.agents) - 1:
                     display(HTML("<hr>"))
 
@@ -347,6 +498,18 @@ class NBUI:
     def _make_avatar_html(self, idx, name):
         return f'<span class="S6-Avatar S6-AgentIdx-{idx}" style="border: 1px solid goldenrod">🤖 {name}</span>'
 
+    def _get_message_params(self, ag_idx, msg) -> dict | None:
+        params_idx = msg.params
+        if isinstance(params_idx, dict):
+            # deserialized messages map agent idx (maybe as str) -> params idx
+            params_idx = params_idx.get(ag_idx, params_idx.get(str(ag_idx)))
+        if params_idx is None or ag_idx is None:
+            return None
+        params_versions = self.agents[ag_idx].params_versions
+        if params_idx >= len(params_versions):
+            return None
+        return params_versions[params_idx]
+
     def _make_message_display_levels(self, msg_by_id, msg_in_agents_count) -> dict:
         levels = {}
 
@@ -435,6 +598,9 @@ class NBUI:
 
     def _show_conversation(self, levels, msg_by_id, short=80):
         def _show_msg(msg, idx=None, ag_name=None):
+            msg_params = (
+                self._get_message_params(idx, msg) if msg.role == "assistant" else None
+            )
             display(
                 HTML(
                     self._make_avatar_html(
@@ -444,6 +610,7 @@ class NBUI:
                         else msg.role.upper(),
                     )
                     + f" &nbsp;&nbsp;{level_idx}:{i}:{j}"
+                    + (f" &nbsp;&nbsp;<code>{msg_params}</code>" if msg_params else "")
                 )
             )
             c = msg.content[:short] if short else msg.content
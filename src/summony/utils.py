@@ -1,3 +1,7 @@
+import importlib
+from typing import Any, Iterator, Mapping
+
+
 def separate_prefixed(d: dict, prefix: str) -> tuple[dict, dict]:
     params_from_kwargs = {}
     left_kwargs = {}
@@ -13,13 +17,67 @@ def _dict_to_deep_frozenset(d, _depth=0):
     if _depth > 42:
         return d
     return frozenset(
-        {
-            k: _dict_to_deep_frozenset(v, _depth + 1) if isinstance(v, dict) else v
-            for k, v in d.items()
-        }.items()
+        {k: _to_deep_frozen(v, _depth + 1) for k, v in d.items()}.items()
     )
 
 
+def _to_deep_frozen(v, _depth=0):
+    if isinstance(v, dict):
+        return _dict_to_deep_frozenset(v, _depth)
+    elif isinstance(v, (list, tuple)):
+        return tuple(_to_deep_frozen(vv, _depth + 1) for vv in v)
+    elif isinstance(v, set):
+        return frozenset(_to_deep_frozen(vv, _depth + 1) for vv in v)
+    return v
+
+
 class HashableDict(dict):
     def __hash__(self):
         return hash(_dict_to_deep_frozenset(self))
+
+
+class FrozenKey:
+    """Deep-frozen snapshot of a dict, with its hash computed once."""
+
+    __slots__ = ("_frozen", "_hash")
+
+    def __init__(self, d: dict):
+        self._frozen = _dict_to_deep_frozenset(d)
+        self._hash = hash(self._frozen)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenKey):
+            return NotImplemented
+        return self._hash == other._hash and self._frozen == other._frozen
+
+
+class LazyClassRegistry(Mapping[str, type]):
+    """Maps class names to classes, importing each one's module only when the class
+    is first looked up (eg. so that provider SDKs are only imported when used)."""
+
+    __slots__ = ("_package", "_class_modules")
+
+    def __init__(self, package: str, class_modules: dict[str, str]):
+        self._package = package
+        # :: class name -> module (relative to package) defining it
+        self._class_modules = class_modules
+
+    def __getitem__(self, name: str) -> type:
+        if name not in self._class_modules:
+            raise KeyError(name)
+        module = importlib.import_module(
+            f".{self._class_modules[name]}", self._package
+        )
+        return getattr(module, name)
+
+    def __contains__(self, name: Any) -> bool:
+        return name in self._class_modules
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._class_modules)
+
+    def __len__(self) -> int:
+        return len(self._class_modules)
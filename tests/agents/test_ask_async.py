@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from summony.agents.dummy_agent import DummyAgent
+
+from fakes import FakeConnector
+
+
+def make_agent(connector, memory_logger) -> DummyAgent:
+    agent = DummyAgent("fake-model", logger=memory_logger, coalescer=None)
+    agent.connector = connector
+    return agent
+
+
+def test_ask_async_keeps_the_conversation(fake_connector, memory_logger):
+    agent = make_agent(fake_connector, memory_logger)
+
+    async def run():
+        assert await agent.ask_async("hi") == "r1"
+        assert await agent.ask_async() == "r2"
+
+    asyncio.run(run())
+    question, replies = agent.messages[-2:]
+    assert (question.role, question.content) == ("user", "hi")
+    assert [m.content for m in replies] == ["r1", "r2"]
+    assert [m.log_path for m in replies] == ["call-1", "call-2"]
+    assert memory_logger.records[0]["res_content"] == {"call": 1}
+
+
+def test_ask_async_calls_run_concurrently(memory_logger):
+    connector = FakeConnector(delay=0.1)
+    agent = make_agent(connector, memory_logger)
+
+    async def run():
+        branches = [agent.branch() for _ in range(50)]
+        return await asyncio.gather(
+            *(ag.ask_async(f"q{i}") for i, ag in enumerate(branches))
+        )
+
+    started_at = time.monotonic()
+    replies = asyncio.run(run())
+    assert sorted(replies) == sorted(f"r{i}" for i in range(1, 51))
+    # (all in flight at once, on one event loop)
+    assert time.monotonic() - started_at < 1
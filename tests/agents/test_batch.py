@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from summony.agents import ask_many
+from summony.agents.dummy_agent import DummyAgent
+
+from fakes import FakeConnector
+
+
+class BranchCountingAgent(DummyAgent):
+    def branch(self):
+        self.branches += 1
+        return super().branch()
+
+
+def make_agent(memory_logger, delay: float = 0.02) -> BranchCountingAgent:
+    agent = BranchCountingAgent("fake-model", logger=memory_logger, coalescer=None)
+    agent.connector = FakeConnector(delay=delay)
+    agent.branches = 0
+    return agent
+
+
+def test_branches_are_made_as_concurrency_allows(memory_logger):
+    agent = make_agent(memory_logger)
+    prompts = [f"q{i}" for i in range(10)]
+
+    async def run():
+        branches_by_result = []
+        async for result in ask_many([agent], prompts, concurrency=2):
+            assert result.error is None
+            branches_by_result.append(agent.branches)
+        return branches_by_result
+
+    branches_by_result = asyncio.run(run())
+    assert len(branches_by_result) == 10
+    # (the in-flight ones, and the ones started as they completed)
+    assert branches_by_result[0] <= 4
+    assert agent.branches == 10
+    assert agent.connector.calls == 10
+
+
+def test_errors_are_raised_if_asked(memory_logger):
+    class FailingConnector(FakeConnector):
+        async def generate_async(self, messages, model, **kwargs):
+            raise ValueError("bad request")
+
+    agent = make_agent(memory_logger)
+    agent.connector = FailingConnector()
+
+    async def run(raise_errors):
+        return [r async for r in ask_many([agent], ["q"], raise_errors=raise_errors)]
+
+    (result,) = asyncio.run(run(False))
+    assert isinstance(result.error, ValueError)
+    with pytest.raises(ValueError, match="bad request"):
+        asyncio.run(run(True))
@@ -0,0 +1,44 @@
+import asyncio
+
+from summony.agents import MemoryResponseCache
+from summony.agents.dummy_agent import DummyAgent
+
+
+def make_agent(fake_connector, memory_logger) -> DummyAgent:
+    agent = DummyAgent(
+        "fake-model", logger=memory_logger, cache=MemoryResponseCache(), coalescer=None
+    )
+    agent.connector = fake_connector
+    return agent
+
+
+def test_ask_is_answered_from_cache(fake_connector, memory_logger):
+    agent = make_agent(fake_connector, memory_logger)
+    assert agent.ask("hi") == "r1"
+    other = make_agent(fake_connector, memory_logger)
+    other.cache = agent.cache
+    assert other.ask("hi") == "r1"
+    assert fake_connector.calls == 1
+
+
+def test_reask_is_not_answered_from_cache(fake_connector, memory_logger):
+    agent = make_agent(fake_connector, memory_logger)
+    assert agent.ask("hi") == "r1"
+    assert agent.ask() == "r2"
+    assert fake_connector.calls == 2
+    assert agent.messages[-1][0].log_path != agent.messages[-1][1].log_path
+
+
+def test_reask_async_is_not_answered_from_cache(fake_connector, memory_logger):
+    agent = make_agent(fake_connector, memory_logger)
+
+    async def stream(question):
+        return "".join([c async for c in agent.ask_async_stream(question)])
+
+    async def run():
+        assert await agent.ask_async("hi") == "r1"
+        assert await agent.ask_async() == "r2"
+        assert await stream(None) == "r3"
+
+    asyncio.run(run())
+    assert fake_connector.calls == 3
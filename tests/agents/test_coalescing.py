@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from summony.agents import RequestCoalescer
+from summony.agents.dummy_agent import DummyAgent
+
+from fakes import FakeConnector
+
+
+def test_identical_streams_share_one_call(memory_logger):
+    connector = FakeConnector(delay=0.02)
+    coalescer = RequestCoalescer()
+    agents = [
+        DummyAgent("fake-model", logger=memory_logger, coalescer=coalescer)
+        for _ in range(3)
+    ]
+    for ag in agents:
+        ag.connector = connector
+
+    async def stream(ag):
+        chunks = [c async for c in ag.ask_async_stream("hi", p_temperature=0)]
+        return "".join(chunks)
+
+    async def run():
+        return await asyncio.gather(*(stream(ag) for ag in agents))
+
+    assert asyncio.run(run()) == ["r1"] * 3
+    assert connector.calls == 1
+    assert coalescer.stats.coalesced == 2
+    # (every agent keeping its own reply and log)
+    assert all(ag.messages[-1].content == "r1" for ag in agents)
+    assert len(memory_logger.records) == 3
+
+
+def test_errors_reach_every_caller():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def start():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        raise ValueError("bad request")
+
+    async def run():
+        return await asyncio.gather(
+            *(coalescer.run("key", start) for _ in range(3)), return_exceptions=True
+        )
+
+    errors = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_calls_are_not_shared_once_done():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def start():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        return [await coalescer.run("key", start) for _ in range(2)]
+
+    assert asyncio.run(run()) == [1, 2]
+
+
+def test_non_deterministic_requests_are_not_coalesced():
+    coalescer = RequestCoalescer()
+    assert coalescer.should_coalesce({"temperature": 0})
+    assert not coalescer.should_coalesce({"temperature": 0.7})
+    assert not coalescer.should_coalesce({})
+
+
+@pytest.mark.parametrize("cancelled", [1, 3])
+def test_upstream_call_stops_with_its_last_caller(cancelled):
+    coalescer = RequestCoalescer()
+    finished = []
+
+    async def start():
+        await asyncio.sleep(0.1)
+        finished.append(1)
+        return "done"
+
+    async def run():
+        tasks = [asyncio.create_task(coalescer.run("key", start)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        for task in tasks[:cancelled]:
+            task.cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[cancelled:] == ["done"] * (3 - cancelled)
+    assert finished == ([1] if cancelled < 3 else [])
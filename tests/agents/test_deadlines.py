@@ -0,0 +1,27 @@
+import asyncio
+
+from summony.agents import MemoryResponseCache
+from summony.agents.dummy_agent import DummyAgent
+
+
+def test_stream_stopped_by_its_consumer_is_truncated(fake_connector, memory_logger):
+    agent = DummyAgent(
+        "fake-model", logger=memory_logger, cache=MemoryResponseCache(), coalescer=None
+    )
+    agent.connector = fake_connector
+
+    async def run():
+        stream = agent.ask_async_stream("hi")
+        first_chunk = await anext(stream)
+        await stream.aclose()
+        return first_chunk
+
+    assert asyncio.run(run()) == "r1"
+    assert agent.messages[-1].content == "r1"
+    assert agent.messages[-1].truncated == "cancelled"
+    assert memory_logger.records[-1]["res_content"]["truncated"] == "cancelled"
+
+    # (the partial reply not being cached)
+    other = DummyAgent("fake-model", logger=memory_logger, cache=agent.cache)
+    other.connector = fake_connector
+    assert other.ask("hi") == "r2"
@@ -0,0 +1,26 @@
+from summony.agents import RawResponsesStore
+
+
+def test_spills_and_reads_back(tmp_path):
+    store = RawResponsesStore(max_memory_bytes=64, spill_path=tmp_path / "raw.bin")
+    for i in range(10):
+        store.append(i, {"payload": i})
+    assert store.spilled_bytes > 0
+    assert [store[i] for i in range(10)] == [[{"payload": i}] for i in range(10)]
+
+
+def test_sibling_branches_spill_to_their_own_files(tmp_path):
+    parent = RawResponsesStore(max_memory_bytes=64, spill_path=tmp_path / "raw.bin")
+    branches = [parent.new_empty(), parent.new_empty()]
+    assert branches[0].spill_path != branches[1].spill_path
+
+    # (interleaved, as with branches asked in parallel)
+    for i in range(10):
+        for b, branch in enumerate(branches):
+            branch.append(i, {"branch": b, "payload": i})
+    assert all(branch.spilled_bytes > 0 for branch in branches)
+
+    for b, branch in enumerate(branches):
+        assert [branch[i] for i in range(10)] == [
+            [{"branch": b, "payload": i}] for i in range(10)
+        ]
@@ -0,0 +1,46 @@
+from summony.agents.agents import Message, RenderedHistory
+
+
+def make_messages() -> list:
+    return [
+        Message.system("be brief"),
+        Message.user("hi"),
+        [Message.assistant("a1"), Message.assistant("a2")],
+    ]
+
+
+def test_unchanged_messages_are_rendered_once():
+    messages = make_messages()
+    history = RenderedHistory()
+    first = history.render(messages)
+    messages.append(Message.user("more"))
+    second = history.render(messages)
+    assert [m["content"] for m in second] == ["be brief", "hi", "a2", "more"]
+    assert all(a is b for a, b in zip(first, second))
+
+
+def test_reask_renders_the_new_alternative():
+    messages = make_messages()
+    history = RenderedHistory()
+    history.render(messages)
+    messages[-1].append(Message.assistant("a3"))
+    assert history.render(messages)[-1]["content"] == "a3"
+
+
+def test_chosen_flip_renders_the_chosen_alternative():
+    messages = make_messages()
+    history = RenderedHistory()
+    rendered = history.render(messages)
+    assert rendered[-1]["content"] == "a2"
+    messages[-1][0].chosen = True
+    assert history.render(messages)[-1]["content"] == "a1"
+    # (the other entries still reused)
+    assert history.render(messages)[1] is rendered[1]
+
+
+def test_edited_message_is_rendered_again():
+    messages = make_messages()
+    history = RenderedHistory()
+    history.render(messages)
+    messages[1].content = "hello"
+    assert history.render(messages, end=-1)[1]["content"] == "hello"
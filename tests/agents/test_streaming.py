@@ -0,0 +1,30 @@
+import time
+
+from summony.agents.streaming import StreamBuffer
+
+
+def test_text_since_gives_the_text_after_an_offset():
+    buffer = StreamBuffer()
+    for chunk in ["Hel", "lo, ", "world"]:
+        buffer.append(chunk)
+    assert len(buffer) == 12
+    assert buffer.text_since(0) == "Hello, world"
+    assert buffer.text_since(4) == "o, world"
+    assert buffer.text_since(7) == "world"
+    assert buffer.text_since(12) == ""
+    assert buffer.finish() == "Hello, world"
+    assert buffer.text_since(4) == "o, world"
+
+
+def test_chunk_timings_are_recorded():
+    buffer = StreamBuffer()
+    time.sleep(0.02)
+    buffer.append("a")
+    time.sleep(0.02)
+    buffer.append("b")
+    buffer.finish()
+    timings = buffer.get_timings()
+    assert timings["chunks_count"] == 2
+    assert timings["time_to_first_token"] >= 0.02
+    assert timings["mean_inter_token_latency"] >= 0.02
+    assert timings["total_time"] >= 0.04
@@ -0,0 +1,13 @@
+import pytest
+
+from fakes import FakeConnector, MemoryXLogger
+
+
+@pytest.fixture
+def fake_connector() -> FakeConnector:
+    return FakeConnector()
+
+
+@pytest.fixture
+def memory_logger() -> MemoryXLogger:
+    return MemoryXLogger()
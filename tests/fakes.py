@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Any
+
+from summony.loggers import BaseXLogger
+from summony.model_connectors import ModelConnectorInterface
+
+
+class FakeConnector(ModelConnectorInterface):
+    """Replies `"r<call number>"`, streamed as `chunks` chunks."""
+
+    def __init__(
+        self,
+        creds: dict | None = None,
+        client_args: dict[str, Any] | None = None,
+        logger: logging.Logger | None = None,
+        delay: float = 0.0,
+        chunks: int = 3,
+    ):
+        self.logger = logging.getLogger("fake")
+        self.delay = delay
+        self.chunks = chunks
+        self.calls = 0
+
+    def generate(self, messages, model, **kwargs):
+        self.calls += 1
+        return f"r{self.calls}", {"call": self.calls}
+
+    async def generate_async(self, messages, model, **kwargs):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(self.delay)
+        return f"r{call}", {"call": call}
+
+    def generate_stream(self, messages, model, **kwargs):
+        raise NotImplementedError
+
+    async def generate_async_stream(self, messages, model, **kwargs):
+        self.calls += 1
+        call = self.calls
+        for i in range(self.chunks):
+            await asyncio.sleep(self.delay)
+            yield (f"r{call}" if i == 0 else ""), {"call": call, "chunk": i}
+
+    def get_base_url(self) -> str:
+        return "http://fake/"
+
+
+class MemoryXLogger(BaseXLogger):
+    """Keeps the model calls' records in memory."""
+
+    def __init__(self):
+        super().__init__(logging.getLogger("test"), "test")
+        self.records = []
+
+    def log_model_call(self, **kwargs):
+        self.records.append(kwargs)
+        return f"call-{len(self.records)}"
+
+
+class BaselineXLogger(BaseXLogger):
+    """A custom logger written against the original `log_model_call` signature."""
+
+    def __init__(self):
+        super().__init__(logging.getLogger("test"), "test")
+        self.records = []
+
+    def log_model_call(
+        self,
+        *,
+        req_content: dict,
+        req_base_url: str | None = None,
+        req_url: str | None = None,
+        req_headers: dict | None = None,
+        res_content: dict = None,
+        res_status_code: int | None = None,
+        res_headers: dict | None = None,
+        error: Exception | None = None,
+    ):
+        self.records.append(dict(res_content=res_content, error=error))
+        return f"call-{len(self.records)}"
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from summony.agents.dummy_agent import DummyAgent
+from summony.loggers import BaseXLogger, DefaultXLogger, LogWriter
+
+from fakes import BaselineXLogger
+
+
+class ChunkCountingXLogger(BaseXLogger):
+    """A logger written against the original `log_model_reply_chunk` hook."""
+
+    def __init__(self):
+        super().__init__(logging.getLogger("test"), "test")
+        self.chunks = []
+        self.records = []
+
+    def log_model_call(self, **kwargs):
+        self.records.append(kwargs)
+        return f"call-{len(self.records)}"
+
+    def log_model_reply_chunk(self, chunk, error=None):
+        self.chunks.append(chunk)
+
+
+def test_reply_chunk_hook_keeps_its_signature(fake_connector):
+    logger = ChunkCountingXLogger()
+    agent = DummyAgent("fake-model", logger=logger, coalescer=None)
+    agent.connector = fake_connector
+
+    async def run():
+        return "".join([c async for c in agent.ask_async_stream("hi")])
+
+    assert asyncio.run(run()) == "r1"
+    assert logger.chunks == [{"call": 1, "chunk": i} for i in range(3)]
+    assert logger.records[0]["res_content"]["chunks"] == logger.chunks
+
+
+def test_streams_log_to_baseline_loggers(fake_connector):
+    logger = BaselineXLogger()
+    agent = DummyAgent("fake-model", logger=logger, coalescer=None)
+    agent.connector = fake_connector
+
+    async def run():
+        return "".join([c async for c in agent.ask_async_stream("hi")])
+
+    assert asyncio.run(run()) == "r1"
+    assert len(logger.records[0]["res_content"]["chunks"]) == 3
+    assert agent.messages[-1].log_path == "call-1"
+
+
+def test_failed_stream_log_keeps_its_error(fake_connector):
+    class FailingXLogger(BaselineXLogger):
+        def log_model_call(self, **kwargs):
+            if not self.records:
+                self.records.append(kwargs)
+                raise OSError("disk full")
+            return super().log_model_call(**kwargs)
+
+    logger = FailingXLogger()
+    agent = DummyAgent("fake-model", logger=logger, coalescer=None)
+    agent.connector = fake_connector
+
+    async def run():
+        return "".join([c async for c in agent.ask_async_stream("hi")])
+
+    # (the logger's error, not one from ending the call's log twice)
+    with pytest.raises(OSError, match="disk full"):
+        asyncio.run(run())
+    assert isinstance(logger.records[-1]["error"], OSError)
+
+
+def test_streamed_call_files_are_written_by_the_writer(tmp_path):
+    writer = LogWriter()
+    logger = DefaultXLogger(
+        logging.getLogger("test"), tmp_path / "calls", writer=writer
+    )
+    writer.submit(time.sleep, 0.2)
+
+    call_id = logger.begin_model_call(req_content={"model": "m", "messages": []})
+    logger.log_model_call_chunk(call_id, {"i": 0})
+    # (nothing done on the caller's thread)
+    assert not (tmp_path / "calls").exists()
+    assert logger.read_model_call(call_id)["incomplete"]
+
+    logger.end_model_call(call_id, res_content={"done": True})
+    record = logger.read_model_call(call_id)
+    assert record["request"]["model"] == "m"
+    assert record["response"] == {"chunks": [{"i": 0}], "done": True}
+    assert "incomplete" not in record
+    writer.close()
@@ -0,0 +1,38 @@
+import time
+
+import pytest
+
+from summony.loggers import LogWriter
+from summony.loggers.message_blobs import MessageBlobStore
+
+
+@pytest.fixture
+def writer():
+    writer = LogWriter()
+    yield writer
+    writer.close()
+
+
+def test_put_leaves_io_to_the_writer(tmp_path, writer):
+    store = MessageBlobStore(tmp_path / "blobs", writer=writer)
+    writer.submit(time.sleep, 0.2)
+    messages = [{"role": "user", "content": f"m{i}"} for i in range(3)]
+    ids = store.put_all(messages)
+    # (nothing done on the caller's thread)
+    assert not (tmp_path / "blobs").exists()
+    assert store.get_all(ids) == messages
+
+
+def test_get_all_waits_for_the_writer_at_most_once(tmp_path, writer, monkeypatch):
+    store = MessageBlobStore(tmp_path, writer=writer)
+    messages = [{"role": "user", "content": f"m{i}"} for i in range(5)]
+    ids = store.put_all(messages)
+    flushes = []
+    flush = writer.flush
+    monkeypatch.setattr(writer, "flush", lambda: flushes.append(flush()))
+
+    assert store.get_all(ids) == messages
+    assert len(flushes) == 1
+    # (all written by now)
+    assert store.get_all(ids) == messages
+    assert len(flushes) == 1
@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+import time
+
+import pytest
+
+from summony.loggers import LogWriter, SegmentedLogStore
+
+
+@pytest.fixture
+def writer():
+    writer = LogWriter(flush_interval=0.05)
+    yield writer
+    writer.close()
+
+
+def test_reads_back_records_across_rotated_and_compressed_segments(tmp_path, writer):
+    store = SegmentedLogStore(tmp_path, max_segment_bytes=2000, writer=writer)
+    refs = [store.append({"i": i, "pad": "x" * 100}) for i in range(100)]
+    assert all(store.read(ref)["i"] == i for i, ref in enumerate(refs))
+    writer.flush()
+    assert len(list(tmp_path.glob("*.jsonl.gz"))) > 1
+    assert len(list(tmp_path.glob("*.jsonl"))) == 1
+
+    store.close()
+    # (a new store, eg. in a later run, reads them from their indexes)
+    other = SegmentedLogStore(tmp_path, writer=writer)
+    assert [other.read(ref)["i"] for ref in refs] == list(range(100))
+
+
+def test_append_leaves_io_to_the_writer(tmp_path, writer):
+    store = SegmentedLogStore(tmp_path, writer=writer)
+    writer.submit(time.sleep, 0.2)
+    started_at = time.monotonic()
+    ref = store.append({"i": 0})
+    assert time.monotonic() - started_at < 0.1
+    assert store.read(ref) == {"i": 0}
+
+
+def test_active_segment_is_flushed_periodically(tmp_path, writer):
+    store = SegmentedLogStore(tmp_path, writer=writer)
+    store.append({"i": 0})
+    time.sleep(0.2)
+    (segment,) = tmp_path.glob("*.jsonl")
+    assert segment.read_bytes() == b'{"i":0}\n'
+
+
+def test_segments_left_by_exited_processes_get_compressed(tmp_path, writer):
+    store = SegmentedLogStore(tmp_path, writer=writer)
+    ref = store.append({"i": 0})
+    store.close()
+    (segment,) = tmp_path.glob("*.jsonl")
+    # (as if written by a process that exited since)
+    orphan = segment.with_name(segment.name.replace(f"_{os.getpid()}-", "_999999999-"))
+    segment.rename(orphan)
+
+    other = SegmentedLogStore(tmp_path, writer=writer)
+    other.append({"i": 1})
+    writer.flush()
+    assert not orphan.exists()
+    assert orphan.with_name(orphan.name + ".gz").exists()
+    orphan_ref = ref.replace(f"_{os.getpid()}-", "_999999999-")
+    assert other.read(orphan_ref) == {"i": 0}
+
+
+def test_written_records_are_read_without_waiting_for_the_writer(tmp_path, writer):
+    store = SegmentedLogStore(tmp_path, writer=writer)
+    ref = store.append({"i": 0})
+    store.flush()
+    writer.submit(time.sleep, 0.3)
+    started_at = time.monotonic()
+    assert store.read(ref) == {"i": 0}
+    assert time.monotonic() - started_at < 0.1
+
+
+def test_other_runs_records_are_read_without_listing_segments(
+    tmp_path, writer, monkeypatch
+):
+    store = SegmentedLogStore(tmp_path, max_segment_bytes=100, writer=writer)
+    refs = [store.append({"i": i}) for i in range(30)]
+    store.close()
+
+    other = SegmentedLogStore(tmp_path, writer=writer)
+    monkeypatch.setattr(Path, "glob", None)
+    assert [other.read(ref)["i"] for ref in refs] == list(range(30))
@@ -0,0 +1,26 @@
+from summony.loggers import DefaultXLogger
+from summony.loggers.loggers import get_shared_logger
+
+
+def test_xloggers_share_one_backend(tmp_path):
+    log_file = tmp_path / "logs" / "log.log"
+    shared_logger = get_shared_logger(log_file)
+    assert get_shared_logger(log_file) is shared_logger
+    handlers = list(shared_logger.handlers)
+
+    xloggers = [
+        DefaultXLogger(shared_logger, tmp_path / f"calls-{i}", name=f"agent-{i}")
+        for i in range(100)
+    ]
+    assert shared_logger.handlers == handlers
+    # (nothing created before something is logged)
+    assert not (tmp_path / "logs").exists()
+    assert not list(tmp_path.glob("calls-*"))
+
+    xloggers[1].info("hello")
+    xloggers[2].warning("world")
+    for handler in handlers:
+        handler.flush()
+    lines = log_file.read_text().splitlines()
+    assert lines[0].startswith("INFO") and lines[0].endswith("hello @agent-1")
+    assert lines[1].startswith("WARNING") and lines[1].endswith("world @agent-2")
@@ -0,0 +1,54 @@
+import json
+import threading
+import time
+
+from summony.loggers import DefaultXLogger, LogWriter
+
+
+def test_write_only_queues_the_record(tmp_path):
+    writer = LogWriter()
+    release = threading.Event()
+    writer.submit(release.wait)
+
+    path = tmp_path / "a.json"
+    started_at = time.monotonic()
+    writer.write(path, {"i": 0})
+    assert time.monotonic() - started_at < 0.1
+    assert not path.exists()
+
+    release.set()
+    writer.flush()
+    assert json.loads(path.read_text()) == {"i": 0}
+    writer.close()
+
+
+def test_compact_records_are_single_lines(tmp_path):
+    writer = LogWriter(compact=True)
+    writer.write(tmp_path / "a.json", {"i": 0, "s": "é"})
+    writer.flush()
+    assert (tmp_path / "a.json").read_bytes().decode("utf-8") == '{"i":0,"s":"é"}'
+    writer.close()
+
+
+def test_records_are_written_inline_once_closed(tmp_path):
+    writer = LogWriter()
+    writer.close()
+    writer.write(tmp_path / "a.json", {"i": 0})
+    assert json.loads((tmp_path / "a.json").read_text()) == {"i": 0}
+
+
+def test_log_path_is_returned_before_the_log_is_written(tmp_path):
+    writer = LogWriter()
+    release = threading.Event()
+    writer.submit(release.wait)
+    logger = DefaultXLogger(model_logs_path=tmp_path / "calls", writer=writer)
+
+    log_path = logger.log_model_call(req_content={"model": "m"})
+    assert log_path.startswith("calls/")
+    assert not list(tmp_path.glob("calls/*.json"))
+
+    release.set()
+    logger.flush()
+    (log_file,) = tmp_path.glob("calls/*.json")
+    assert json.loads(log_file.read_text())["request"] == {"model": "m"}
+    writer.close()
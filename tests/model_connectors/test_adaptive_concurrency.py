@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+from summony.agents.deadlines import CallGuard, StreamTimeouts
+from summony.model_connectors.adaptive_concurrency import (
+    AdaptiveConcurrencyLimiter,
+    AdaptiveConcurrencyModelConnector,
+    get_concurrency_limiter,
+)
+
+from fakes import FakeConnector
+
+
+def count_attempts(limiter: AdaptiveConcurrencyLimiter) -> list:
+    try_admit = limiter._try_admit
+    attempts = []
+
+    def counting_try_admit(ticket):
+        attempts.append(ticket)
+        return try_admit(ticket)
+
+    limiter._try_admit = counting_try_admit
+    return attempts
+
+
+def test_waiters_get_freed_slots_in_order_without_polling():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    attempts = count_attempts(limiter)
+    admitted = []
+
+    async def call(i):
+        await limiter.acquire()
+        admitted.append(i)
+        assert limiter.in_flight <= 2
+        await asyncio.sleep(0.05)
+        limiter.release("ok")
+
+    async def run():
+        await asyncio.gather(*(call(i) for i in range(8)))
+
+    asyncio.run(run())
+    assert admitted == list(range(8))
+    assert limiter.in_flight == 0
+    # (one attempt on arrival, and a few more once next)
+    assert len(attempts) <= 8 * 3
+
+
+def test_grows_only_when_saturated():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+    for _ in range(10):
+        limiter.acquire_sync()
+        limiter.release("ok")
+    assert limiter.current_limit == 4
+
+    for _ in range(4):
+        limiter.acquire_sync()
+    for _ in range(4):
+        limiter.release("ok")
+    assert limiter.limit > 4
+
+
+def test_slow_complete_calls_are_not_latency_spikes():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    limiter.acquire_sync()
+    limiter.release("ok", 0.1)
+    for _ in range(3):
+        # (non-streamed calls give no latency, their duration depending on the reply)
+        limiter.acquire_sync()
+        limiter.release("ok")
+    assert limiter.stats.latency_spikes == 0
+    limiter.acquire_sync()
+    limiter.release("ok", 1.0)
+    assert limiter.stats.latency_spikes == 1
+
+
+def test_get_concurrency_limiter_warns_about_ignored_settings(caplog):
+    limiter = get_concurrency_limiter("http://limited/", max_limit=8)
+    assert get_concurrency_limiter("http://limited/", max_limit=8) is limiter
+    assert not caplog.records
+    assert get_concurrency_limiter("http://limited/", max_limit=16) is limiter
+    assert "ignoring {'max_limit': 16}" in caplog.text
+    assert limiter.max_limit == 8
+
+
+def test_timed_out_calls_are_overloads():
+    class SlowConnector(FakeConnector):
+        def get_base_url(self) -> str:
+            return "http://timing-out/"
+
+    connector = AdaptiveConcurrencyModelConnector(
+        SlowConnector(delay=0.5), initial_limit=8, decrease_cooldown=0
+    )
+
+    async def run():
+        for _ in range(3):
+            guard = CallGuard(StreamTimeouts(total=0.01))
+            assert await guard.run(connector.generate_async([], "m")) is None
+
+    asyncio.run(run())
+    assert connector.limiter.stats.overloads == 3
+    assert connector.limiter.current_limit == 1
+
+
+def test_sync_waiter_blocking_the_loop_does_not_wait_for_it():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    admitted = []
+
+    async def call(i):
+        await limiter.acquire()
+        admitted.append(i)
+        await asyncio.sleep(0.05)
+        limiter.release("ok")
+
+    async def run():
+        tasks = [asyncio.create_task(call(i)) for i in range(2)]
+        await asyncio.sleep(0.01)
+        # (the slot being held by a call of the blocked loop)
+        limiter.acquire_sync()
+        admitted.append("sync")
+        limiter.release("ok")
+        await asyncio.gather(*tasks)
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+    thread.start()
+    thread.join(timeout=3)
+    assert not thread.is_alive()
+    assert admitted == [0, "sync", 1]
+    assert limiter.in_flight == 0
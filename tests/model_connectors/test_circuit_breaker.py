@@ -0,0 +1,78 @@
+import asyncio
+import itertools
+
+import pytest
+
+from summony.agents.deadlines import CallGuard, StreamTimeouts
+from summony.model_connectors import CircuitBreakerModelConnector
+
+from fakes import FakeConnector
+
+
+_g_endpoint_ids = itertools.count()
+
+
+class SlowConnector(FakeConnector):
+    """A fake endpoint of its own (so with a breaker of its own)."""
+
+    def __init__(self, delay: float):
+        super().__init__(delay=delay)
+        self.base_url = f"http://slow-{next(_g_endpoint_ids)}/"
+
+    def get_base_url(self) -> str:
+        return self.base_url
+
+
+def make_connector(**breaker_kwargs) -> CircuitBreakerModelConnector:
+    return CircuitBreakerModelConnector(
+        SlowConnector(delay=0.5), failure_threshold=1, **breaker_kwargs
+    )
+
+
+def test_timed_out_call_is_a_failure():
+    connector = make_connector()
+    guard = CallGuard(StreamTimeouts(total=0.05))
+
+    assert asyncio.run(guard.run(connector.generate_async([], "m"))) is None
+    assert guard.truncated_reason == "total_timeout"
+    assert connector.breaker.stats.failures == 1
+    assert connector.breaker.state == "open"
+
+
+def test_stalled_stream_is_a_failure():
+    connector = CircuitBreakerModelConnector(
+        SlowConnector(delay=0.1), failure_threshold=1
+    )
+    guard = CallGuard(StreamTimeouts(stall=0.05))
+
+    async def run():
+        stream = connector.generate_async_stream([], "m")
+        return [chunk async for chunk in guard.iterate(stream)]
+
+    assert len(asyncio.run(run())) == 1
+    assert guard.truncated_reason == "stall_timeout"
+    assert connector.breaker.stats.failures == 1
+
+
+@pytest.mark.parametrize("timeouts_are_failures", [True, False])
+def test_cancelled_call_is_neutral(timeouts_are_failures):
+    connector = make_connector(timeouts_are_failures=timeouts_are_failures)
+    guard = CallGuard(StreamTimeouts(total=10))
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.05, guard.cancel)
+        return await guard.run(connector.generate_async([], "m"))
+
+    assert asyncio.run(run()) is None
+    assert guard.truncated_reason == "cancelled"
+    assert connector.breaker.stats.failures == 0
+    assert connector.breaker.state == "closed"
+
+
+def test_timeouts_can_be_neutral():
+    connector = make_connector(timeouts_are_failures=False)
+    guard = CallGuard(StreamTimeouts(total=0.05))
+
+    assert asyncio.run(guard.run(connector.generate_async([], "m"))) is None
+    assert connector.breaker.stats.failures == 0
+    assert connector.breaker.state == "closed"
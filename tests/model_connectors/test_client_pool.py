@@ -0,0 +1,80 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+import pytest
+
+from summony.model_connectors import ClientPool
+
+
+class _ChatCompletionsHandler(BaseHTTPRequestHandler):
+    # (keep-alive, so that pooled connections get reused)
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps(
+            {
+                "id": "chatcmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-test",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "hello"},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def openai_base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatCompletionsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def test_async_clients_are_pooled_per_event_loop():
+    pool = ClientPool()
+
+    async def get_twice():
+        return pool.get_async("key", object), pool.get_async("key", object)
+
+    first_a, first_b = asyncio.run(get_twice())
+    second_a, second_b = asyncio.run(get_twice())
+    assert first_a is first_b
+    assert second_a is second_b
+    assert first_a is not second_a
+
+
+def test_connectors_work_across_event_loops(openai_base_url):
+    pytest.importorskip("openai")
+    from summony.model_connectors.openai_model_connector import OpenAIModelConnector
+
+    def ask() -> str:
+        # (a new connector every time, as with agents made in another cell)
+        connector = OpenAIModelConnector(
+            creds={"api_key": "test"},
+            client_args={"base_url": openai_base_url, "max_retries": 0},
+        )
+        text, _ = asyncio.run(
+            connector.generate_async([{"role": "user", "content": "hi"}], "gpt-test")
+        )
+        return text
+
+    assert ask() == "hello"
+    assert ask() == "hello"
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from summony.model_connectors.multi_sample import (
+    _merge_streams,
+    generate_async_stream_n,
+)
+
+
+def test_emulated_stream_has_every_reply():
+    pytest.importorskip("openai")
+    from summony.model_connectors.openai_model_connector import OpenAIModelConnector
+
+    class O1Connector(OpenAIModelConnector):
+        async def generate_async(self, messages, model, n=1, **kwargs):
+            choices = [
+                {
+                    "index": i,
+                    "message": {"role": "assistant", "content": f"reply {i}"},
+                    "finish_reason": "stop",
+                }
+                for i in reversed(range(n))
+            ]
+            return "reply 0", {"id": "chatcmpl-1", "choices": choices}
+
+    connector = O1Connector(creds={"api_key": "test"})
+
+    async def run():
+        return [
+            (idx, text)
+            async for idx, text, _ in generate_async_stream_n(
+                connector, [{"role": "user", "content": "hi"}], "o1-mini", n=3
+            )
+        ]
+
+    assert asyncio.run(run()) == [(0, "reply 0"), (1, "reply 1"), (2, "reply 2")]
+
+
+def test_stopped_merge_closes_streams():
+    closed = []
+
+    async def stream(idx):
+        try:
+            while True:
+                yield f"chunk {idx}", {}
+                await asyncio.sleep(0.01)
+        finally:
+            await asyncio.sleep(0.01)
+            closed.append(idx)
+
+    async def run():
+        merged = _merge_streams([stream(i) for i in range(3)])
+        await anext(merged)
+        await merged.aclose()
+        # (closed by the time the merged stream is)
+        return sorted(closed)
+
+    assert asyncio.run(run()) == [0, 1, 2]
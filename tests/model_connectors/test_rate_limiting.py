@@ -0,0 +1,81 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import threading
+import time
+
+from summony.model_connectors.rate_limiting import RateLimiter
+
+
+def test_each_caller_gets_its_own_reservation():
+    limiter = RateLimiter(rpm=10_000, tpm=10_000_000)
+    # (switching threads as often as possible, for admissions to interleave)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            reservations = list(executor.map(limiter.acquire_sync, range(1, 501)))
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert [r.tokens for r in reservations] == list(range(1, 501))
+    assert len({id(r) for r in reservations}) == 500
+
+
+def test_correct_updates_the_window_tokens():
+    limiter = RateLimiter(tpm=1000)
+    reservation = limiter.acquire_sync(100)
+    limiter.acquire_sync(50)
+    limiter.correct(reservation, 10)
+    assert limiter.get_usage() == (2, 60)
+
+
+def test_waiters_are_admitted_in_order_without_polling():
+    limiter = RateLimiter(rpm=2, window=0.2)
+    try_admit = limiter._try_admit
+    attempts = []
+
+    def counting_try_admit(ticket, tokens):
+        attempts.append(ticket)
+        return try_admit(ticket, tokens)
+
+    limiter._try_admit = counting_try_admit
+    admitted = []
+
+    async def ask(i):
+        await limiter.acquire(1)
+        admitted.append(i)
+
+    async def run():
+        await asyncio.gather(*(ask(i) for i in range(6)))
+
+    started_at = time.monotonic()
+    asyncio.run(run())
+    assert admitted == list(range(6))
+    # (3 windows of 2 requests)
+    assert 0.4 <= time.monotonic() - started_at < 0.6
+    # (about one attempt on arrival, and one or two once next)
+    assert len(attempts) <= 6 * 3
+
+
+def test_sync_waiter_blocking_the_loop_goes_first():
+    limiter = RateLimiter(rpm=1, window=0.2)
+    admitted = []
+
+    async def ask(i):
+        await limiter.acquire(1)
+        admitted.append(i)
+
+    async def run():
+        await limiter.acquire(1)
+        task = asyncio.create_task(ask("async"))
+        await asyncio.sleep(0.01)
+        # (eg. `ag.ask()` in a notebook, with async calls running in background)
+        limiter.acquire_sync(1)
+        admitted.append("sync")
+        await task
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+    thread.start()
+    thread.join(timeout=3)
+    assert not thread.is_alive()
+    assert admitted == ["sync", "async"]
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from summony.model_connectors import RetryingModelConnector
+
+from fakes import BaselineXLogger, FakeConnector
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int, headers: dict[str, str] | None = None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+class FailingConnector(FakeConnector):
+    def __init__(self, errors: list[Exception]):
+        super().__init__()
+        self.errors = list(errors)
+
+    def generate(self, messages, model, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"r{self.calls}", {"call": self.calls}
+
+
+def test_only_retried_attempts_are_logged(memory_logger):
+    inner = FailingConnector([StatusError(500)] * 5)
+    connector = RetryingModelConnector(
+        inner, memory_logger, max_retries=2, base_delay=0.001
+    )
+    with pytest.raises(StatusError):
+        connector.generate([], "m")
+    assert inner.calls == 3
+    # (the last attempt's error being logged by whoever handles it)
+    assert [r["res_content"]["attempt"] for r in memory_logger.records] == [0, 1]
+    assert connector.stats.gave_up == 1
+
+
+def test_retried_attempts_are_logged_with_baseline_loggers():
+    logger = BaselineXLogger()
+    inner = FailingConnector([StatusError(500)])
+    connector = RetryingModelConnector(inner, logger, base_delay=0.001)
+    assert connector.generate([], "m") == ("r2", {"call": 2})
+    assert [r["res_content"] for r in logger.records] == [{"attempt": 0}]
+
+
+@pytest.mark.parametrize("status_code", [429, 503, 529])
+def test_retry_after_is_honoured(memory_logger, status_code):
+    inner = FailingConnector([StatusError(status_code, {"Retry-After": "0.05"})])
+    connector = RetryingModelConnector(inner, memory_logger, base_delay=30)
+    started_at = time.monotonic()
+    assert connector.generate([], "m") == ("r2", {"call": 2})
+    assert 0.05 <= time.monotonic() - started_at < 1
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+_SDK_MODULES = ("openai", "anthropic", "ollama", "google.generativeai")
+
+
+def run_python(code: str) -> str:
+    # (in a new interpreter, for modules not to be imported already)
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    return subprocess.check_output([sys.executable, "-c", code], text=True, env=env)
+
+
+def test_importing_summony_does_not_load_provider_sdks():
+    code = (
+        "import sys\n"
+        "import summony.agents, summony.model_connectors, summony.loggers\n"
+        f"print([m for m in {_SDK_MODULES!r} if m in sys.modules])\n"
+    )
+    assert run_python(code).strip() == "[]"
+
+
+def test_connector_classes_are_imported_on_first_use():
+    pytest.importorskip("openai")
+    code = (
+        "import sys\n"
+        "import summony.model_connectors as mc\n"
+        "assert 'openai' not in sys.modules\n"
+        "print(mc.OpenAIModelConnector.__name__, 'openai' in sys.modules)\n"
+    )
+    assert run_python(code).strip() == "OpenAIModelConnector True"